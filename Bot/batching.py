@@ -0,0 +1,89 @@
+"""Per-channel micro-batching of guesses.
+
+When a silhouette goes up, dozens of answers arrive within the same second.
+With ``GUESS_BATCH_WINDOW_MS`` > 0, ``on_message`` hands each admitted guess
+to ``batcher.submit`` instead of matching it on the spot; the first guess of a
+channel opens a window, and when it closes the whole batch is matched in one
+pass against the round's ``CompiledAliases`` (identical normalized guesses are
+matched once).  Of the correct guesses only the earliest one by Discord
+message ID (snowflakes are ordered by creation time) is reported as matched,
+so batching never changes who wins a race it was not able to see.
+"""
+
+import asyncio
+import time
+
+from .config import GUESS_BATCH_WINDOW_MS
+from .metrics import Counter, Histogram
+from .utils import match_aliases
+
+GUESS_BATCH_SIZE = Histogram("wto_guess_batch_size", "Guesses matched per batch.",
+                             buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+GUESS_BATCH_SECONDS = Histogram("wto_guess_batch_seconds", "Time to match one batch of guesses.",
+                                buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05))
+GUESS_BATCH_DEDUPED = Counter("wto_guess_batch_deduped_total", "Guesses answered by an identical guess in the same batch.")
+
+
+class _Batch:
+    __slots__ = ("state", "items", "handle")
+
+    def __init__(self, state):
+        self.state = state
+        self.items = []  # (order, seq, normalized guess, future)
+        self.handle = None
+
+
+class GuessBatcher:
+    def __init__(self, window: float):
+        self.window = window
+        self._pending = {}
+
+    def submit(self, channel_id, state, guess: str, order) -> asyncio.Future:
+        """Queue a normalized guess; the future resolves to (matched, score)."""
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(channel_id)
+        if batch is not None and batch.state is not state:
+            # a new round started before the window closed
+            self.flush(channel_id)
+            batch = None
+        if batch is None:
+            batch = self._pending[channel_id] = _Batch(state)
+            batch.handle = loop.call_later(self.window, self.flush, channel_id)
+        fut = loop.create_future()
+        batch.items.append((order, len(batch.items), guess, fut))
+        return fut
+
+    def flush(self, channel_id):
+        batch = self._pending.pop(channel_id, None)
+        if batch is None:
+            return
+        batch.handle.cancel()
+        state = batch.state
+        t0 = time.perf_counter()
+        results = {}
+        if not state.ended and state.target is not None:
+            ct = state.target
+            for _, _, guess, _ in batch.items:
+                if guess not in results:
+                    results[guess] = match_aliases(guess, ct)
+        winner = None
+        for item in sorted(batch.items, key=lambda it: (it[0], it[1])):
+            if results.get(item[2], (False,))[0]:
+                winner = item
+                break
+        for item in batch.items:
+            fut = item[3]
+            if not fut.done():
+                fut.set_result((item is winner, results.get(item[2], (False, 0.0))[1]))
+        t1 = time.perf_counter()
+        GUESS_BATCH_SIZE.observe(len(batch.items))
+        GUESS_BATCH_SECONDS.observe(t1 - t0)
+        if len(batch.items) > len(results) and results:
+            GUESS_BATCH_DEDUPED.inc(len(batch.items) - len(results))
+        if state.trace is not None:
+            state.trace.add_span("guess_batch", t0, t1, size=len(batch.items), unique=len(results),
+                                 matched=winner is not None)
+
+
+# None = match every guess as it arrives
+batcher = GuessBatcher(GUESS_BATCH_WINDOW_MS / 1000.0) if GUESS_BATCH_WINDOW_MS > 0 else None
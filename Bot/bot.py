@@ -1,23 +1,35 @@
 # Bot/bot.py — replace toàn bộ file bằng nội dung này
 
 import asyncio
-import difflib
-import string
+import time
 from datetime import datetime
-from pprint import pformat
 import discord
 from discord.ext import commands as discord_commands
 
 # project imports (relative)
 from . import commands as cmd_module   # module commands.py (renamed here to cmd_module)
-from .config import get_intents, PREFIX, all_scores, save_scores, games, looping_channels,GameState
-from .game_logic import reveal_answer 
-from .utils import fuzzy_match_threshold, EN_JSON, CN_JSON
+from .config import get_intents, get_cache_options, PREFIX, add_score, games, looping_channels,GameState
+from .utils import match_aliases
+from .metrics import GUESS_CHECK_SECONDS
+from .tracing import span
+from .log import get_logger
+from .config import LOG_GUESS_SAMPLE, SHARD_IDS, SHARD_COUNT, NEAR_MISS_THRESHOLD, NEAR_MISS_FEEDBACK
+from .watchdog import tag_task, watchdog
+from .throttle import admit_guess
+from .name_index import NEAR_MISS, NEAR_MISS_SECONDS
+from . import batching
+
+log = get_logger("guess")
 
 # Create bot
 intents = get_intents()  # defined in config.py
 _bot_prefix = PREFIX if PREFIX is not None else "!"
-bot = discord_commands.Bot(command_prefix=_bot_prefix, intents=intents)
+if SHARD_IDS is not None:
+    # worker of the sharded mode: only the shards the supervisor gave us
+    bot = discord_commands.AutoShardedBot(command_prefix=_bot_prefix, intents=intents,
+                                          shard_ids=SHARD_IDS, shard_count=SHARD_COUNT, **get_cache_options())
+else:
+    bot = discord_commands.Bot(command_prefix=_bot_prefix, intents=intents, **get_cache_options())
 
 # register commands from your commands.py module (it should expose setup(bot))
 try:
@@ -29,79 +41,91 @@ try:
 except Exception as e:
     print("[bot] Exception calling commands.setup:", e)
 
-# per-channel locks to avoid multiple winners in race conditions
-_channel_locks = {}
-
-def _normalize(s: str) -> str:
-    if s is None:
-        return ""
-    s = str(s).strip().lower()
-    s = s.translate(str.maketrans("", "", string.punctuation))
-    s = " ".join(s.split())
-    return s
-
-def _similarity(a: str, b: str) -> float:
-    if not a or not b:
-        return 0.0
-    return difflib.SequenceMatcher(None, a, b).ratio()
-
 @bot.event
 async def on_ready():
     print(f"[bot] Logged in as {bot.user} (id: {bot.user.id})")
     print("[bot] Ready — waiting for commands!")
+    watchdog.start()
+
+async def _near_miss(message, state, norm: str):
+    """A failed guess close to some operator's name: count it, log confusion pairs, optionally react."""
+    index = cmd_module.name_index
+    if index is None or len(norm) < 4:
+        return
+    t0 = time.perf_counter()
+    hit = index.nearest(norm, NEAR_MISS_THRESHOLD)
+    NEAR_MISS_SECONDS.observe(time.perf_counter() - t0)
+    if hit is None:
+        return
+    owner, form, ratio = hit
+    if owner == state.current.get("_catalog_index"):
+        NEAR_MISS.labels("answer").inc()
+        return
+    NEAR_MISS.labels("other_operator").inc()
+    log.info("confusion", channel=message.channel.id, answer=state.current.get("key"),
+             guessed=cmd_module.characters_list[owner].get("key"), form=form, ratio=round(ratio, 3))
+    if NEAR_MISS_FEEDBACK:
+        try:
+            await message.add_reaction("🔀")
+        except Exception:
+            pass
 
 @bot.event
 async def on_message(message):
     if message.author.bot:
         return
-    await bot.process_commands(message)
+    content = message.content
+    # fast path: only prefixed messages reach the command parser, and only messages
+    # in a channel with a live round reach the matcher; everything else stops here
+    if content.startswith(_bot_prefix):
+        tag_task("message:" + content.split(maxsplit=1)[0][:32])
+        await bot.process_commands(message)
+        return
 
     channel = message.channel
-    if channel.id not in games:
-        return
-    state = games[channel.id]
-    if state.guessed:
+    state = games.get(channel.id)
+    if state is None or state.ended:
         return
+    tag_task("guess")
     guess = message.content.strip()
-    if not guess:
+    target = state.target
+    if not guess or target is None:
         return
+    # input length and "cannot possibly match" checks, then rate limits; returns the normalized guess
+    norm = admit_guess(channel.id, message.author.id, guess, target.bounds)
+    if norm is None:
+        return
+    state.guesses += 1
 
-    candidates = {state.current.get("_reveal_name")}
-    matched = False
-    best_score = 0.0
-    best_variant = None
-    for cand in candidates:
-        ok, score = fuzzy_match_threshold(guess, cand)
-        if score > best_score:
-            best_score = score
-            best_variant = cand
-        if ok:
-            matched = True
-            break
-
-    if not matched and state.current.get("_reveal_name"):
-        ok, score = fuzzy_match_threshold(guess, state.current.get("_reveal_name"))
-        if ok:
-            matched = True
-            best_variant = state.current.get("_reveal_name")
-            best_score = score
+    if batching.batcher is not None:
+        # matched only for the earliest correct guess of the batch
+        matched, best_score = await batching.batcher.submit(channel.id, state, norm, message.id)
+    else:
+        check_started = time.perf_counter()
+        matched, best_score = match_aliases(norm, target)
+        check_done = time.perf_counter()
+        GUESS_CHECK_SECONDS.observe(check_done - check_started)
+        if state.trace is not None:
+            state.trace.add_span("guess", check_started, check_done, matched=matched)
+    best_variant = target.target
+    log.sampled("guess", LOG_GUESS_SAMPLE, channel=channel.id, key=state.current.get("key"),
+                matched=matched, score=round(best_score, 3))
+    if not matched:
+        await _near_miss(message, state, norm)
+        return
 
-    if matched:
-        state.guessed = True
-        if state.timeout_task:
-            state.timeout_task.cancel()
-        elapsed = (datetime.utcnow() - state.started_at).total_seconds() if state.started_at else 0
-        points = max(int(10 - elapsed), 1)
-        guild_id = str(message.guild.id)
-        uid = str(message.author.id)
-        all_scores.setdefault(guild_id, {})
-        all_scores[guild_id][uid] = all_scores[guild_id].get(uid, 0) + points
-        save_scores()
-        await channel.send(f"✅ **{message.author.display_name}** đoán đúng! (+{points} điểm) — Đáp án: **{state.current.get('_reveal_name') or state.current.get('_display_name_en') or state.current.get('_display_name_cn')}**")
-        print(f"[ROUND END] Channel {channel.id} - Winner: {message.author} guessed: {guess} -> matched: {best_variant} (score={best_score:.3f})")
-        await reveal_answer(channel, state.current)
-        games.pop(channel.id, None)
-        if channel.id in looping_channels:
-            origin = state.origin_ctx or await bot.get_context(message)
-            # Sửa: truyền 0 để tự động tính thời gian
-            asyncio.create_task(cmd_module.schedule_next(origin, 0))  # Đây là dòng sửa
+    # timeout/skip/stop hoặc người khác có thể đã kết thúc ván trước
+    if state.claim("won"):
+        with span(state.trace, "score"):
+            elapsed = (datetime.utcnow() - state.started_at).total_seconds() if state.started_at else 0
+            points = max(int(10 - elapsed), 1)
+            add_score(message.guild.id, message.author.id, points)
+            state.winner_id = message.author.id
+            state.solved_at = datetime.utcnow()
+        log.info("round_won", channel=channel.id, key=state.current.get("key"), winner=message.author.id,
+                 guess=guess[:100], matched=best_variant, score=round(best_score, 3), points=points)
+        await cmd_module.end_round(
+            state,
+            f"✅ **{message.author.display_name}** đoán đúng! (+{points} điểm) — Đáp án: **{state.current.get('_reveal_name') or state.current.get('_display_name_en') or state.current.get('_display_name_cn')}**",
+            await bot.get_context(message) if state.origin_ctx is None else None,
+            points=points, solve_seconds=round(elapsed, 3))
@@ -0,0 +1,75 @@
+"""Read-only catalog shared between worker processes through a memory-mapped file.
+
+In sharded mode the supervisor builds the catalog once and writes it with
+``write_manifest``; every worker opens it as a ``MappedCatalog``, a sequence
+that decodes an entry only when it is accessed.  The pages live in the OS page
+cache, so N workers share one copy instead of each parsing the bucket listing.
+Structures derived from the entries (round pool, alias matchers, name index)
+are still built and held by every worker.
+
+Layout (little-endian)::
+
+    b"WTOCAT01" | uint32 count | uint64 end offset * count | JSON blob * count
+"""
+
+import json
+import mmap
+import os
+import struct
+from collections.abc import Sequence
+from pathlib import Path
+
+MAGIC = b"WTOCAT01"
+_HEADER = struct.Struct("<8sI")
+
+
+def write_manifest(entries, path) -> int:
+    """Write catalog entries (dicts) to ``path`` atomically; returns the file size."""
+    path = Path(path)
+    blobs = [json.dumps(e, ensure_ascii=False, separators=(",", ":")).encode("utf-8") for e in entries]
+    offsets, end = [], 0
+    for b in blobs:
+        end += len(b)
+        offsets.append(end)
+    tmp = path.with_name(path.name + f".tmp{os.getpid()}")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(blobs)))
+        f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        for b in blobs:
+            f.write(b)
+    os.replace(tmp, path)
+    return path.stat().st_size
+
+
+class MappedCatalog(Sequence):
+    """Catalog entries decoded on access from a manifest file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{self.path} is not a catalog manifest")
+        self._count = count
+        self._offsets = memoryview(self._mm)[_HEADER.size:_HEADER.size + 8 * count].cast("Q")
+        self._data = _HEADER.size + 8 * count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("catalog index out of range")
+        start = self._offsets[i - 1] if i else 0
+        end = self._offsets[i]
+        return json.loads(self._mm[self._data + start:self._data + end])
+
+    def close(self):
+        self._offsets.release()
+        self._mm.close()
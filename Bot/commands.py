@@ -1,22 +1,63 @@
+import io
 import os
 import random
 import asyncio
 import discord
 import re as _re_try
 from datetime import datetime
-from .image_processing import load_characters_from_files
-from .config import  GameState, all_scores ,LOOP_DELAY,is_r2_enabled, games,looping_channels, looping_settings,scheduled_tasks
-from .utils import EN_JSON, CN_JSON,canonicalize_key,get_display_names,download_r2_object,generate_hint_for_char,display_len, pad_display
+from .image_processing import load_characters_from_files, build_round_pool, round_groups, build_alias_matchers
+from .storage import fetch_object, ObjectNotFound
+from .config import  GameState, all_scores, score_windows, global_board, _read_scores_file, SHARD_IDS, LOOP_DELAY, games,looping_channels, looping_settings,scheduled_tasks, CATALOG_MANIFEST
+from .catalog_manifest import MappedCatalog
+from .global_board import GlobalBoard
+from . import round_log
+from .utils import EN_JSON, CN_JSON,canonicalize_key,get_display_names,generate_hint_for_char,display_len, pad_display, reload_game_tables
+from .hint_icons import HINT_ICONS, preload_hint_icons
+from .metrics import ROUNDS_STARTED, ROUNDS_ENDED, UPLOAD_SECONDS, CATALOG_SIZE, ROUND_POOL_SIZE
+from .tracing import RoundTrace, span, finish
+from .log import get_logger
+from .watchdog import tag_task, format_offenders
+from .profiler import run_profile, ProfilerBusy, MAX_PROFILE_SECONDS
+from .silhouettes import derive_silhouette
+from .shuffle_bag import bags
+from .name_index import build_name_index
+
+log = get_logger("round")
 # Change import to:
 from .game_logic import (
     reveal_answer
 )
 try:
-    characters_list = load_characters_from_files()
+    if CATALOG_MANIFEST and os.path.exists(CATALOG_MANIFEST):
+        # sharded worker: catalog built once by the supervisor, shared via mmap
+        characters_list = MappedCatalog(CATALOG_MANIFEST)
+    else:
+        characters_list = load_characters_from_files()
     print(f"[INIT] characters_list loaded: {len(characters_list)} entries.")
 except Exception as e:
     characters_list = []
     print("[INIT] Failed to load characters_list:", e)
+round_pool = build_round_pool(characters_list)
+operator_groups = round_groups(round_pool)
+alias_matchers = build_alias_matchers(characters_list)
+name_index = build_name_index(alias_matchers)
+CATALOG_SIZE.set_function(lambda: len(characters_list))
+ROUND_POOL_SIZE.set_function(lambda: len(round_pool))
+
+def set_catalog(chars):
+    """Swap in a new catalog together with its round pool, alias matchers and name index."""
+    global characters_list, round_pool, operator_groups, alias_matchers, name_index
+    characters_list = chars
+    round_pool = build_round_pool(chars)
+    operator_groups = round_groups(round_pool)
+    alias_matchers = build_alias_matchers(chars)
+    name_index = build_name_index(alias_matchers)
+
+# hint icons are fetched once here so !hint never downloads anything
+preload_hint_icons()
+
+# pattern để tìm placeholder <<R2:...>>
+HINT_PLACEHOLDER_RE = _re_try.compile(r'<<R2:(.+?)>>')
 
 # debug EN/CN json sizes
 try:
@@ -24,20 +65,35 @@ try:
 except Exception as e:
     print("[INIT] Failed to inspect EN/CN JSON:", e)
 
+# channels whose start_game is still fetching/uploading the silhouette
+_starting = set()
+
 async def start_game(ctx, seconds: int = 0):
-    global characters_list
     channel = ctx.channel
-    if channel.id in games and games[channel.id].current and not games[channel.id].guessed:
+    if channel.id in games or channel.id in _starting:
         await ctx.send("Đang có ván đang chạy trong kênh này. Dùng !stop để dừng.")
         return
-    
-    if not characters_list:
+    _starting.add(channel.id)
+    try:
+        await _start_game(ctx, seconds)
+    finally:
+        _starting.discard(channel.id)
+
+async def _start_game(ctx, seconds: int = 0):
+    channel = ctx.channel
+    if not round_pool:
         await ctx.send("Không tìm thấy ảnh trong thư mục `images/` hoặc R2. Hãy thêm ảnh rồi thử lại.")
         return
 
-    char = random.choice(characters_list)
+    trace = RoundTrace(channel.id, guild_id=getattr(ctx.guild, "id", None))
+    # every operator comes up once in this channel before any of them repeats,
+    # then one of its skins/silhouettes at random
+    start, stop = operator_groups[bags.draw(channel.id, len(operator_groups))]
+    entry = round_pool[random.randrange(start, stop)]
+    char = characters_list[entry.char]
 
     key = char.get("key")
+    trace.lap("pick", key=key)
 
      # Sử dụng hàm helper mới
     display_en, display_cn = get_display_names(key, char)
@@ -55,68 +111,36 @@ async def start_game(ctx, seconds: int = 0):
         auto_used = True
 
     reveal_name = display_en or display_cn or fallback_name
+    trace.lap("resolve_names")
 
-    print("=== START ROUND ===")
-    print(f"Channel: {channel} (id={channel.id})")
-    print(f"Key: {key}")
-    print(f"English name (preferred): {display_en}")
-    print(f"Chinese name: {display_cn}")
-    print(f"Using reveal_name: {repr(reveal_name)}")
-
-
-    # pick a variant that has at least one silhouette; prefer base variant if present but still random among variants
-    sil_path = None
-    chosen_variant = None
-    chosen_pair = None
-    variants = char.get('variants') or []
-    # try variants that have silhouettes
-    sil_variants = [v for v in variants if v.get('silhouettes')]
-    if sil_variants:
-        chosen_variant = random.choice(sil_variants)
-        sil_path = random.choice(chosen_variant.get('silhouettes'))
-        chosen_pair = chosen_variant.get('pair_id') or chosen_variant.get('skin_name')
-        print(f"Variant : {chosen_pair}")
-        print(f"Time limit used: {use_seconds} seconds (auto? {auto_used})")
-        print("====================")
+    # the pool entry already names the variant, silhouette and the fulls that go with it;
+    # without an [alpha] object the silhouette is derived from one of those fulls
+    chosen_pair = entry.pair_id
+    sil_path = entry.silhouette
+    derived_from = None if sil_path else random.choice(entry.fulls)
 
-    else:
-        # fallback: aggregated silhouettes
-        if char.get('all_silhouettes'):
-            sil_path = random.choice(char.get('all_silhouettes'))
-            for v in variants:
-                if sil_path in (v.get('silhouettes') or []):
-                    chosen_variant = v
-                    chosen_pair = v.get('pair_id') or v.get('skin_name')
-                    print(f"Variant:{chosen_pair}")
-                    print(f"Time limit used: {use_seconds} seconds (auto? {auto_used})")
-                    print("====================")
-                    break
+    trace.lap("pick_variant", variant=chosen_pair, derived=derived_from is not None)
+    log.info("round_start", channel=channel.id, trace=trace.trace_id, key=key, en=display_en, cn=display_cn,
+             reveal=reveal_name, variant=chosen_pair, seconds=use_seconds, auto=auto_used)
+    try:
+        if sil_path:
+            sil_bytes = await fetch_object(sil_path)
+            trace.lap("silhouette_fetch", bytes=len(sil_bytes))
         else:
-            sil_path = None
-
-    if not sil_path:
-        await ctx.send("Không tìm thấy ảnh silhouette cho nhân vật đã chọn.")
-        return
-    if is_r2_enabled():
-        # R2 handling unchanged
-        loop = asyncio.get_event_loop()
-        sil_file_path = await loop.run_in_executor(None, download_r2_object, sil_path)
-        msg = await channel.send(
-            file=discord.File(sil_file_path, filename="silhouette.png"),
-            content=f"🔍 **Who is this?** You have {use_seconds} seconds to guess!{' (auto)' if auto_used else ''} (Gõ tên vào chat)"
-        )
-        os.unlink(sil_file_path)
-    else:
-        # FIXED: Use absolute path for local files
-        try:
+            sil_bytes = await derive_silhouette(derived_from)
+            trace.lap("silhouette_derive", bytes=len(sil_bytes))
+        with UPLOAD_SECONDS.labels("silhouette").time():
             msg = await channel.send(
-                file=discord.File(sil_path, filename="silhouette.png"),
+                file=discord.File(io.BytesIO(sil_bytes), filename="silhouette.png"),
                 content=f"🔍 **Who is this?** You have {use_seconds} seconds to guess!{' (auto)' if auto_used else ''} (Gõ tên vào chat)"
             )
-        except Exception as e:
-            await ctx.send(f"Lỗi khi gửi ảnh: {e}")
-            return
+    except Exception as e:
+        trace.finish("aborted", reason="silhouette_error")
+        await ctx.send(f"Lỗi khi gửi ảnh: {e}")
+        return
+    trace.lap("silhouette_upload")
     state = GameState(channel, origin_ctx=ctx)
+    state.trace = trace
     state.current = dict(char)
 
     # preserve original key, but use canonical key for matching/lookups
@@ -130,9 +154,15 @@ async def start_game(ctx, seconds: int = 0):
     # record which pair/variant was used for silhouette (if any)
     state.current["_chosen_pair_id"] = chosen_pair
     state.current["_chosen_silhouette_path"] = sil_path
+    # the full image the silhouette was made from is also the one to reveal
+    state.current["_silhouette_source"] = derived_from
+    state.current["_reveal_fulls"] = entry.fulls
+    state.current["_catalog_index"] = entry.char
     state.current["_display_name_en"] = display_en
     state.current["_display_name_cn"] = display_cn
     state.current["_reveal_name"] = reveal_name
+    # EN/CN names, codename, patch-table and CN-only names all count as correct
+    state.target = alias_matchers[entry.char]
     state.current["_time_limit"] = use_seconds
     # --- ensure profession/subProfession/nation present for hint generation (auto-populate) ---
     try:
@@ -143,12 +173,12 @@ async def start_game(ctx, seconds: int = 0):
             canonical_k = k
         matched_level = 0
         # attempt to use canonical key for looking up profession info
-        entry = {}
+        info = {}
         if canonical_k:
-            entry = EN_JSON.get(canonical_k) or CN_JSON.get(canonical_k) or {}
+            info = EN_JSON.get(canonical_k) or CN_JSON.get(canonical_k) or {}
         else:
-            entry = EN_JSON.get(k) or CN_JSON.get(k) or {}
-        prof = entry.get("profession") or entry.get("subProfession") or entry.get("subProfessionId") or entry.get("mainProfession") or entry.get("professionId")
+            info = EN_JSON.get(k) or CN_JSON.get(k) or {}
+        prof = info.get("profession") or info.get("subProfession") or info.get("subProfessionId") or info.get("mainProfession") or info.get("professionId")
         # if no profession on canonical entry, try base key (strip codename digits) or shorter key for profession only
         if not prof and k:
             parts_try = k.split("_")
@@ -164,29 +194,26 @@ async def start_game(ctx, seconds: int = 0):
             state.current["profession"] = prof
         # debug
         candidates = []
-        if entry.get("profession"): candidates.append(entry.get("profession"))
-        if entry.get("subProfession") or entry.get("subProfessionId"): candidates.append(entry.get("subProfession") or entry.get("subProfessionId"))
-        if entry.get("nation") or entry.get("nationId"): candidates.append(entry.get("nation") or entry.get("nationId"))
-        print(f"[HINT DEBUG] original_key={k} canonical_key={canonical_k} matched_level={matched_level} candidates={candidates} -> inserted_profession={state.current.get('profession')}")
+        if info.get("profession"): candidates.append(info.get("profession"))
+        if info.get("subProfession") or info.get("subProfessionId"): candidates.append(info.get("subProfession") or info.get("subProfessionId"))
+        if info.get("nation") or info.get("nationId"): candidates.append(info.get("nation") or info.get("nationId"))
+        log.debug("hint_populate", channel=channel.id, key=k, canonical_key=canonical_k, matched_level=matched_level,
+                  candidates=candidates, profession=state.current.get('profession'))
     except Exception as e:
-        print("[HINT DEBUG] populate error:", e)
+        log.warning("hint_populate_error", channel=channel.id, key=state.current.get("key"), error=str(e))
 
     state.current["_hint"] = generate_hint_for_char(state.current)
     state.hint = state.current.get("_hint")
     state.started_at = datetime.utcnow()
-    state.guessed = False
     games[channel.id] = state
+    ROUNDS_STARTED.inc()
+    trace.lap("state_setup")
 
     async def timeout_job():
+        tag_task(f"timeout:{channel.id}")
         await asyncio.sleep(use_seconds)
-        if channel.id in games and not games[channel.id].guessed:
-            await channel.send(f"⏰ Hết giờ! Đáp án là **{state.current.get('_reveal_name') or state.current.get('_display_name_en') or state.current.get('_display_name_cn')}**.")
-            await reveal_answer(channel, state.current)
-            games.pop(channel.id, None)
-            if channel.id in looping_channels:
-                origin = state.origin_ctx or ctx
-                # Sửa: truyền 0 để tự động tính thời gian
-                asyncio.create_task(schedule_next(origin, 0))
+        if state.claim("timeout"):
+            await end_round(state, f"⏰ Hết giờ! Đáp án là **{state.current.get('_reveal_name') or state.current.get('_display_name_en') or state.current.get('_display_name_cn')}**.", ctx)
     state.timeout_task = asyncio.create_task(timeout_job())
 
 async def stop_game(ctx):
@@ -199,9 +226,9 @@ async def stop_game(ctx):
     if task:
         task.cancel()
 
-    state = games.pop(cid, None)
-    if state and state.timeout_task:
-        state.timeout_task.cancel()
+    state = games.get(cid)
+    if state is not None and state.claim("stopped"):
+        await end_round(state, None, ctx)
 
     await ctx.send("⏹️ Đã dừng ván chơi.")
 
@@ -218,22 +245,13 @@ async def start_loop(ctx, loop_delay: int = LOOP_DELAY, seconds: int = 30):
 
 async def skip_round(ctx):
     channel = ctx.channel
-    if channel.id not in games:
+    state = games.get(channel.id)
+    if state is None or not state.claim("skipped"):
         await ctx.send("Không có ván nào để skip.")
         return
 
-    state = games.pop(channel.id)
-    if state.timeout_task:
-        state.timeout_task.cancel()
-
     reveal = state.current.get('_reveal_name') or state.current.get('_display_name_en') or state.current.get('_display_name_cn') or state.current.get('name')
-    await ctx.send(f"✳ Ván bị skip. Đáp án: **{reveal}**.")
-    await reveal_answer(channel, state.current)
-
-    if channel.id in looping_channels:
-        origin = state.origin_ctx or ctx
-        task = asyncio.create_task(schedule_next(origin, 0))
-        scheduled_tasks[channel.id] = task
+    await end_round(state, f"✳ Ván bị skip. Đáp án: **{reveal}**.", ctx)
 
 async def provide_hint(ctx):
     channel = ctx.channel
@@ -249,12 +267,9 @@ async def provide_hint(ctx):
         return
 
     hint = state.hint or ""
-    # pattern để tìm placeholder <<R2:...>>
-    pattern = r'<<R2:(.+?)>>'
-    m = _re_try.search(pattern, hint)
-    label = _re_try.sub(pattern, '', hint).strip() or None
-    print(m)
-    print(label)
+    m = HINT_PLACEHOLDER_RE.search(hint)
+    label = HINT_PLACEHOLDER_RE.sub('', hint).strip() or None
+    log.debug("hint", channel=channel.id, file_key=m.group(1) if m else None, label=label)
 
     # nếu không có placeholder -> gửi text bình thường
     if not m:
@@ -264,35 +279,23 @@ async def provide_hint(ctx):
 
     file_key = m.group(1)  # ví dụ "images/Icon/icon_profession_xxx.png"
 
-    # gửi: text label (nếu có) + file (từ R2 hoặc local)
+    # gửi: text label (nếu có) + file (từ icon pack trong RAM, hoặc storage)
     try:
-        if is_r2_enabled():
-            # tải từ R2 (download_r2_object trả đường dẫn đến file tạm)
-            loop = asyncio.get_event_loop()
-            tmp_path = await loop.run_in_executor(None, download_r2_object, file_key)
-            try:
-                content = f"🔎 Gợi ý: {label}" if label else "🔎 Gợi ý:"
-                await channel.send(content=content, file=discord.File(tmp_path, filename=os.path.basename(tmp_path)))
-            finally:
-                try:
-                    os.unlink(tmp_path)
-                except Exception:
-                    pass
+        icon = HINT_ICONS.get(file_key)
+        if icon is not None:
+            content = f"🔎 Gợi ý: {label}" if label else "🔎 Gợi ý:"
+            with UPLOAD_SECONDS.labels("hint").time():
+                await channel.send(content=content, file=discord.File(io.BytesIO(icon), filename=os.path.basename(file_key)))
         else:
-            # thử path như trong placeholder (relative tới cwd)
-            if os.path.exists(file_key):
-                content = f"🔎 Gợi ý: {label}" if label else "🔎 Gợi ý:"
-                await channel.send(content=content, file=discord.File(file_key, filename=os.path.basename(file_key)))
+            # icon không có trong pack -> tải từ storage một lần rồi giữ lại trong RAM
+            try:
+                icon = await fetch_object(file_key)
+            except ObjectNotFound:
+                await channel.send(f"🔎 Gợi ý: {label}\n(Hình: `{file_key}` không tìm thấy.)")
             else:
-                # thử tìm relative so với repo root (dưới package parent)
-                from pathlib import Path
-                candidate = Path(__file__).resolve().parent.parent.joinpath(file_key)
-                if candidate.exists():
-                    content = f"🔎 Gợi ý: {label}" if label else "🔎 Gợi ý:"
-                    await channel.send(content=content, file=discord.File(str(candidate), filename=candidate.name))
-                else:
-                    # không tìm thấy ảnh cục bộ -> gửi label và báo tên file để debug
-                    await channel.send(f"🔎 Gợi ý: {label}\n(Hình: `{file_key}` không tìm thấy cục bộ.)")
+                HINT_ICONS.add(file_key, icon)
+                content = f"🔎 Gợi ý: {label}" if label else "🔎 Gợi ý:"
+                await channel.send(content=content, file=discord.File(io.BytesIO(icon), filename=os.path.basename(file_key)))
     except Exception as e:
         # trong trường hợp lỗi tải/gửi file, gửi lại label và lỗi để dễ debug
         try:
@@ -303,16 +306,70 @@ async def provide_hint(ctx):
     state.hint_shown = True
 
 
+_LEADERBOARD_PERIODS = {
+    "all": ("all", ""), "day": ("day", " — 24 giờ qua"), "ngay": ("day", " — 24 giờ qua"),
+    "week": ("week", " — 7 ngày qua"), "tuan": ("week", " — 7 ngày qua"),
+    "global": ("global", ""),
+}
+GLOBAL_PAGE_SIZE = 10
+# sharded: các worker khác ghi điểm của guild của chúng vào file; đọc lại tối đa mỗi chừng này giây
+GLOBAL_RESYNC_SECONDS = 60.0
+_global_synced_at = 0.0
+
+def _format_board(title, rows):
+    rank_w  = max(display_len(rank) for rank, _, _ in rows)
+    score_w = max(display_len(score) for _, score, _ in rows)
+    lines = [title, "```"]
+    for rank, score, name in rows:
+        rank_col  = pad_display(rank, rank_w, "left")
+        score_col = pad_display(score, score_w, "right")
+        lines.append(f"{rank_col} | {score_col} | {name}")
+    lines.append("```")
+    return "\n".join(lines)
+
+async def _global_leaderboard(ctx, page: int):
+    global _global_synced_at
+    loop = asyncio.get_running_loop()
+    if SHARD_IDS is not None and loop.time() - _global_synced_at > GLOBAL_RESYNC_SECONDS:
+        _global_synced_at = loop.time()
+        fresh = await loop.run_in_executor(None, lambda: GlobalBoard.build(_read_scores_file(), global_board.k))
+        global_board.replace(fresh)
+    pages = global_board.pages(GLOBAL_PAGE_SIZE)
+    entries = global_board.page(page, GLOBAL_PAGE_SIZE)
+    if not entries:
+        await ctx.send("Chưa có ai có điểm cả." if page <= 1 else f"Chỉ có {pages} trang.")
+        return
+    rows = []
+    for rank, uid, score, gid in entries:
+        try:
+            name = (await ctx.bot.fetch_user(int(uid))).display_name
+        except Exception:
+            name = f"Người chơi {uid}"
+        guild = ctx.bot.get_guild(int(gid))
+        rows.append((f"#{rank}", f"{score} điểm", f"{name} ({guild.name})" if guild else name))
+    await ctx.send(_format_board(f"🌍 Bảng xếp hạng toàn cục — trang {max(1, page)}/{pages} 🌍", rows))
+
 # Sửa hàm leaderboard
-async def leaderboard(ctx):
+async def leaderboard(ctx, period: str = "all", page: int = 1):
+    """!leaderboard [day|week|all|global [trang]]"""
     guild_id = str(ctx.guild.id)
-    guild_scores = all_scores.get(guild_id, {})
-    if not guild_scores:
-        await ctx.send("Chưa có ai có điểm cả.")
+    window, title_suffix = _LEADERBOARD_PERIODS.get(period.lower(), (None, ""))
+    if window is None:
+        await ctx.send("Cú pháp: `!leaderboard [day|week|all|global [trang]]`")
+        return
+    if window == "global":
+        # mỗi người chơi một dòng, với điểm ở server cao nhất của họ
+        await _global_leaderboard(ctx, page)
         return
 
-    # chỉ lấy top 9
-    sorted_scores = sorted(guild_scores.items(), key=lambda x: x[1], reverse=True)[:9]
+    # chỉ lấy top 9; day/week đọc tổng đã cộng sẵn theo bucket, không quét lịch sử
+    if window == "all":
+        sorted_scores = sorted(all_scores.get(guild_id, {}).items(), key=lambda x: x[1], reverse=True)[:9]
+    else:
+        sorted_scores = score_windows.top(guild_id, window, 9)
+    if not sorted_scores:
+        await ctx.send("Chưa có ai có điểm cả.")
+        return
 
     rows = []
     for i, (uid, score) in enumerate(sorted_scores, start=1):
@@ -325,20 +382,7 @@ async def leaderboard(ctx):
         rank = f"#{i}"
         rows.append((rank, f"{score} điểm", name))
 
-    # --- tính độ rộng ---
-
-    
-    rank_w  = max(display_len(rank) for rank, _, _ in rows)
-    score_w = max(display_len(score) for _, score, _ in rows)
-
-    lines = ["🏆 Bảng xếp hạng (Top 9) 🏆", "```"]
-    for rank, score, name in rows:
-        rank_col  = pad_display(rank, rank_w, "left")
-        score_col = pad_display(score, score_w, "right")
-        lines.append(f"{rank_col} | {score_col} | {name}")
-    lines.append("```")
-
-    await ctx.send("\n".join(lines))
+    await ctx.send(_format_board(f"🏆 Bảng xếp hạng (Top 9){title_suffix} 🏆", rows))
 
 async def myscore(ctx):
     guild_id = str(ctx.guild.id)
@@ -355,10 +399,12 @@ async def show_help(ctx):
     `!startloop [giây]` - Bật chế độ lặp tự động với khoản cách ván
     `!skip` - Bỏ qua ván hiện tại 
     `!hint` - Xem gợi ý cho ván hiện tại
-    `!leaderboard` - Xem bảng xếp hạng
+    `!leaderboard [day|week]` - Xem bảng xếp hạng (mặc định: mọi lúc)
+    `!leaderboard global [trang]` - Bảng xếp hạng mọi server
     `!myscore` - Xem điểm của bạn
     `!op <key>` - Xem thông tin nhân vật (VD: `!op char_002_amiya`)
     `!commandhelp` - Hiển thị hướng dẫn này
+    `!lag` - Xem những lần bot bị nghẽn lâu nhất (debug, chỉ admin)
     Nếu Bot sập vào https://whothatoperator.onrender.com/ để khởi động Bot
     """
     await ctx.send(help_text)
@@ -396,9 +442,35 @@ async def op_info(ctx, key: str):
     )
     await ctx.send(f"```\n{msg}\n```")
 
+# trace span of the announcement, per outcome
+_END_SPANS = {"won": "win", "timeout": "timeout", "skipped": "skip"}
+
+async def end_round(state, announce=None, ctx=None, **trace_attrs):
+    """End-of-round pipeline: announce, reveal, schedule the next looped round.
+
+    Only call it after ``state.claim(...)`` returned True, so exactly one
+    pipeline runs per round whichever of win/timeout/skip/stop got there first.
+    """
+    channel = state.channel
+    outcome = state.outcome
+    ROUNDS_ENDED.labels(outcome).inc()
+    if outcome != "stopped":
+        if announce:
+            with span(state.trace, _END_SPANS.get(outcome, outcome)):
+                await channel.send(announce)
+        await reveal_answer(channel, state.current, trace=state.trace)
+        origin = state.origin_ctx or ctx
+        # stop có thể đã tắt loop trong lúc đang reveal
+        if channel.id in looping_channels and channel.id not in scheduled_tasks and origin is not None:
+            # truyền 0 để tự động tính thời gian
+            scheduled_tasks[channel.id] = asyncio.create_task(schedule_next(origin, 0))
+    finish(state.trace, outcome, **trace_attrs)
+    round_log.record(state)
+
 async def schedule_next(origin_ctx, seconds=0):
     """Schedule next game round if still in loop mode."""
     cid = origin_ctx.channel.id
+    tag_task(f"schedule_next:{cid}")
     try:
         delay = looping_settings.get(cid, seconds)  # Default to 5 seconds if not set
         if delay > 0:
@@ -410,9 +482,55 @@ async def schedule_next(origin_ctx, seconds=0):
         # Task was cancelled by stop()
         pass
     except Exception as e:
-        print("Failed to schedule next round:", e)
+        log.error("schedule_next_failed", channel=cid, error=str(e))
     finally:
-        scheduled_tasks.pop(cid, None)
+        if scheduled_tasks.get(cid) is asyncio.current_task():
+            scheduled_tasks.pop(cid, None)
+
+def _is_admin(ctx) -> bool:
+    perms = getattr(ctx.author, "guild_permissions", None)
+    return perms is not None and perms.administrator
+
+async def lag_report(ctx):
+    """Admin only: show the callbacks that blocked the event loop the longest."""
+    if not _is_admin(ctx):
+        await ctx.send("❌ Chỉ admin mới dùng được lệnh này.")
+        return
+    await ctx.send(f"```\n{format_offenders()}\n```")
+
+async def profile_cmd(ctx, seconds: int = 10):
+    """Admin only: sample the whole process for N seconds and upload a collapsed-stack file."""
+    if not _is_admin(ctx):
+        await ctx.send("❌ Chỉ admin mới dùng được lệnh này.")
+        return
+    seconds = max(1, min(seconds, MAX_PROFILE_SECONDS))
+    await ctx.send(f"⏱️ Đang profile trong {seconds} giây...")
+    try:
+        prof = await run_profile(seconds)
+    except ProfilerBusy:
+        await ctx.send("⚠️ Đang có một profile khác chạy, thử lại sau.")
+        return
+    data = prof.collapsed().encode("utf-8")
+    await ctx.send(content=f"```\n{prof.summary(8)}\n```",
+                   file=discord.File(io.BytesIO(data), filename=f"profile_{int(datetime.utcnow().timestamp())}.collapsed"))
+
+async def reload_data(ctx):
+    """Admin only: re-read the game tables (parsed in the job pool) without restarting."""
+    if not _is_admin(ctx):
+        await ctx.send("❌ Chỉ admin mới dùng được lệnh này.")
+        return
+    global alias_matchers, name_index
+    try:
+        counts = await reload_game_tables()
+        # the accepted names come from these tables: rebuild matchers and index off the loop, then swap
+        loop = asyncio.get_running_loop()
+        matchers = await loop.run_in_executor(None, build_alias_matchers, characters_list)
+        index = await loop.run_in_executor(None, build_name_index, matchers)
+    except Exception as e:
+        await ctx.send(f"❌ Lỗi khi tải lại dữ liệu: {e}")
+        return
+    alias_matchers, name_index = matchers, index
+    await ctx.send("🔄 Đã tải lại dữ liệu: " + ", ".join(f"{k}={v}" for k, v in counts.items()))
 
 def setup(bot):
     bot.command(name="start")(start_game)
@@ -423,4 +541,7 @@ def setup(bot):
     bot.command(name="leaderboard")(leaderboard)
     bot.command(name="myscore")(myscore)
     bot.command(name="commandhelp")(show_help)
-    bot.command(name="op")(op_info)
\ No newline at end of file
+    bot.command(name="op")(op_info)
+    bot.command(name="lag")(lag_report)
+    bot.command(name="profile")(profile_cmd)
+    bot.command(name="reloaddata")(reload_data)
\ No newline at end of file
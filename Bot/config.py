@@ -1,9 +1,15 @@
+import asyncio
+import atexit
 import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
 import discord
 import unicodedata
+from contextlib import contextmanager
+from .metrics import SCORE_COMMIT_SECONDS, ACTIVE_GAMES, SCHEDULED_TASKS, LOOPING_CHANNELS
+from .score_windows import ScoreWindows
+from .global_board import GlobalBoard
 
 
 # --- Config / env ---
@@ -28,6 +34,106 @@ ENV_PATH = BASE / ".env"
 # tạo thư mục logs (nếu cần)
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 
+# Local images (dùng khi không cấu hình R2): thư mục gốc chứa images/Char, images/Skin...
+LOCAL_IMAGES_ROOT = Path(os.getenv("LOCAL_IMAGES_ROOT", str(BASE)))
+LOCAL_SCAN_INDEX_PATH = Path(os.getenv("LOCAL_SCAN_INDEX", str(LOG_DIR / "local_scan_index.json")))
+
+# Logging: LOG_LEVEL=DEBUG|INFO|WARNING, LOG_FORMAT=text|json
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_QUEUE_SIZE = 10000
+# fraction of per-guess events that get logged
+try:
+    LOG_GUESS_SAMPLE = float(os.getenv("LOG_GUESS_SAMPLE", "0.01"))
+except ValueError:
+    LOG_GUESS_SAMPLE = 0.01
+
+# Bảng xếp hạng toàn cục: giữ top-K mỗi guild và top-K chung (phân trang 10 dòng/trang)
+try:
+    GLOBAL_TOPK = int(os.getenv("GLOBAL_TOPK", "100"))
+except ValueError:
+    GLOBAL_TOPK = 100
+
+# Đoán sai nhưng gần tên một nhân vật khác (tỉ lệ giống >= ngưỡng): ghi log cặp nhầm lẫn;
+# NEAR_MISS_FEEDBACK=1 thì bot thả reaction vào tin nhắn đó
+try:
+    NEAR_MISS_THRESHOLD = float(os.getenv("NEAR_MISS_THRESHOLD", "0.8"))
+except ValueError:
+    NEAR_MISS_THRESHOLD = 0.8
+NEAR_MISS_FEEDBACK = os.getenv("NEAR_MISS_FEEDBACK", "0") not in ("0", "false", "False", "")
+
+# Giới hạn đoán: token bucket theo người chơi (trong một kênh) và theo kênh; 0 = không giới hạn
+try:
+    GUESS_USER_RATE = float(os.getenv("GUESS_USER_RATE", "1"))
+    GUESS_USER_BURST = float(os.getenv("GUESS_USER_BURST", "4"))
+    GUESS_CHANNEL_RATE = float(os.getenv("GUESS_CHANNEL_RATE", "20"))
+    GUESS_CHANNEL_BURST = float(os.getenv("GUESS_CHANNEL_BURST", "40"))
+except ValueError:
+    GUESS_USER_RATE, GUESS_USER_BURST, GUESS_CHANNEL_RATE, GUESS_CHANNEL_BURST = 1.0, 4.0, 20.0, 40.0
+# tin nhắn dài hơn sẽ bị cắt trước khi chuẩn hoá
+MAX_GUESS_CHARS = 100
+
+# gom các câu đoán của một kênh trong cửa sổ này (ms) rồi so khớp một lượt; 0 = tắt
+try:
+    GUESS_BATCH_WINDOW_MS = float(os.getenv("GUESS_BATCH_WINDOW_MS", "0"))
+except ValueError:
+    GUESS_BATCH_WINDOW_MS = 0.0
+
+# Sharded mode: WORKERS > 1 chạy supervisor + nhiều worker, mỗi worker giữ một số shard
+try:
+    WORKERS = int(os.getenv("WORKERS", "1"))
+    SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+except ValueError:
+    WORKERS, SHARD_COUNT = 1, None
+# do supervisor đặt cho từng worker
+SHARD_IDS = [int(x) for x in os.getenv("WTO_SHARD_IDS", "").split(",") if x.strip()] or None
+CATALOG_MANIFEST = os.getenv("WTO_CATALOG_MANIFEST")
+
+# Process pool cho việc nặng CPU (ảnh, JSON lớn); 0 = chạy trên một thread
+try:
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+    JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "32"))
+except ValueError:
+    JOB_WORKERS, JOB_MAX_PENDING = 1, 32
+
+# Đọc ảnh từ R2: hạn chót mỗi lần thử (giây), số lần thử lại (backoff ngẫu nhiên từ STORAGE_BACKOFF giây, nhân đôi
+# mỗi lần), và gửi thêm một GET dự phòng khi lần đọc chậm hơn p95 gần đây (ít nhất STORAGE_HEDGE_MIN giây)
+try:
+    STORAGE_DEADLINE = float(os.getenv("STORAGE_DEADLINE", "5"))
+    STORAGE_RETRIES = int(os.getenv("STORAGE_RETRIES", "2"))
+    STORAGE_BACKOFF = float(os.getenv("STORAGE_BACKOFF", "0.1"))
+    STORAGE_HEDGE_MIN = float(os.getenv("STORAGE_HEDGE_MIN", "0.05"))
+except ValueError:
+    STORAGE_DEADLINE, STORAGE_RETRIES, STORAGE_BACKOFF, STORAGE_HEDGE_MIN = 5.0, 2, 0.1, 0.05
+STORAGE_HEDGE = os.getenv("STORAGE_HEDGE", "1") not in ("0", "false", "False", "")
+
+# silhouette tạo từ ảnh full (khi không có ảnh [alpha]) được cache ở đây, theo hash nội dung ảnh gốc
+SILHOUETTE_CACHE_DIR = Path(os.getenv("SILHOUETTE_CACHE_DIR", str(BASE / "cache" / "silhouettes")))
+
+# Watchdog: event loop bị chặn lâu hơn ngưỡng này (giây) sẽ được ghi lại kèm stack
+try:
+    WATCHDOG_THRESHOLD = float(os.getenv("WATCHDOG_THRESHOLD", "0.25"))
+except ValueError:
+    WATCHDOG_THRESHOLD = 0.25
+
+# token cho các endpoint /debug/profile trên web server (không đặt = tắt)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Round tracing: mỗi ván ghi một dòng JSON vào file này (ROUND_TRACING=0 để tắt)
+ROUND_TRACING = os.getenv("ROUND_TRACING", "1") not in ("0", "false", "False", "")
+ROUND_TRACE_PATH = Path(os.getenv("ROUND_TRACE_FILE", str(LOG_DIR / "round_traces.jsonl")))
+# file trace lớn hơn mức này (MB) được đổi tên thành .1 (ghi đè bản cũ) rồi ghi file mới; 0 = không giới hạn
+try:
+    ROUND_TRACE_MAX_MB = float(os.getenv("ROUND_TRACE_MAX_MB", "50"))
+except ValueError:
+    ROUND_TRACE_MAX_MB = 50.0
+
+# Lịch sử ván (bản ghi nhị phân cố định, mỗi ngày một file) cho phân tích: python -m Bot.round_log
+ROUND_LOG_DIR = Path(os.getenv("ROUND_LOG_DIR", str(LOG_DIR / "rounds")))
+
+# thứ tự chọn nhân vật không lặp lại của từng kênh (seed + vị trí), giữ qua các lần khởi động lại
+SHUFFLE_BAG_PATH = Path(os.getenv("SHUFFLE_BAG_FILE", str(LOG_DIR / "shuffle_bags.bin")))
+
 # helper để build path an toàn
 def data_path(*parts) -> Path:
     return DATA_DIR.joinpath(*parts)
@@ -57,16 +163,50 @@ PROFESSION_MAP_PATH = data_path("profession_map.json")
 CN_ONLY_MAP_PATH = data_path("cn_only_map.json")
 AMIYA_JSON_PATH = data_path("char_patch_table.json")
 
+# cách một ván có thể kết thúc
+ROUND_OUTCOMES = ("won", "timeout", "skipped", "stopped")
+
 class GameState:
     def __init__(self, channel: discord.TextChannel, origin_ctx=None):
         self.channel = channel
         self.current = None
         self.started_at = None
         self.timeout_task = None
-        self.guessed = False
+        self.outcome = None
         self.origin_ctx = origin_ctx
         self.hint = None
         self.hint_shown = False
+        self.trace = None
+        # utils.CompiledAliases of the answer (every accepted name), set by start_game
+        self.target = None
+        # for the round log: admitted guesses, who won and when (UTC, like started_at)
+        self.guesses = 0
+        self.winner_id = None
+        self.solved_at = None
+
+    @property
+    def ended(self) -> bool:
+        return self.outcome is not None
+
+    def claim(self, outcome: str) -> bool:
+        """End the round as ``outcome``; only the first caller wins the claim.
+
+        Runs without awaiting, so on the event loop it is atomic: the winner
+        removes the round from ``games`` and cancels the timeout (unless it
+        *is* the timeout), every later win/timeout/skip/stop gets False.
+        """
+        if outcome not in ROUND_OUTCOMES:
+            raise ValueError(f"unknown round outcome {outcome!r}")
+        if self.outcome is not None:
+            return False
+        self.outcome = outcome
+        cid = self.channel.id
+        if games.get(cid) is self:
+            del games[cid]
+        task = self.timeout_task
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+        return True
 
 # Loop settings
 try:
@@ -80,31 +220,164 @@ if not TOKEN:
 # --- Paths ---
 SCORES_FILE = Path("scores.json")
 
+# Lean gateway (mặc định bật): chỉ nhận sự kiện guild + tin nhắn trong guild, không cache
+# tin nhắn / member, không chunk guild.  Bot không đọc gì từ các cache đó (leaderboard dùng
+# fetch_member), nên trong guild lớn chỉ tốn RAM.  LEAN_GATEWAY=0 để quay lại mặc định của discord.py.
+LEAN_GATEWAY = os.getenv("LEAN_GATEWAY", "1") not in ("0", "false", "False", "")
+
 # Intents configuration (chỉ định nghĩa intents, không tạo bot)
 def get_intents():
+    if LEAN_GATEWAY:
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.guild_messages = True
+        intents.message_content = True
+        return intents
     intents = discord.Intents.default()
     intents.message_content = True
     intents.guilds = True
     intents.messages = True
     return intents
 
+def get_cache_options() -> dict:
+    """Extra Bot(...) kwargs for the gateway caches."""
+    if not LEAN_GATEWAY:
+        return {}
+    return {
+        "max_messages": None,
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+        "chunk_guilds_at_startup": False,
+    }
+
 """Hệ thống điểm"""
 # --- Scores persistence ---
-if SCORES_FILE.exists():
-    try:
-        with SCORES_FILE.open("r", encoding="utf-8") as f:
-            all_scores = json.load(f)
-    except Exception:
-        all_scores = {}
-else:
-    all_scores = {}
-
-def save_scores():
+try:
+    import fcntl
+except ImportError:  # Windows: chỉ chạy một tiến trình, không cần khoá file
+    fcntl = None
+
+def _read_scores_file(path=None):
+    path = path or SCORES_FILE
+    if path.exists():
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+    return {}
+
+def _windows_file():
+    # bucket điểm theo giờ/ngày cho bảng xếp hạng ngày/tuần, cạnh scores.json
+    return SCORES_FILE.with_name("score_windows.json")
+
+all_scores = _read_scores_file()
+score_windows = ScoreWindows(_read_scores_file(_windows_file()))
+global_board = GlobalBoard.build(all_scores, GLOBAL_TOPK)
+
+@contextmanager
+def _scores_lock():
+    if fcntl is None:
+        yield
+        return
+    with open(SCORES_FILE.with_name(SCORES_FILE.name + ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _score_changes(guild_ids=None):
+    """Bản chụp (copy) điểm của các guild cần ghi; None = mọi guild."""
+    if guild_ids is None:
+        guild_ids = list(all_scores)
+        windows = score_windows.to_json()
+    else:
+        windows = {gid: score_windows.to_json(gid) for gid in guild_ids}
+    return [(SCORES_FILE, {gid: dict(all_scores.get(gid, {})) for gid in guild_ids}, 2),
+            (_windows_file(), windows, None)]
+
+def _write_scores(changes) -> bool:
+    """
+    Ghi bản chụp ra SCORES_FILE (và bucket ngày/tuần ra score_windows.json).  Ở chế độ sharded
+    nhiều worker dùng chung file: giữ khoá, đọc bản trên đĩa, chỉ thay guild vừa đổi (mỗi
+    guild chỉ thuộc một shard) rồi os.replace để không bao giờ để lại file ghi dở.
+    """
     try:
-        with SCORES_FILE.open("w", encoding="utf-8") as f:
-            json.dump(all_scores, f, ensure_ascii=False, indent=2)
+        with SCORE_COMMIT_SECONDS.time(), _scores_lock():
+            for path, data, indent in changes:
+                merged = _read_scores_file(path)
+                merged.update(data)
+                tmp = path.with_name(f"{path.name}.tmp{os.getpid()}")
+                with tmp.open("w", encoding="utf-8") as f:
+                    json.dump(merged, f, ensure_ascii=False, indent=indent)
+                os.replace(tmp, path)
+        return True
     except Exception as e:
         print("Failed to save scores:", e)
+        return False
+
+def save_scores(guild_id=None):
+    """Ghi ngay (chặn luồng gọi).  Không truyền guild_id = ghi mọi guild."""
+    _write_scores(_score_changes(None if guild_id is None else [str(guild_id)]))
+
+# add_score không ghi đĩa trên event loop: đánh dấu guild, SCORE_SAVE_DELAY giây sau ghi gộp
+# mọi guild đã đổi trong executor (mỗi lúc chỉ một lần ghi), và ghi nốt khi thoát
+SCORE_SAVE_DELAY = 2.0
+_dirty_guilds = set()
+_save_handle = None
+_save_running = False
+
+def _schedule_score_save():
+    global _save_handle
+    if _save_handle is not None:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        flush_scores()
+        return
+    _save_handle = loop.call_later(SCORE_SAVE_DELAY, _save_scores_later, loop)
+
+def _save_scores_later(loop):
+    global _save_handle, _save_running, _dirty_guilds
+    _save_handle = None
+    if _save_running:
+        _schedule_score_save()
+        return
+    dirty, _dirty_guilds = _dirty_guilds, set()
+    if not dirty:
+        return
+    # chụp trên event loop: thread ghi không được duyệt dict đang bị cộng điểm
+    changes = _score_changes(sorted(dirty))
+    _save_running = True
+
+    def done(fut):
+        global _save_running
+        _save_running = False
+        if fut.cancelled() or fut.exception() is not None or not fut.result():
+            _dirty_guilds.update(dirty)
+            _schedule_score_save()
+
+    loop.run_in_executor(None, _write_scores, changes).add_done_callback(done)
+
+def flush_scores():
+    """Ghi ngay các guild còn chờ (khi thoát)."""
+    global _dirty_guilds
+    dirty, _dirty_guilds = _dirty_guilds, set()
+    if dirty:
+        _write_scores(_score_changes(sorted(dirty)))
+
+atexit.register(flush_scores)
+
+def add_score(guild_id, uid, points: int):
+    """Cộng điểm: tổng all-time và bucket theo giờ (bảng ngày/tuần); ghi đĩa gộp, ngoài event loop."""
+    guild_id, uid = str(guild_id), str(uid)
+    all_scores.setdefault(guild_id, {})
+    all_scores[guild_id][uid] = all_scores[guild_id].get(uid, 0) + points
+    score_windows.add(guild_id, uid, points)
+    global_board.update(guild_id, uid, all_scores[guild_id][uid])
+    _dirty_guilds.add(guild_id)
+    _schedule_score_save()
 
 def is_r2_enabled():
     """Check if R2 is configured"""
@@ -121,6 +394,10 @@ looping_channels = set()
 looping_settings = {}
 scheduled_tasks = {}
 
+ACTIVE_GAMES.set_function(lambda: len(games))
+SCHEDULED_TASKS.set_function(lambda: len(scheduled_tasks))
+LOOPING_CHANNELS.set_function(lambda: len(looping_channels))
+
 # Import từ matching
 # --- Robust fuzzy matching logic (token-aware) ---
 EXACT_LEN = 4
@@ -0,0 +1,65 @@
+"""CPU-bound job functions run in the job pool's worker processes (see ``jobs.py``).
+
+Workers are started with ``spawn`` and import this module by name, so it only
+imports the standard library at module level: no config, no discord, no game
+tables that every worker would otherwise load again.
+"""
+
+import io
+import json
+import time
+
+
+def timed_call(fn, args, kwargs):
+    """Run ``fn`` and report when it started and finished (wall clock, comparable across processes)."""
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return result, started, time.time()
+
+
+def silhouette_mask(rgba, bg_tolerance: int = 24):
+    """
+    uint8 mask (255 = figure) from an HxWx{3,4} array.  With an alpha channel the
+    mask *is* the alpha; flat RGB art (``_blackbg``/``_whitebg``) is cut out by
+    distance from the background colour, taken as the median of the border pixels.
+    """
+    import numpy as np
+
+    if rgba.ndim == 3 and rgba.shape[2] == 4:
+        alpha = rgba[..., 3]
+        if alpha.min() < 255:
+            return np.ascontiguousarray(alpha)
+    rgb = rgba[..., :3].astype(np.int16)
+    border = np.concatenate([rgb[0], rgb[-1], rgb[:, 0], rgb[:, -1]])
+    bg = np.median(border, axis=0).astype(np.int16)
+    dist = np.abs(rgb - bg).max(axis=2)
+    return np.where(dist > bg_tolerance, 255, 0).astype(np.uint8)
+
+
+def silhouette_png(data: bytes, compress_level: int = 6) -> bytes:
+    """Silhouette PNG (white figure on black, like the ``[alpha]`` objects) from full-art PNG bytes."""
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        if img.mode not in ("RGBA", "RGB"):
+            img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+        arr = np.asarray(img)
+    mask = silhouette_mask(arr)
+    out = io.BytesIO()
+    Image.fromarray(mask).save(out, format="PNG", compress_level=compress_level)
+    return out.getvalue()
+
+
+def parse_json_file(path: str, unwrap_map: bool = False):
+    """Parse a JSON file like ``utils.safe_load_json``; ``unwrap_map`` returns ``data["map"]`` if present."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if unwrap_map:
+        if isinstance(data, dict) and "map" in data:
+            return data["map"]
+        return data if isinstance(data, dict) else {}
+    return data
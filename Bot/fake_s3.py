@@ -0,0 +1,235 @@
+"""In-process S3-compatible server for tests and benchmarks.
+
+Serves any ``StorageBackend`` (usually ``MemoryBackend`` or ``LocalBackend``)
+over the subset of the S3 API the bot uses: ListObjectsV2, HeadObject and
+GetObject with ``Range``.  Point ``R2Backend`` at ``server.url`` to exercise
+the real boto3 path on a laptop.  Latency, latency spikes, throttling and
+errors can be injected and changed while the server runs::
+
+    with FakeS3Server(MemoryBackend(objects)) as srv:
+        srv.faults.latency = 0.05
+        backend = R2Backend("test", "test", srv.bucket, srv.url)
+"""
+
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+from .storage import ObjectNotFound
+
+_LIST_PAGE_SIZE = 1000
+
+
+@dataclass
+class FaultConfig:
+    latency: float = 0.0          # seconds added to every request
+    jitter: float = 0.0           # uniform extra 0..jitter seconds
+    spike_rate: float = 0.0       # probability of a latency spike
+    spike_latency: float = 0.0    # seconds added on a spike
+    error_rate: float = 0.0       # probability of a 500 InternalError
+    throttle_rps: float = 0.0     # >0: requests over this rate get 503 SlowDown
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients hanging up on a slow response (read deadlines, losing hedged reads) are expected
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class _Counters:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.spikes = 0
+        self.bytes_sent = 0
+
+    def snapshot(self):
+        with self.lock:
+            return {"requests": self.requests, "errors": self.errors, "throttled": self.throttled,
+                    "spikes": self.spikes, "bytes_sent": self.bytes_sent}
+
+
+class FakeS3Server:
+    """Threaded HTTP server speaking enough S3 for ``R2Backend``."""
+
+    def __init__(self, backend, bucket: str = "fake-bucket", host: str = "127.0.0.1", port: int = 0,
+                 faults: FaultConfig = None, seed: int = None):
+        self.backend = backend
+        self.bucket = bucket
+        self.faults = faults or FaultConfig()
+        self.counters = _Counters()
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._tokens = 0.0
+        self._tokens_at = time.monotonic()
+        self._httpd = _HTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-s3", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- fault injection ---
+    def _random(self) -> float:
+        with self._rng_lock:
+            return self._rng.random()
+
+    def _throttled(self) -> bool:
+        rps = self.faults.throttle_rps
+        if rps <= 0:
+            return False
+        with self._rng_lock:
+            now = time.monotonic()
+            self._tokens = min(rps, self._tokens + (now - self._tokens_at) * rps)
+            self._tokens_at = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return False
+            return True
+
+    def _inject(self):
+        """Sleep for the configured latency; return an (status, code) error to send, or None."""
+        f = self.faults
+        delay = f.latency + (f.jitter * self._random() if f.jitter else 0.0)
+        if f.spike_rate and self._random() < f.spike_rate:
+            delay += f.spike_latency
+            with self.counters.lock:
+                self.counters.spikes += 1
+        if delay > 0:
+            time.sleep(delay)
+        if self._throttled():
+            with self.counters.lock:
+                self.counters.throttled += 1
+            return 503, "SlowDown"
+        if f.error_rate and self._random() < f.error_rate:
+            with self.counters.lock:
+                self.counters.errors += 1
+            return 500, "InternalError"
+        return None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt, *args):
+                pass
+
+            def _send(self, status, body=b"", headers=None, head_only=False):
+                self.send_response(status)
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body and not head_only:
+                    self.wfile.write(body)
+                    with server.counters.lock:
+                        server.counters.bytes_sent += len(body)
+
+            def _error(self, status, code, head_only=False):
+                body = (f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code>'
+                        f'<Message>{code}</Message></Error>').encode()
+                self._send(status, body, {"Content-Type": "application/xml"}, head_only)
+
+            def _route(self):
+                parts = urlsplit(self.path)
+                path = unquote(parts.path).lstrip("/")
+                bucket, _, key = path.partition("/")
+                return bucket, key, parse_qs(parts.query)
+
+            def _handle(self, head_only):
+                with server.counters.lock:
+                    server.counters.requests += 1
+                injected = server._inject()
+                if injected:
+                    return self._error(*injected, head_only=head_only)
+                bucket, key, query = self._route()
+                if bucket != server.bucket:
+                    return self._error(404, "NoSuchBucket", head_only)
+                if not key:
+                    return self._list(query)
+                try:
+                    info = server.backend.head(key)
+                except ObjectNotFound:
+                    return self._error(404, "NoSuchKey", head_only)
+                headers = {"ETag": f'"{info.etag}"', "Content-Type": "application/octet-stream",
+                           "Last-Modified": formatdate(usegmt=True), "Accept-Ranges": "bytes"}
+                if head_only:
+                    self.send_response(200)
+                    for k, v in headers.items():
+                        self.send_header(k, v)
+                    self.send_header("Content-Length", str(info.size))
+                    self.end_headers()
+                    return
+                rng = self.headers.get("Range")
+                if rng and rng.startswith("bytes="):
+                    start_s, _, end_s = rng[6:].partition("-")
+                    if start_s:
+                        start = int(start_s)
+                        end = min(int(end_s), info.size - 1) if end_s else info.size - 1
+                    else:
+                        start, end = max(info.size - int(end_s), 0), info.size - 1
+                    if start >= info.size or start > end:
+                        return self._error(416, "InvalidRange")
+                    body = server.backend.get_range(key, start, end)
+                    headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+                    return self._send(206, body, headers)
+                return self._send(200, server.backend.get_bytes(key), headers)
+
+            def _list(self, query):
+                prefix = query.get("prefix", [""])[0]
+                max_keys = int(query.get("max-keys", [_LIST_PAGE_SIZE])[0])
+                token = query.get("continuation-token", [""])[0]
+                objs = sorted(server.backend.list(prefix), key=lambda o: o.key)
+                if token:
+                    objs = [o for o in objs if o.key > token]
+                page, truncated = objs[:max_keys], len(objs) > max_keys
+                items = "".join(
+                    f"<Contents><Key>{escape(o.key)}</Key><Size>{o.size}</Size>"
+                    f"<ETag>&quot;{o.etag}&quot;</ETag><StorageClass>STANDARD</StorageClass></Contents>"
+                    for o in page)
+                nxt = f"<NextContinuationToken>{escape(page[-1].key)}</NextContinuationToken>" if truncated else ""
+                body = ('<?xml version="1.0" encoding="UTF-8"?>'
+                        '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                        f"<Name>{escape(server.bucket)}</Name><Prefix>{escape(prefix)}</Prefix>"
+                        f"<KeyCount>{len(page)}</KeyCount><MaxKeys>{max_keys}</MaxKeys>"
+                        f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>{nxt}{items}"
+                        "</ListBucketResult>").encode()
+                self._send(200, body, {"Content-Type": "application/xml"})
+
+            def do_GET(self):
+                self._handle(head_only=False)
+
+            def do_HEAD(self):
+                self._handle(head_only=True)
+
+        return Handler
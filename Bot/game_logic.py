@@ -1,16 +1,19 @@
 """Game logic module for WhoThatOperator bot."""
 
-import os
+import io
 import random
-import asyncio
 import discord
 
-from .config import is_r2_enabled
-from .image_processing import download_r2_object
+from .storage import fetch_object
+from .metrics import UPLOAD_SECONDS
+from .tracing import span
+from .log import get_logger
+
+log = get_logger("reveal")
 
 # Game state management
 
-async def reveal_answer(channel: discord.TextChannel, char):
+async def reveal_answer(channel: discord.TextChannel, char, trace=None):
     """Reveal the full character image after guessing."""
     reveal_name = None
     if isinstance(char, dict):
@@ -20,22 +23,12 @@ async def reveal_answer(channel: discord.TextChannel, char):
     
     try:
         full_choice = None
-        # prefer fulls from the chosen_pair_id if available
         if isinstance(char, dict):
-            chosen_pair = char.get('_chosen_pair_id')
-            if chosen_pair and char.get('variants'):
-                for v in char.get('variants'):
-                    if (v.get('pair_id') == chosen_pair or v.get('skin_name') == chosen_pair) and v.get('fulls'):
-                        full_choice = random.choice(v.get('fulls'))
-                        break
-            # fallback: try to find any variant that contains the chosen silhouette path and use its fulls
-            if not full_choice and char.get('_chosen_silhouette_path') and char.get('variants'):
-                silp = char.get('_chosen_silhouette_path')
-                for v in char.get('variants'):
-                    if silp in (v.get('silhouettes') or []):
-                        if v.get('fulls'):
-                            full_choice = random.choice(v.get('fulls'))
-                            break
+            # a derived silhouette reveals the exact image it was made from;
+            # otherwise start_game already put the variant's fulls in _reveal_fulls
+            full_choice = char.get('_silhouette_source')
+            if not full_choice and char.get('_reveal_fulls'):
+                full_choice = random.choice(char.get('_reveal_fulls'))
             # fallback to aggregated fulls
             if not full_choice:
                 alls = char.get('all_fulls') or []
@@ -45,21 +38,16 @@ async def reveal_answer(channel: discord.TextChannel, char):
                     full_choice = char.get('full')
         
         if full_choice:
-            if is_r2_enabled():
-                try:
-                    file_path = download_r2_object(full_choice)
+            try:
+                with span(trace, "reveal_fetch"):
+                    data = await fetch_object(full_choice)
+                with span(trace, "reveal_upload"), UPLOAD_SECONDS.labels("reveal").time():
                     await channel.send(
-                        file=discord.File(file_path, filename="full.png"),
+                        file=discord.File(io.BytesIO(data), filename="full.png"),
                         content=f"Đáp án: **{reveal_name}**"
                     )
-                    os.unlink(file_path)
-                except Exception as e:
-                    print(f"Failed to download from R2: {e}")
-                    await channel.send(f"Đáp án: **{reveal_name}** (lỗi tải ảnh)")
-            else:
-                await channel.send(
-                    file=discord.File(full_choice, filename="full.png"),
-                    content=f"Đáp án: **{reveal_name}**"
-                )
+            except Exception as e:
+                log.warning("reveal_fetch_failed", channel=channel.id, key=full_choice, error=str(e))
+                await channel.send(f"Đáp án: **{reveal_name}** (lỗi tải ảnh)")
     except Exception as e:
-        print("Failed to send reveal answer:", e)
+        log.error("reveal_failed", channel=getattr(channel, "id", None), error=str(e))
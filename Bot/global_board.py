@@ -0,0 +1,107 @@
+"""Cross-guild leaderboard from per-guild top-K lists.
+
+Each guild keeps its K best players as a sorted list.  The global board is
+built once by a k-way merge of those lists (``heapq.merge``), counting each
+player once, at their best guild.  After that it is kept up to date
+incrementally: ``update`` is called with a player's new total on every score
+change and touches one guild list and the global list, O(log K) + a list
+insert each.
+
+Scores only ever go up, which is what makes the incremental global list
+exact.  A player who drops out of the global top K had a best score at or
+below the K-th score at that moment, and the K-th score never goes down.
+They can only come back with a new total above it in some guild, and that
+total is then their best.
+"""
+
+import bisect
+import heapq
+
+
+class TopK:
+    """The k highest (score, uid) of one guild, best first."""
+    __slots__ = ("k", "rows", "scores")
+
+    def __init__(self, k: int):
+        self.k = k
+        self.rows = []     # (-score, uid), ascending = best first
+        self.scores = {}   # uid -> score for the rows above
+
+    def update(self, uid: str, score: int) -> bool:
+        """Record a new total; returns whether the list changed."""
+        old = self.scores.get(uid)
+        if old is not None:
+            if old == score:
+                return False
+            del self.rows[bisect.bisect_left(self.rows, (-old, uid))]
+        elif len(self.rows) >= self.k and (-score, uid) >= self.rows[-1]:
+            return False
+        bisect.insort(self.rows, (-score, uid))
+        self.scores[uid] = score
+        if len(self.rows) > self.k:
+            _, evicted = self.rows.pop()
+            del self.scores[evicted]
+        return True
+
+
+class GlobalBoard:
+    def __init__(self, k: int = 100):
+        self.k = k
+        self.guilds = {}                 # guild id -> TopK
+        self.rows = []                   # (-score, uid, guild id), best first
+        self.best = {}                   # uid -> (score, guild id) for the rows above
+
+    @classmethod
+    def build(cls, scores: dict, k: int = 100):
+        board = cls(k)
+        board.load(scores)
+        return board
+
+    def load(self, scores: dict):
+        """(Re)build from {guild id: {uid: score}}: per-guild top-K, then one k-way merge."""
+        k = self.k
+        guilds, rows, best = {}, [], {}
+        for gid, users in scores.items():
+            top = guilds[gid] = TopK(k)
+            for uid, score in heapq.nlargest(k, users.items(), key=lambda kv: kv[1]):
+                top.update(uid, score)
+        for neg, uid, gid in heapq.merge(*([(s, uid, gid) for s, uid in top.rows] for gid, top in guilds.items())):
+            if uid in best:
+                continue
+            best[uid] = (-neg, gid)
+            rows.append((neg, uid, gid))
+            if len(rows) >= k:
+                break
+        self.guilds, self.rows, self.best = guilds, rows, best
+
+    def replace(self, other: "GlobalBoard"):
+        """Take over a board built elsewhere (e.g. in a thread) in one step."""
+        self.guilds, self.rows, self.best = other.guilds, other.rows, other.best
+
+    def update(self, guild_id: str, uid: str, score: int):
+        """A player's total in one guild is now ``score``."""
+        top = self.guilds.get(guild_id)
+        if top is None:
+            top = self.guilds[guild_id] = TopK(self.k)
+        if not top.update(uid, score):
+            return
+        cur = self.best.get(uid)
+        if cur is not None:
+            if score <= cur[0]:
+                return
+            del self.rows[bisect.bisect_left(self.rows, (-cur[0], uid, cur[1]))]
+        elif len(self.rows) >= self.k and (-score, uid, guild_id) >= self.rows[-1]:
+            return
+        bisect.insort(self.rows, (-score, uid, guild_id))
+        self.best[uid] = (score, guild_id)
+        if len(self.rows) > self.k:
+            _, evicted, _ = self.rows.pop()
+            del self.best[evicted]
+
+    def page(self, page: int, size: int = 10):
+        """[(rank, uid, score, guild id)] for a 1-based page."""
+        start = (max(1, page) - 1) * size
+        return [(start + i + 1, uid, -neg, gid) for i, (neg, uid, gid) in enumerate(self.rows[start:start + size])]
+
+    def pages(self, size: int = 10) -> int:
+        return max(1, -(-len(self.rows) // size))
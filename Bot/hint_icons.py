@@ -0,0 +1,103 @@
+"""In-memory hint icon pack for WhoThatOperator bot.
+
+The hint placeholders produced by ``generate_hint_for_char`` only ever point at a
+small, fixed set of icons (class, sub-class and nation logos).  The whole set is
+fetched once at startup and kept as bytes so ``!hint`` never touches R2 or disk.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .storage import StorageBackend, get_backend
+from .utils import EN_JSON, CN_JSON, AMIYA_JSON, class_icon_key, subclass_icon_key, nation_icon_key
+
+# Prefixes of every object a hint placeholder can reference
+HINT_ICON_PREFIXES = ("images/Icon/", "images/subicon/", "images/Logo/")
+HINT_ICON_UNKNOWN = class_icon_key("unknown")
+
+
+class HintIconPack:
+    """Maps hint placeholder keys to icon bytes."""
+
+    def __init__(self):
+        self._icons = {}
+        # R2 keys are case-sensitive but the docs disagree on "Logo_" vs "logo_"
+        self._lower = {}
+
+    def __len__(self):
+        return len(self._icons)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(len(b) for b in self._icons.values())
+
+    def add(self, key: str, data: bytes):
+        self._icons[key] = data
+        self._lower[key.lower()] = key
+
+    def get(self, key: str):
+        """Return icon bytes for a placeholder key, or None if not in the pack."""
+        if not key:
+            return None
+        data = self._icons.get(key)
+        if data is None:
+            real = self._lower.get(key.lower())
+            if real is not None:
+                data = self._icons.get(real)
+        return data
+
+    def load(self, backend: StorageBackend = None):
+        """Fetch the whole icon set from the storage backend (R2 or the local images/ tree)."""
+        backend = backend or get_backend()
+        keys = [obj.key for prefix in HINT_ICON_PREFIXES for obj in backend.list(prefix)
+                if obj.key.lower().endswith('.png')]
+        # the set is small; fetch it with a few threads so R2 round-trips overlap
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for key, data in zip(keys, pool.map(backend.get_bytes, keys)):
+                self.add(key, data)
+        return self
+
+    def validate(self):
+        """Return the icon keys the hint tables can reference but the pack lacks."""
+        return sorted(k for k in expected_hint_icon_keys() if k not in self)
+
+
+def expected_hint_icon_keys() -> set:
+    """Every icon key ``generate_hint_for_char`` can emit for the loaded tables."""
+    keys = {HINT_ICON_UNKNOWN}
+    entries = []
+    for table in (EN_JSON, CN_JSON, AMIYA_JSON.get("patchChars", {})):
+        if isinstance(table, dict):
+            entries.extend(e for e in table.values() if isinstance(e, dict))
+    for entry in entries:
+        profession = entry.get("profession")
+        if profession:
+            keys.add(class_icon_key(profession))
+        sub = entry.get("subProfessionId") or entry.get("subProfession")
+        if sub:
+            keys.add(subclass_icon_key(sub))
+        nation = (entry.get("mainPower") or {}).get("nationId") or entry.get("nationId") or entry.get("nation")
+        if nation:
+            keys.add(nation_icon_key(nation))
+        for sp in entry.get("subPower") or []:
+            if isinstance(sp, dict) and (sp.get("nationId") or sp.get("nation")):
+                keys.add(nation_icon_key(sp.get("nationId") or sp.get("nation")))
+    return keys
+
+
+HINT_ICONS = HintIconPack()
+
+
+def preload_hint_icons() -> HintIconPack:
+    """Load the hint icon pack once and report icons missing for the hint tables."""
+    try:
+        HINT_ICONS.load()
+        missing = HINT_ICONS.validate()
+        print(f"[INIT] hint icons loaded: {len(HINT_ICONS)} icons ({HINT_ICONS.total_bytes} bytes), {len(missing)} missing")
+        if missing:
+            print("[INIT] missing hint icons (first 10):", missing[:10])
+    except Exception as e:
+        print("[INIT] Failed to preload hint icons:", e)
+    return HINT_ICONS
@@ -0,0 +1,95 @@
+"""Process pool for CPU-bound work (image derivatives, big JSON tables).
+
+``await job_pool.submit(fn, *args, kind="json")`` runs ``fn`` in one of
+``JOB_WORKERS`` worker processes, so heavy work never holds the event loop (or
+the GIL) while rounds are running.  At most ``JOB_MAX_PENDING`` jobs are in
+flight; further submitters wait for a slot, or get ``PoolSaturated``
+immediately with ``wait=False``.  Job functions and their arguments must be
+picklable; keep the functions in ``cpu_tasks.py`` so workers import little.
+
+Metrics: ``wto_job_wait_seconds`` (submit -> start in a worker) and
+``wto_job_seconds`` (run time), both by kind, plus errors, rejections and the
+number of jobs in flight.  ``JOB_WORKERS=0`` runs jobs on a thread instead.
+"""
+
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .config import JOB_WORKERS, JOB_MAX_PENDING
+from .cpu_tasks import timed_call
+from .log import get_logger
+from .metrics import Counter, Gauge, Histogram
+
+JOB_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+JOB_WAIT_SECONDS = Histogram("wto_job_wait_seconds", "Time from submit until a worker starts the job, by kind.",
+                             ["kind"], buckets=JOB_BUCKETS)
+JOB_SECONDS = Histogram("wto_job_seconds", "Job run time in the worker, by kind.", ["kind"], buckets=JOB_BUCKETS)
+JOB_ERRORS = Counter("wto_job_errors_total", "Jobs that raised or whose worker died, by kind.", ["kind"])
+JOB_REJECTED = Counter("wto_job_rejected_total", "Jobs refused because the pool was saturated, by kind.", ["kind"])
+JOBS_IN_FLIGHT = Gauge("wto_jobs_in_flight", "Jobs submitted and not finished.")
+
+log = get_logger("jobs")
+
+
+class PoolSaturated(RuntimeError):
+    pass
+
+
+class JobPool:
+    def __init__(self, workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max(1, max_pending)
+        self.in_flight = 0
+        self._executor = None
+        self._slots = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.workers > 0:
+                # spawn: forking a process that runs the loop, log and watchdog threads is unsafe
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._executor = ThreadPoolExecutor(1, thread_name_prefix="job")
+        return self._executor
+
+    async def submit(self, fn, *args, kind: str = "job", wait: bool = True, timeout: float = None, **kwargs):
+        """Run ``fn(*args, **kwargs)`` in the pool and return its result."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        if not wait and self._slots.locked():
+            JOB_REJECTED.labels(kind).inc()
+            raise PoolSaturated(f"{self.max_pending} jobs already in flight")
+        queued = time.time()
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                fut = asyncio.get_running_loop().run_in_executor(
+                    self._get_executor(), timed_call, fn, args, kwargs)
+                result, started, finished = await asyncio.wait_for(fut, timeout)
+            except BrokenProcessPool:
+                # a worker died (OOM, segfault): start a fresh pool for the next job
+                JOB_ERRORS.labels(kind).inc()
+                log.error("job_pool_broken", kind=kind)
+                broken, self._executor = self._executor, None
+                broken.shutdown(wait=False, cancel_futures=True)
+                raise
+            except Exception:
+                JOB_ERRORS.labels(kind).inc()
+                raise
+            finally:
+                self.in_flight -= 1
+        JOB_WAIT_SECONDS.labels(kind).observe(max(0.0, started - queued))
+        JOB_SECONDS.labels(kind).observe(max(0.0, finished - started))
+        return result
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+job_pool = JobPool()
+JOBS_IN_FLIGHT.set_function(lambda: job_pool.in_flight)
@@ -0,0 +1,120 @@
+"""Local filesystem image backend for WhoThatOperator bot.
+
+Scans an images tree laid out like the R2 bucket (``images/Char/``,
+``images/Skin/`` ...) and returns object keys relative to the root, so the
+catalog built from it has exactly the same shape as the R2 one.
+
+A scan index (directory mtime -> listing) is persisted next to the logs; on a
+rescan a directory whose mtime did not change is only stat-ed, not listed.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .config import LOCAL_IMAGES_ROOT, LOCAL_SCAN_INDEX_PATH
+from .log import get_logger
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+_SCAN_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+log = get_logger("local_images")
+
+
+def _load_index(index_path):
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict) and data.get("root") and isinstance(data.get("dirs"), dict):
+            return data
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log.warning("scan_index_unreadable", path=str(index_path), error=str(e))
+    return {"root": None, "dirs": {}}
+
+
+def _save_index(index_path, data):
+    tmp = f"{index_path}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, index_path)
+    except Exception as e:
+        log.warning("scan_index_save_failed", path=str(index_path), error=str(e))
+
+
+def _scan_dir(root: str, rel: str, cached):
+    """List one directory, reusing the cached listing when its mtime is unchanged."""
+    path = os.path.join(root, rel)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return rel, None, False
+    if cached and cached.get("mtime_ns") == mtime_ns:
+        return rel, cached, False
+
+    files, dirs = [], []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=True):
+                dirs.append(entry.name)
+            elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                files.append(entry.name)
+    files.sort()
+    dirs.sort()
+    return rel, {"mtime_ns": mtime_ns, "files": files, "dirs": dirs}, True
+
+
+def scan_images(prefixes, root=None, index_path=None):
+    """
+    Return every image object key under ``prefixes`` (e.g. ``images/Char/``).
+    Directories of the same depth are scanned in parallel.
+    """
+    root = str(root or LOCAL_IMAGES_ROOT)
+    index_path = index_path or LOCAL_SCAN_INDEX_PATH
+    index = _load_index(index_path)
+    old_dirs = index["dirs"] if index.get("root") == root else {}
+    new_dirs = {}
+    listed = 0
+
+    level = [p.strip("/") for p in prefixes]
+    with ThreadPoolExecutor(max_workers=_SCAN_WORKERS) as pool:
+        while level:
+            results = pool.map(lambda rel: _scan_dir(root, rel, old_dirs.get(rel)), level)
+            level = []
+            for rel, info, relisted in results:
+                if info is None:
+                    continue
+                if relisted:
+                    listed += 1
+                new_dirs[rel] = info
+                level.extend(f"{rel}/{d}" for d in info["dirs"])
+
+    keys = [f"{rel}/{name}" for rel, info in new_dirs.items() for name in info["files"]]
+    # keep index entries of prefixes that were not part of this scan
+    scanned = [p.strip("/") for p in prefixes]
+    merged = {rel: info for rel, info in old_dirs.items()
+              if not any(rel == p or rel.startswith(p + "/") for p in scanned)}
+    merged.update(new_dirs)
+    if merged != old_dirs:
+        _save_index(index_path, {"root": root, "dirs": merged})
+    log.info("local_scan", dirs=len(new_dirs), relisted=listed, images=len(keys))
+    return keys
+
+
+def local_object_path(object_key: str, root=None) -> Path:
+    """Resolve an object key to a path inside the images root."""
+    base = Path(root or LOCAL_IMAGES_ROOT).resolve()
+    path = (base / object_key).resolve()
+    if base != path and base not in path.parents:
+        raise ValueError(f"object key escapes images root: {object_key}")
+    return path
+
+
+def read_local_object(object_key: str, root=None) -> bytes:
+    """Read an object's bytes from disk."""
+    with open(local_object_path(object_key, root), "rb") as f:
+        return f.read()
@@ -0,0 +1,115 @@
+"""Non-blocking structured logging for WhoThatOperator bot.
+
+Hot paths log through ``get_logger(name)``, which only builds a ``LogRecord``
+and drops it on a bounded queue; formatting and writing to stdout happen on a
+background listener thread, so a slow stdout pipe never stalls the event loop.
+When the queue is full records are dropped (and counted) instead of blocking.
+
+    log = get_logger("round")
+    log.info("round_start", channel=cid, key=key, variant=pair)
+    log.sampled("guess", LOG_GUESS_SAMPLE, channel=cid, score=0.42)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+
+from .config import LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_SIZE
+from .metrics import Counter
+
+LOG_RECORDS_DROPPED = Counter("wto_log_records_dropped_total", "Log records dropped because the queue was full.")
+
+_setup_lock = threading.Lock()
+_listener = None
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never formats on the caller thread and never blocks."""
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class _StructFormatter(logging.Formatter):
+    def __init__(self, as_json: bool):
+        super().__init__()
+        self.as_json = as_json
+
+    def format(self, record):
+        fields = getattr(record, "fields", None) or {}
+        if self.as_json:
+            doc = {"ts": round(record.created, 3), "level": record.levelname, "logger": record.name,
+                   "event": record.getMessage(), **fields}
+            if record.exc_info:
+                doc["exc"] = self.formatException(record.exc_info)
+            return json.dumps(doc, ensure_ascii=False, default=str)
+        line = f"{self.formatTime(record, '%Y-%m-%d %H:%M:%S')} {record.levelname:<5} {record.name} {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(f"{k}={v!r}" if isinstance(v, str) and " " in v else f"{k}={v}"
+                                   for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def setup_logging():
+    """Install the queue handler on the ``wto`` logger and start the writer thread (idempotent)."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        q = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        out = logging.StreamHandler(sys.stdout)
+        out.setFormatter(_StructFormatter(LOG_FORMAT == "json"))
+        root = logging.getLogger("wto")
+        root.setLevel(getattr(logging, str(LOG_LEVEL).upper(), logging.INFO))
+        root.addHandler(_DroppingQueueHandler(q))
+        root.propagate = False
+        _listener = logging.handlers.QueueListener(q, out, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+class StructLogger:
+    """Logger taking an event name plus keyword fields."""
+
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(f"wto.{name}")
+
+    def _log(self, level, event, fields, exc_info=None):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, extra={"fields": fields}, exc_info=exc_info)
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event, exc_info=None, **fields):
+        self._log(logging.ERROR, event, fields, exc_info)
+
+    def sampled(self, event, rate: float, level=logging.INFO, **fields):
+        """Log only a ``rate`` fraction of calls (for per-guess and other high-volume events)."""
+        if rate >= 1.0 or (rate > 0.0 and random.random() < rate):
+            fields["sample_rate"] = rate
+            self._log(level, event, fields)
+
+
+def get_logger(name: str) -> StructLogger:
+    setup_logging()
+    return StructLogger(name)
@@ -0,0 +1,228 @@
+"""Prometheus-style metrics for WhoThatOperator bot.
+
+A tiny, dependency-free registry of counters, gauges and histograms rendered in
+the Prometheus text exposition format by ``render()``; ``main.py`` serves it on
+``/metrics``.  Every metric is safe to update from executor threads.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_REGISTRY = []
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt_value(v) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        if not self.labelnames:
+            self._default()
+        _REGISTRY.append(self)
+
+    def labels(self, *values, **kwvalues):
+        if kwvalues:
+            values = tuple(kwvalues[n] for n in self.labelnames)
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        # metrics without labels act as their own single child
+        return self.labels()
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.samples(self.name, self.labelnames, key))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = float(value)
+
+    def samples(self, name, names, key):
+        return [f"{name}{_fmt_labels(names, key)} {_fmt_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), func=None):
+        super().__init__(name, documentation, labelnames)
+        self._func = func
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount=1.0):
+        self._default().dec(amount)
+
+    def set_function(self, func):
+        """Compute the value at scrape time (e.g. ``len(games)``)."""
+        self._func = func
+
+    def collect(self):
+        if self._func is not None:
+            try:
+                self._default().set(self._func())
+            except Exception:
+                pass
+        return super().collect()
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    self.counts[i] += 1
+                    break
+
+    @contextmanager
+    def time(self):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0)
+
+    def samples(self, name, names, key):
+        out, acc = [], 0
+        for b, c in zip(self.buckets, self.counts):
+            acc += c
+            le = 'le="%s"' % _fmt_value(b)
+            out.append(f"{name}_bucket{_fmt_labels(names, key, [le])} {acc}")
+        inf = 'le="+Inf"'
+        out.append(f"{name}_bucket{_fmt_labels(names, key, [inf])} {self.count}")
+        out.append(f"{name}_sum{_fmt_labels(names, key)} {_fmt_value(self.sum)}")
+        out.append(f"{name}_count{_fmt_labels(names, key)} {self.count}")
+        return out
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(float(b) for b in buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+def render() -> str:
+    """Return every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+# --- bot metrics ---
+ROUNDS_STARTED = Counter("wto_rounds_started_total", "Rounds started.")
+ROUNDS_ENDED = Counter("wto_rounds_ended_total", "Rounds ended, by outcome.", ["outcome"])
+GUESS_CHECK_SECONDS = Histogram("wto_guess_check_seconds", "Time to check one guess against the answer.",
+                                buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05))
+STORAGE_FETCH_SECONDS = Histogram("wto_storage_fetch_seconds", "Image fetch latency, by backend.", ["backend"])
+STORAGE_FETCH_BYTES = Histogram("wto_storage_fetch_bytes", "Image fetch size, by backend.", ["backend"],
+                                buckets=BYTES_BUCKETS)
+STORAGE_FETCH_ERRORS = Counter("wto_storage_fetch_errors_total", "Failed image fetches, by backend.", ["backend"])
+STORAGE_FETCH_RETRIES = Counter("wto_storage_fetch_retries_total", "Image fetch attempts retried, by backend and reason.",
+                                ["backend", "reason"])
+STORAGE_FETCH_HEDGES = Counter("wto_storage_fetch_hedges_total", "Hedged image fetches, by backend and result.",
+                               ["backend", "result"])
+UPLOAD_SECONDS = Histogram("wto_upload_seconds", "Discord upload latency, by kind.", ["kind"])
+SCORE_COMMIT_SECONDS = Histogram("wto_score_commit_seconds", "Time to persist the score store.")
+CATALOG_SIZE = Gauge("wto_catalog_characters", "Characters in the loaded catalog.")
+ROUND_POOL_SIZE = Gauge("wto_round_pool_entries", "Playable (character, variant, silhouette) entries.")
+ACTIVE_GAMES = Gauge("wto_active_games", "Channels with a round in progress.")
+SCHEDULED_TASKS = Gauge("wto_scheduled_tasks", "Pending next-round tasks.")
+LOOPING_CHANNELS = Gauge("wto_looping_channels", "Channels in loop mode.")
+LOOP_LAG_SECONDS = Histogram("wto_event_loop_lag_seconds", "Event-loop scheduling lag.")
+LOOP_LAG_LAST = Gauge("wto_event_loop_lag_last_seconds", "Most recent event-loop lag sample.")
+
+
+async def monitor_loop_lag(interval: float = 0.5):
+    """Sample how late the event loop wakes a sleeping task; runs until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - t0 - interval)
+        LOOP_LAG_SECONDS.observe(lag)
+        LOOP_LAG_LAST.set(lag)
@@ -0,0 +1,90 @@
+"""Catalog-wide trigram index: "which operator is this guess closest to?"
+
+Built at catalog load from the alias matchers (every whole alias, plus alias
+tokens of 4+ characters, each pointing at its catalog index).  ``nearest``
+counts shared trigrams through the posting lists, keeps the few forms with
+the best Dice overlap and confirms them with a SequenceMatcher ratio, so a
+failed guess is checked against the whole catalog without a linear scan.
+``on_message`` uses it to log confusion pairs (the guess named a different
+real operator) and, with ``NEAR_MISS_FEEDBACK``, to react to such guesses.
+"""
+
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from .metrics import Counter, Histogram
+
+NEAR_MISS = Counter("wto_guess_near_miss_total", "Failed guesses close to an operator name, by whose name it was.", ["kind"])
+NEAR_MISS_SECONDS = Histogram("wto_near_miss_lookup_seconds", "Time to find the nearest operator to a failed guess.",
+                              buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01))
+
+MIN_TOKEN = 4
+
+
+def trigrams(s: str) -> set:
+    """Padded character trigrams, so short and CJK names still get a few."""
+    s = f"  {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class TrigramIndex:
+    def __init__(self):
+        self.forms = []      # normalized name or token
+        self.owners = []     # catalog index per form
+        self.sizes = []      # trigram count per form
+        self._postings = defaultdict(list)
+        self._form_ids = {}
+
+    def add(self, form: str, owner: int):
+        if not form or (form, owner) in self._form_ids:
+            return
+        fid = self._form_ids[(form, owner)] = len(self.forms)
+        grams = trigrams(form)
+        self.forms.append(form)
+        self.owners.append(owner)
+        self.sizes.append(len(grams))
+        for g in grams:
+            self._postings[g].append(fid)
+
+    def nearest(self, guess: str, threshold: float = 0.8, candidates: int = 8):
+        """(catalog index, form, ratio) of the closest form to a normalized guess, or None below threshold."""
+        if not guess:
+            return None
+        grams = trigrams(guess)
+        shared = defaultdict(int)
+        postings = self._postings
+        for g in grams:
+            for fid in postings.get(g, ()):
+                shared[fid] += 1
+        if not shared:
+            return None
+        n = len(grams)
+        sizes = self.sizes
+        # Dice coefficient on trigram sets; only the best few get the exact ratio
+        ranked = sorted(shared, key=lambda fid: 2 * shared[fid] / (n + sizes[fid]), reverse=True)[:candidates]
+        best, best_fid = 0.0, None
+        sm = SequenceMatcher(None, "", guess)
+        for fid in ranked:
+            sm.set_seq1(self.forms[fid])
+            if sm.real_quick_ratio() <= best or sm.quick_ratio() <= best:
+                continue
+            r = sm.ratio()
+            if r > best:
+                best, best_fid = r, fid
+        if best_fid is None or best < threshold:
+            return None
+        return self.owners[best_fid], self.forms[best_fid], best
+
+
+def build_name_index(alias_matchers) -> TrigramIndex:
+    """Index every alias (and its longer tokens) of every catalog entry."""
+    index = TrigramIndex()
+    for owner, ca in enumerate(alias_matchers):
+        if ca is None:
+            continue
+        for ct in ca.aliases:
+            index.add(ct.ta, owner)
+            for tt in ct.significant:
+                if len(tt) >= MIN_TOKEN and tt != ct.ta:
+                    index.add(tt, owner)
+    return index
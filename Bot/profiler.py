@@ -0,0 +1,122 @@
+"""In-process sampling profiler for WhoThatOperator bot.
+
+A daemon thread snapshots every thread's Python stack with
+``sys._current_frames()`` every ``interval`` seconds and counts identical
+stacks.  The result is in the collapsed-stack format read by ``flamegraph.pl``
+and speedscope (``thread;outer;...;inner count`` per line).  Only one profile
+runs at a time; it is started by the admin-only ``!profile`` command or
+``/debug/profile`` on the web server (``ADMIN_TOKEN``).
+"""
+
+import asyncio
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter as _Counter
+
+MAX_PROFILE_SECONDS = 120
+DEFAULT_INTERVAL = 0.005
+
+# leaf frames of threads that are only waiting (selector, locks, queues)
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("socketserver.py", "serve_forever"),
+}
+
+_busy = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _thread_label(name: str) -> str:
+    # ThreadPoolExecutor-0_3 -> ThreadPoolExecutor-0 so workers share one root
+    return re.sub(r"_\d+$", "", name).replace(";", ":").replace(" ", "_")
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = DEFAULT_INTERVAL, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks = _Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        me = threading.get_ident()
+        names, names_at = {}, 0.0
+        t0 = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            if now - names_at > 1.0:
+                names = {t.ident: _thread_label(t.name) for t in threading.enumerate()}
+                names_at = now
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                code = frame.f_code
+                if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+        self.duration = time.perf_counter() - t0
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, n: int = 10):
+        """(self samples, function) for the hottest leaf frames."""
+        leaves = _Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return [(count, name) for name, count in leaves.most_common(n)]
+
+    def summary(self, n: int = 10) -> str:
+        total = sum(self.stacks.values()) or 1
+        lines = [f"{self.samples} samples in {self.duration:.1f}s (interval {self.interval * 1000:.1f} ms)"]
+        for count, name in self.top_functions(n):
+            lines.append(f"{count / total:6.1%}  {name}")
+        return "\n".join(lines)
+
+
+async def run_profile(seconds: float, interval: float = DEFAULT_INTERVAL, include_idle: bool = False) -> SamplingProfiler:
+    """Profile the whole process for ``seconds`` without blocking the event loop."""
+    seconds = max(0.1, min(float(seconds), MAX_PROFILE_SECONDS))
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    prof = SamplingProfiler(interval, include_idle)
+    try:
+        prof.start()
+        await asyncio.sleep(seconds)
+    finally:
+        prof.stop()
+        _busy.release()
+    return prof
@@ -0,0 +1,225 @@
+"""Append-only round history in fixed-width binary records.
+
+``end_round`` hands every finished round to ``record``.  The caller only packs
+one 112-byte struct and puts it on a queue.  A background thread appends
+batches to ``ROUND_LOG_DIR/rounds-YYYYMMDD[-<worker>].r2``: one file per UTC
+day, per worker process in sharded mode, so old days can simply be deleted.
+Whatever is still queued at exit is written by an atexit hook.
+Because the records are fixed-width, a file is a NumPy structured array, and
+the query tool aggregates it with vectorized operations::
+
+    python -m Bot.round_log [--days 7] [--top 15]
+
+It reports per-operator solve rate and median solve time, and per-channel
+rounds, guesses and idle time.
+"""
+
+import argparse
+import atexit
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .config import ROUND_LOG_DIR, ROUND_OUTCOMES, SHARD_IDS
+from .log import get_logger
+
+# started_at, solve ms (0 = unsolved), channel, guild, winner (0 = none), admitted guesses,
+# outcome index, flags, operator key, variant (skin pair_id); padded to 112 bytes
+RECORD = struct.Struct("<dIQQQIBB32s32s6x")
+DTYPE_FIELDS = [("started_at", "<f8"), ("solve_ms", "<u4"), ("channel", "<u8"), ("guild", "<u8"),
+                ("winner", "<u8"), ("guesses", "<u4"), ("outcome", "u1"), ("flags", "u1"),
+                ("key", "S32"), ("variant", "S32"), ("_pad", "V6")]
+FLAG_DERIVED = 1  # silhouette derived from full art
+# bumped with the record layout (.r1 = the earlier 80-byte records)
+SUFFIX = ".r2"
+
+log = get_logger("round_log")
+
+_queue = queue.SimpleQueue()
+_writer = None
+_writer_lock = threading.Lock()
+# the writer thread and the exit drain append to the same file
+_file_lock = threading.Lock()
+
+
+def _file_for(ts: float) -> Path:
+    worker = "-" + "_".join(map(str, SHARD_IDS)) if SHARD_IDS else ""
+    return ROUND_LOG_DIR / f"rounds-{time.strftime('%Y%m%d', time.gmtime(ts))}{worker}{SUFFIX}"
+
+
+def pack(state) -> bytes:
+    """The record for a finished GameState."""
+    cur = state.current or {}
+    started = state.started_at or datetime.utcnow()
+    solve_ms = 0
+    if state.outcome == "won" and state.solved_at is not None:
+        solve_ms = max(0, int((state.solved_at - started).total_seconds() * 1000))
+    guild = getattr(getattr(state.channel, "guild", None), "id", 0) or 0
+    return RECORD.pack(
+        started.replace(tzinfo=timezone.utc).timestamp(), solve_ms, state.channel.id, guild, state.winner_id or 0, state.guesses,
+        ROUND_OUTCOMES.index(state.outcome), FLAG_DERIVED if cur.get("_silhouette_source") else 0,
+        str(cur.get("_orig_key") or cur.get("key") or "").encode("utf-8")[:32],
+        str(cur.get("_chosen_pair_id") or "").encode("utf-8")[:32],
+    )
+
+
+def record(state):
+    """Queue a finished round; never blocks and never raises into gameplay."""
+    global _writer
+    try:
+        data = pack(state)
+    except Exception:
+        return
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_writer_main, name="round-log-writer", daemon=True)
+                _writer.start()
+    _queue.put(data)
+
+
+def _append(batch):
+    try:
+        with _file_lock:
+            ROUND_LOG_DIR.mkdir(parents=True, exist_ok=True)
+            with open(_file_for(time.time()), "ab") as f:
+                f.write(b"".join(batch))
+    except Exception as e:
+        log.error("round_log_write_failed", rounds=len(batch), error=str(e))
+
+
+def _take(batch, limit=1024):
+    try:
+        while len(batch) < limit:
+            batch.append(_queue.get_nowait())
+    except queue.Empty:
+        pass
+    return batch
+
+
+def _writer_main():
+    while True:
+        _append(_take([_queue.get()]))
+
+
+def flush():
+    """Write every queued record now (at exit the daemon writer may never get to them)."""
+    while True:
+        batch = _take([])
+        if not batch:
+            return
+        _append(batch)
+
+
+atexit.register(flush)
+
+
+# --- query ---
+def load(paths):
+    """All records of the given files as one NumPy structured array."""
+    import numpy as np
+
+    dtype = np.dtype(DTYPE_FIELDS)
+    assert dtype.itemsize == RECORD.size
+    parts = []
+    for p in paths:
+        size = os.path.getsize(p)
+        # a torn tail (crash mid-write) is ignored
+        parts.append(np.fromfile(p, dtype=dtype, count=size // RECORD.size))
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+
+
+def log_files(directory=ROUND_LOG_DIR, days: int = None):
+    files = sorted(Path(directory).glob(f"rounds-*{SUFFIX}"))
+    if days:
+        cutoff = time.strftime("%Y%m%d", time.gmtime(time.time() - days * 86400))
+        files = [f for f in files if f.name[7:15] >= cutoff]
+    return files
+
+
+def _group_medians(groups, values, n_groups):
+    """Median of ``values`` per group id in ``range(n_groups)`` (NaN for empty groups)."""
+    import numpy as np
+
+    order = np.lexsort((values, groups))
+    g, v = groups[order], values[order].astype(np.float64)
+    counts = np.bincount(g, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    med = np.full(n_groups, np.nan)
+    has = counts > 0
+    lo = starts[has] + (counts[has] - 1) // 2
+    hi = starts[has] + counts[has] // 2
+    med[has] = (v[lo] + v[hi]) / 2
+    return med
+
+
+def operator_stats(rec):
+    """Per-operator rounds, solve rate, median solve seconds, mean guesses (numpy arrays)."""
+    import numpy as np
+
+    keys, inv = np.unique(rec["key"], return_inverse=True)
+    n = len(keys)
+    rounds = np.bincount(inv, minlength=n)
+    played = rec["outcome"] != ROUND_OUTCOMES.index("stopped")
+    won = rec["outcome"] == ROUND_OUTCOMES.index("won")
+    played_n = np.bincount(inv, weights=played, minlength=n)
+    solved = np.bincount(inv, weights=won, minlength=n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = solved / played_n
+        guesses = np.bincount(inv, weights=rec["guesses"], minlength=n) / rounds
+    median = _group_medians(inv[won], rec["solve_ms"][won] / 1000.0, n)
+    return {"key": keys.astype(str), "rounds": rounds, "solve_rate": rate, "median_solve_s": median,
+            "mean_guesses": guesses}
+
+
+def channel_stats(rec, now: float = None):
+    """Per-channel rounds, guesses, last round time and hours idle."""
+    import numpy as np
+
+    chans, inv = np.unique(rec["channel"], return_inverse=True)
+    n = len(chans)
+    last = np.full(n, -np.inf)
+    np.maximum.at(last, inv, rec["started_at"])
+    now = time.time() if now is None else now
+    return {"channel": chans, "rounds": np.bincount(inv, minlength=n),
+            "guesses": np.bincount(inv, weights=rec["guesses"], minlength=n).astype(np.int64),
+            "idle_h": (now - last) / 3600.0}
+
+
+def main(argv=None):
+    import numpy as np
+
+    p = argparse.ArgumentParser(description="Summarize the round log")
+    p.add_argument("--dir", default=str(ROUND_LOG_DIR))
+    p.add_argument("--days", type=int, help="only the last N days of files")
+    p.add_argument("--top", type=int, default=15, help="rows per table")
+    p.add_argument("--min-rounds", type=int, default=3, help="operators with fewer rounds are not ranked")
+    args = p.parse_args(argv)
+
+    files = log_files(args.dir, args.days)
+    t0 = time.perf_counter()
+    rec = load(files)
+    ops = operator_stats(rec)
+    chans = channel_stats(rec)
+    took = time.perf_counter() - t0
+    print(f"{len(rec)} rounds in {len(files)} files, aggregated in {took * 1000:.1f} ms")
+    if not len(rec):
+        return
+
+    print(f"\nhardest operators (lowest solve rate, >= {args.min_rounds} rounds)\n{'key':24} {'rounds':>7} {'solved':>7} {'median s':>9} {'guesses':>8}")
+    eligible = np.flatnonzero(ops["rounds"] >= args.min_rounds)
+    for i in eligible[np.argsort(ops["solve_rate"][eligible], kind="stable")][:args.top]:
+        print(f"{ops['key'][i]:24} {ops['rounds'][i]:7d} {ops['solve_rate'][i]:7.0%} "
+              f"{ops['median_solve_s'][i]:9.1f} {ops['mean_guesses'][i]:8.1f}")
+
+    print(f"\nchannels (most idle first)\n{'channel':>20} {'rounds':>7} {'guesses':>8} {'idle h':>8}")
+    for i in np.argsort(-chans["idle_h"])[:args.top]:
+        print(f"{chans['channel'][i]:20d} {chans['rounds'][i]:7d} {chans['guesses'][i]:8d} {chans['idle_h'][i]:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Day and week leaderboards from rolling score buckets.
+
+Points are added to an hourly bucket and, at the same time, to two running
+totals per guild: the last 24 hours and the last 7 days.  When an hour bucket
+is older than 24 hours, its points are subtracted from the day totals and it
+is folded into a daily bucket.  When a daily bucket is older than 7 days, its
+points are subtracted from the week totals and it is dropped.  A guild
+therefore holds at most 24 hourly and 7 daily buckets, and ``!leaderboard
+day|week`` reads the running totals without any scanning of history.
+
+The buckets are saved next to ``scores.json`` (``score_windows.json``) by
+``config.save_scores``; the running totals are rebuilt from them at load.
+"""
+
+import heapq
+import time
+
+HOUR = 3600
+DAY_HOURS = 24
+WEEK_DAYS = 7
+WINDOWS = ("day", "week")
+
+
+def current_hour(now: float = None) -> int:
+    return int((time.time() if now is None else now) // HOUR)
+
+
+def _add(totals: dict, bucket: dict, sign: int = 1):
+    for uid, pts in bucket.items():
+        v = totals.get(uid, 0) + sign * pts
+        if v:
+            totals[uid] = v
+        else:
+            totals.pop(uid, None)
+
+
+class GuildWindows:
+    __slots__ = ("hours", "days", "day", "week")
+
+    def __init__(self, hours=None, days=None):
+        self.hours = hours or {}   # hour index -> {uid: points}
+        self.days = days or {}     # day index -> {uid: points}, hours older than 24 h
+        self.day = {}
+        self.week = {}
+        for b in self.hours.values():
+            _add(self.day, b)
+            _add(self.week, b)
+        for b in self.days.values():
+            _add(self.week, b)
+
+    def roll(self, hour: int):
+        """Move buckets that fell out of a window; cheap when nothing has expired."""
+        for h in [h for h in self.hours if h <= hour - DAY_HOURS]:
+            b = self.hours.pop(h)
+            _add(self.day, b, -1)
+            _add(self.days.setdefault(h // DAY_HOURS, {}), b)
+        for d in [d for d in self.days if d <= hour // DAY_HOURS - WEEK_DAYS]:
+            _add(self.week, self.days.pop(d), -1)
+
+    def add(self, uid: str, points: int, hour: int):
+        self.roll(hour)
+        bucket = self.hours.setdefault(hour, {})
+        bucket[uid] = bucket.get(uid, 0) + points
+        self.day[uid] = self.day.get(uid, 0) + points
+        self.week[uid] = self.week.get(uid, 0) + points
+
+    def to_json(self) -> dict:
+        return {"hours": {str(h): dict(b) for h, b in self.hours.items()},
+                "days": {str(d): dict(b) for d, b in self.days.items()}}
+
+    @classmethod
+    def from_json(cls, data: dict):
+        return cls({int(h): dict(b) for h, b in (data.get("hours") or {}).items()},
+                   {int(d): dict(b) for d, b in (data.get("days") or {}).items()})
+
+
+class ScoreWindows:
+    def __init__(self, data=None):
+        self.guilds = {gid: GuildWindows.from_json(g) for gid, g in (data or {}).items()}
+
+    def add(self, guild_id: str, uid: str, points: int, now: float = None):
+        g = self.guilds.get(guild_id)
+        if g is None:
+            g = self.guilds[guild_id] = GuildWindows()
+        g.add(uid, points, current_hour(now))
+
+    def totals(self, guild_id: str, window: str, now: float = None) -> dict:
+        """{uid: points} over the window ("day" = last 24 h, "week" = last 7 days)."""
+        g = self.guilds.get(guild_id)
+        if g is None:
+            return {}
+        g.roll(current_hour(now))
+        return getattr(g, window)
+
+    def top(self, guild_id: str, window: str, n: int = 9, now: float = None):
+        totals = self.totals(guild_id, window, now)
+        return heapq.nlargest(n, totals.items(), key=lambda kv: kv[1])
+
+    def to_json(self, guild_id: str = None) -> dict:
+        if guild_id is not None:
+            g = self.guilds.get(guild_id)
+            return g.to_json() if g is not None else {}
+        return {gid: g.to_json() for gid, g in self.guilds.items()}
@@ -0,0 +1,164 @@
+"""Sharded deployment: one supervisor process, several bot worker processes.
+
+With ``WORKERS`` > 1, ``main.py`` becomes a supervisor.  It keeps the web
+server, writes the catalog once to a memory-mapped manifest
+(``catalog_manifest.py``) and starts ``WORKERS`` copies of ``main.py``.  Each
+copy is told its gateway shards through ``WTO_SHARD_IDS``/``SHARD_COUNT``.
+A guild always lives on exactly one shard, so per-channel game state stays
+process-local and every guild's scores are written by a single worker.
+``save_scores`` takes a file lock and merges, so workers never clobber each
+other.  A worker that exits is restarted, with exponential backoff while it
+keeps crashing early.
+
+Each worker serves its own ``/metrics`` on ``127.0.0.1:WORKER_METRICS_PORT + i``.
+The supervisor's ``/metrics`` scrapes them and merges everything into one
+exposition, with a ``worker`` label on every sample.
+
+The manifest shares the catalog bytes, not the structures built from them.
+Every worker still decodes each entry once at startup to build its own round
+pool, alias matchers and name index, and those stay resident per process.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from .config import BASE, LOG_DIR
+from .catalog_manifest import write_manifest
+from .log import get_logger
+from .metrics import Counter, Gauge, render
+
+WORKER_RESTARTS = Counter("wto_worker_restarts_total", "Worker processes restarted by the supervisor.", ["worker"])
+WORKERS_ALIVE = Gauge("wto_workers_alive", "Worker processes currently running.")
+
+MANIFEST_PATH = LOG_DIR / "catalog.manifest"
+# worker i serves /metrics on localhost at this port + i (default: right after the public PORT)
+try:
+    WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT") or int(os.getenv("PORT", "10000")) + 1)
+except ValueError:
+    WORKER_METRICS_PORT = 10001
+
+# the running Supervisor, for main.py's /metrics
+supervisor = None
+
+log = get_logger("shards")
+
+
+def shard_plan(shard_count: int, workers: int):
+    """Shard IDs per worker, round-robin: 4 shards / 2 workers -> [[0, 2], [1, 3]]."""
+    workers = max(1, min(workers, shard_count))
+    return [list(range(w, shard_count, workers)) for w in range(workers)]
+
+
+class Supervisor:
+    def __init__(self, shard_count: int, workers: int, manifest=MANIFEST_PATH, cmd=None,
+                 min_uptime: float = 60.0, max_backoff: float = 60.0):
+        self.plan = shard_plan(shard_count, workers)
+        self.shard_count = shard_count
+        self.manifest = manifest
+        self.cmd = cmd or [sys.executable, str(BASE / "main.py")]
+        self.min_uptime = min_uptime
+        self.max_backoff = max_backoff
+        self.procs = [None] * len(self.plan)
+        WORKERS_ALIVE.set_function(lambda: sum(p is not None and p.returncode is None for p in self.procs))
+
+    def worker_env(self, idx: int) -> dict:
+        env = dict(os.environ)
+        env.update({
+            "WTO_WORKER": "1",
+            "WORKERS": "1",
+            "WTO_SHARD_IDS": ",".join(str(s) for s in self.plan[idx]),
+            "SHARD_COUNT": str(self.shard_count),
+            "WTO_CATALOG_MANIFEST": str(self.manifest),
+            "WTO_METRICS_PORT": str(WORKER_METRICS_PORT + idx),
+        })
+        return env
+
+    async def metrics(self, timeout: float = 2.0) -> str:
+        """The supervisor's metrics plus every reachable worker's, merged with a ``worker`` label."""
+        import aiohttp
+
+        async def scrape(session, idx):
+            try:
+                async with session.get(f"http://127.0.0.1:{WORKER_METRICS_PORT + idx}/metrics") as resp:
+                    return str(idx), await resp.text() if resp.status == 200 else None
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                return str(idx), None
+
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+            scraped = await asyncio.gather(*(scrape(session, i) for i in range(len(self.plan))))
+        return merge_metrics([("supervisor", render())] + [(w, text) for w, text in scraped if text is not None])
+
+    async def _run_worker(self, idx: int):
+        backoff = 1.0
+        while True:
+            started = time.monotonic()
+            proc = await asyncio.create_subprocess_exec(*self.cmd, env=self.worker_env(idx))
+            self.procs[idx] = proc
+            log.info("worker_started", worker=idx, pid=proc.pid, shards=self.plan[idx])
+            try:
+                code = await proc.wait()
+            except asyncio.CancelledError:
+                await _terminate(proc)
+                raise
+            uptime = time.monotonic() - started
+            # a worker that stayed up for a while gets restarted right away
+            backoff = 1.0 if uptime >= self.min_uptime else min(backoff * 2, self.max_backoff)
+            WORKER_RESTARTS.labels(idx).inc()
+            log.warning("worker_exited", worker=idx, code=code, uptime_s=round(uptime, 1), restart_in_s=backoff)
+            await asyncio.sleep(backoff)
+
+    async def run(self):
+        """Run and babysit every worker until cancelled."""
+        await asyncio.gather(*(self._run_worker(i) for i in range(len(self.plan))))
+
+
+def _add_label(sample: str, label: str) -> str:
+    name, brace, rest = sample.partition("{")
+    if brace and " " not in name:
+        return f"{name}{{{label}{'' if rest.startswith('}') else ','}{rest}"
+    name, _, value = sample.partition(" ")
+    return f"{name}{{{label}}} {value}"
+
+
+def merge_metrics(sources) -> str:
+    """Merge Prometheus text expositions [(worker, text)]: one HELP/TYPE per family, samples labelled by worker."""
+    families = {}    # family name -> [help line, type line, samples]
+    for worker, text in sources:
+        label = f'worker="{worker}"'
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                family = line.split(" ", 3)[2]
+                entry = families.setdefault(family, [None, None, []])
+                slot = 0 if line.startswith("# HELP ") else 1
+                entry[slot] = entry[slot] or line
+            elif line and not line.startswith("#") and family is not None:
+                families[family][2].append(_add_label(line, label))
+    lines = []
+    for help_line, type_line, samples in families.values():
+        lines.extend(l for l in (help_line, type_line) if l)
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+async def _terminate(proc, timeout: float = 10.0):
+    if proc.returncode is not None:
+        return
+    proc.terminate()
+    try:
+        await asyncio.wait_for(proc.wait(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+
+
+async def run_supervisor(catalog, workers: int, shard_count: int = None):
+    """Write the shared catalog manifest and supervise ``workers`` bot processes."""
+    shard_count = shard_count or workers
+    size = write_manifest(catalog, MANIFEST_PATH)
+    log.info("catalog_manifest_written", path=str(MANIFEST_PATH), characters=len(catalog), bytes=size)
+    global supervisor
+    supervisor = Supervisor(shard_count, workers)
+    await supervisor.run()
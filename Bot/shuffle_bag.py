@@ -0,0 +1,196 @@
+"""Per-channel no-repeat selection over the operators of the round pool.
+
+Each channel walks its own seeded permutation of ``range(len(operator_groups))``,
+so every operator comes up once before any operator repeats.  The
+permutation is never materialised: ``permute`` maps a position to an index
+with a 4-round Feistel network over the next power of four, cycle-walking
+until the result falls inside the pool.  That makes a draw O(1) (under 4
+Feistel evaluations on average), and a channel's whole state is
+``(seed, cursor, size)``.  When the cursor reaches the end a fresh seed starts
+the next pass, and a pool of a different size (catalog reloaded) also starts
+over.
+
+Bags are saved to ``SHUFFLE_BAG_PATH`` as fixed 24-byte records, a couple of
+seconds after a draw and at exit.  The changed bags are copied on the event
+loop and only that copy goes to the executor, one write at a time.  The save
+merges with the file under a lock, like ``save_scores``, because sharded
+workers share it and each channel belongs to one of them.
+"""
+
+import asyncio
+import atexit
+import os
+import random
+import struct
+from contextlib import contextmanager
+
+from .config import SHUFFLE_BAG_PATH
+from .log import get_logger
+from .metrics import Gauge
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+SHUFFLE_BAGS = Gauge("wto_shuffle_bags", "Channels with a shuffle bag.")
+
+MAGIC = b"WTOBAG01"
+_RECORD = struct.Struct("<QQII")  # channel id, seed, cursor, pool size
+_M64 = (1 << 64) - 1
+SAVE_DELAY = 2.0
+
+log = get_logger("shuffle_bag")
+
+
+def _mix(x: int) -> int:
+    """splitmix64 finalizer."""
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _M64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _M64
+    return x ^ (x >> 31)
+
+
+def permute(i: int, n: int, seed: int) -> int:
+    """Position ``i`` of the seeded permutation of ``range(n)``."""
+    half = max(1, ((n - 1).bit_length() + 1) // 2)
+    mask = (1 << half) - 1
+    keys = [_mix(seed ^ (r << 56)) for r in range(4)]
+    x = i
+    while True:
+        left, right = x >> half, x & mask
+        for k in keys:
+            left, right = right, left ^ (_mix(k ^ right) & mask)
+        x = (left << half) | right
+        if x < n:
+            return x
+
+
+class ShuffleBag:
+    __slots__ = ("seed", "cursor", "size")
+
+    def __init__(self, seed: int = 0, cursor: int = 0, size: int = 0):
+        self.seed = seed
+        self.cursor = cursor
+        self.size = size
+
+    def draw(self, n: int) -> int:
+        """Next index in ``range(n)``; no repeats until all ``n`` have been drawn."""
+        if n != self.size or self.cursor >= n:
+            self.seed = random.getrandbits(64)
+            self.cursor = 0
+            self.size = n
+        i = permute(self.cursor, n, self.seed)
+        self.cursor += 1
+        return i
+
+
+class BagStore:
+    def __init__(self, path=SHUFFLE_BAG_PATH, save_delay: float = SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self.bags = self._read()
+        self._dirty = set()
+        self._save_handle = None
+        self._save_running = False
+        SHUFFLE_BAGS.set_function(lambda: len(self.bags))
+        atexit.register(self.save)
+
+    def draw(self, channel_id: int, n: int) -> int:
+        """Index into a pool of ``n`` entries for the next round in this channel."""
+        if n <= 0:
+            raise IndexError("empty round pool")
+        bag = self.bags.get(channel_id)
+        if bag is None:
+            bag = self.bags[channel_id] = ShuffleBag()
+        i = bag.draw(n)
+        self._dirty.add(channel_id)
+        self._schedule_save()
+        return i
+
+    def _schedule_save(self):
+        if self._save_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._save_handle = loop.call_later(self.save_delay, self._save_later, loop)
+
+    def _save_later(self, loop):
+        self._save_handle = None
+        if self._save_running:
+            self._schedule_save()
+            return
+        # copied on the loop: draws keep moving seed/cursor while the executor writes
+        snapshot = self._snapshot()
+        if not snapshot:
+            return
+        self._save_running = True
+
+        def done(fut):
+            self._save_running = False
+            if fut.cancelled() or fut.exception() is not None or not fut.result():
+                self._dirty.update(snapshot)
+                self._schedule_save()
+
+        loop.run_in_executor(None, self._write, snapshot).add_done_callback(done)
+
+    # --- persistence ---
+    def _read(self) -> dict:
+        try:
+            data = self.path.read_bytes()
+        except FileNotFoundError:
+            return {}
+        if not data.startswith(MAGIC):
+            log.warning("shuffle_bags_unreadable", path=str(self.path))
+            return {}
+        body = memoryview(data)[len(MAGIC):]
+        body = body[:len(body) - len(body) % _RECORD.size]
+        return {cid: ShuffleBag(seed, cursor, size) for cid, seed, cursor, size in _RECORD.iter_unpack(body)}
+
+    @contextmanager
+    def _lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path.with_name(self.path.name + ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _snapshot(self) -> dict:
+        """``{channel id: (seed, cursor, size)}`` of the bags drawn from since the last save."""
+        dirty, self._dirty = self._dirty, set()
+        snapshot = {}
+        for cid in dirty:
+            bag = self.bags.get(cid)
+            if bag is not None:
+                snapshot[cid] = (bag.seed, bag.cursor, bag.size)
+        return snapshot
+
+    def _write(self, snapshot: dict) -> bool:
+        """Merge a snapshot into the file on disk; safe to run off the event loop."""
+        try:
+            with self._lock():
+                merged = {cid: (b.seed, b.cursor, b.size) for cid, b in self._read().items()}
+                merged.update(snapshot)
+                tmp = self.path.with_name(f"{self.path.name}.tmp{os.getpid()}")
+                with open(tmp, "wb") as f:
+                    f.write(MAGIC)
+                    f.write(b"".join(_RECORD.pack(cid, *state) for cid, state in merged.items()))
+                os.replace(tmp, self.path)
+            return True
+        except Exception as e:
+            log.error("shuffle_bags_save_failed", path=str(self.path), error=str(e))
+            return False
+
+    def save(self):
+        """Write the channels drawn from since the last save now (blocking; used at exit)."""
+        snapshot = self._snapshot()
+        if snapshot and not self._write(snapshot):
+            self._dirty.update(snapshot)
+
+
+bags = BagStore()
@@ -0,0 +1,154 @@
+"""Silhouettes derived from full art instead of stored ``[alpha]`` objects.
+
+``derive_silhouette(full_key)`` fetches a full-art image, builds the mask from
+its alpha channel with NumPy (``cpu_tasks.silhouette_png``, run in the job
+pool) and caches the PNG on disk under the SHA-256 of the *source bytes*, so a
+re-uploaded identical image is never processed twice and a changed one never
+serves a stale silhouette.  ``start_game`` uses it for variants that have no
+``[alpha]`` object.  Run it over the whole catalog ahead of time with::
+
+    python -m Bot.silhouettes [--missing-only] [--limit N]
+
+which also reports generation time per image and how much storage the
+``[alpha]`` objects take that derived silhouettes make unnecessary.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+from pathlib import Path
+
+from .config import SILHOUETTE_CACHE_DIR
+from .cpu_tasks import silhouette_png
+from .jobs import job_pool
+from .metrics import Counter
+from .storage import fetch_object
+
+SILHOUETTE_CACHE = Counter("wto_silhouette_cache_total", "Derived silhouette lookups, by result.", ["result"])
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class SilhouetteCache:
+    """PNG files named by source hash, fanned out over 256 subdirectories."""
+
+    def __init__(self, root=SILHOUETTE_CACHE_DIR):
+        self.root = Path(root)
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.png"
+
+    def get(self, digest: str):
+        try:
+            return self.path(digest).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, digest: str, png: bytes):
+        p = self.path(digest)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_name(f"{p.name}.tmp{os.getpid()}")
+        tmp.write_bytes(png)
+        os.replace(tmp, p)
+
+    def size_bytes(self) -> int:
+        return sum(f.stat().st_size for f in self.root.glob("*/*.png")) if self.root.exists() else 0
+
+
+cache = SilhouetteCache()
+
+
+async def derive_silhouette(full_key: str, data: bytes = None) -> bytes:
+    """Silhouette PNG for a full-art object (fetched unless ``data`` is given)."""
+    if data is None:
+        data = await fetch_object(full_key)
+    digest = content_hash(data)
+    loop = asyncio.get_running_loop()
+    png = await loop.run_in_executor(None, cache.get, digest)
+    if png is not None:
+        SILHOUETTE_CACHE.labels("hit").inc()
+        return png
+    SILHOUETTE_CACHE.labels("miss").inc()
+    png = await job_pool.submit(silhouette_png, data, kind="silhouette")
+    await loop.run_in_executor(None, cache.put, digest, png)
+    return png
+
+
+# --- batch job ---
+async def build_all(catalog, missing_only: bool = False, limit: int = None, concurrency: int = 8):
+    """Derive a silhouette for every full-art object in the catalog; returns a report dict."""
+    keys = []
+    for ent in catalog:
+        for v in ent.get("variants") or []:
+            if missing_only and v.get("silhouettes"):
+                continue
+            keys.extend(v.get("fulls") or [])
+    if limit:
+        keys = keys[:limit]
+
+    sem = asyncio.Semaphore(concurrency)
+    times, sizes, failed = [], [], []
+
+    async def one(key):
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                png = await derive_silhouette(key)
+            except Exception as e:
+                failed.append((key, str(e)))
+                return
+            times.append(time.perf_counter() - t0)
+            sizes.append(len(png))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(k) for k in keys))
+    elapsed = time.perf_counter() - t0
+    times.sort()
+    return {
+        "images": len(keys),
+        "derived": len(times),
+        "failed": len(failed),
+        "elapsed_s": round(elapsed, 2),
+        "per_image_ms": {q: round(times[min(len(times) - 1, int(q / 100 * len(times)))] * 1000, 1) if times else 0.0
+                         for q in (50, 95)},
+        "derived_bytes": sum(sizes),
+    }
+
+
+def alpha_storage(backend=None):
+    """(count, bytes) of ``[alpha]`` objects in the bucket: what derived silhouettes make redundant."""
+    from .storage import get_backend
+    from .image_processing import CHARACTER_PREFIXES
+    backend = backend or get_backend()
+    count = total = 0
+    for prefix in CHARACTER_PREFIXES:
+        for obj in backend.list(prefix):
+            if "[alpha]" in obj.key.lower():
+                count += 1
+                total += obj.size or 0
+    return count, total
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Derive silhouettes for the whole catalog")
+    p.add_argument("--missing-only", action="store_true", help="only variants without an [alpha] object")
+    p.add_argument("--limit", type=int, help="stop after this many images")
+    p.add_argument("--concurrency", type=int, default=8)
+    args = p.parse_args(argv)
+
+    from .image_processing import load_characters
+    catalog = load_characters()
+    report = asyncio.run(build_all(catalog, args.missing_only, args.limit, args.concurrency))
+    alpha_count, alpha_bytes = alpha_storage()
+    report.update({"alpha_objects": alpha_count, "alpha_bytes": alpha_bytes, "cache_bytes": cache.size_bytes()})
+    for k, v in report.items():
+        print(f"{k:16} {v}")
+    job_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""Storage backends for WhoThatOperator bot.
+
+Every image read (catalog listing, silhouettes, reveals, hint icons) goes
+through a ``StorageBackend`` so the R2 path can be swapped for a local
+directory, an in-memory store or the fake S3 server in ``fake_s3.py``.
+
+Reads from a remote backend (``fetch_object`` on R2) are bounded by a
+per-attempt deadline and retried with jittered exponential backoff on
+retryable errors.  When an attempt is still running after the recent p95
+latency of that backend, a second GET is sent and whichever answers first wins.
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import (
+    is_r2_enabled, R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY, R2_BUCKET_NAME, R2_ENDPOINT_URL,
+    LOCAL_IMAGES_ROOT, STORAGE_DEADLINE, STORAGE_RETRIES, STORAGE_BACKOFF, STORAGE_HEDGE, STORAGE_HEDGE_MIN,
+)
+from .local_images import scan_images, local_object_path, read_local_object
+from .metrics import (
+    STORAGE_FETCH_SECONDS, STORAGE_FETCH_BYTES, STORAGE_FETCH_ERRORS, STORAGE_FETCH_RETRIES, STORAGE_FETCH_HEDGES,
+)
+
+ObjectInfo = namedtuple("ObjectInfo", "key size etag")
+
+
+class StorageError(Exception):
+    """Raised when a backend cannot serve a request."""
+
+
+class ObjectNotFound(StorageError):
+    """Raised when the requested object key does not exist."""
+
+
+class StorageTimeout(StorageError):
+    """Raised when a read did not finish within its deadline."""
+
+
+class StorageBackend:
+    """Interface shared by all backends. Methods are blocking; use ``fetch_object`` from async code."""
+
+    name = "base"
+    # remote backends get deadlines, retries and hedged reads in ``fetch_object``
+    remote = False
+
+    def list(self, prefix: str):
+        """Return ``ObjectInfo`` for every object whose key starts with ``prefix``."""
+        raise NotImplementedError
+
+    def head(self, key: str) -> ObjectInfo:
+        raise NotImplementedError
+
+    def get_bytes(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    def get_range(self, key: str, start: int, end: int) -> bytes:
+        """Return bytes ``start..end`` (inclusive, like an HTTP Range header)."""
+        return self.get_bytes(key)[start:end + 1]
+
+    def get_bytes_once(self, key: str) -> bytes:
+        """One read attempt without client-side retries, for callers that retry themselves."""
+        return self.get_bytes(key)
+
+
+class R2Backend(StorageBackend):
+    """Cloudflare R2 (or any S3-compatible endpoint) through boto3."""
+
+    name = "r2"
+    remote = True
+
+    def __init__(self, access_key_id, secret_access_key, bucket_name, endpoint_url, client_config=None):
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = bucket_name
+        self.endpoint_url = endpoint_url
+        client_config = client_config or Config(signature_version='s3v4', max_pool_connections=32)
+        # one client for the whole process: boto3 clients are thread-safe and keep a connection pool
+        self.client = boto3.client('s3',
+                                   endpoint_url=endpoint_url,
+                                   aws_access_key_id=access_key_id,
+                                   aws_secret_access_key=secret_access_key,
+                                   config=client_config)
+        # gameplay reads: fetch_object owns deadlines and retries, so botocore makes a single attempt
+        # and gives up on a stalled socket at the same deadline
+        self.read_client = boto3.client('s3',
+                                        endpoint_url=endpoint_url,
+                                        aws_access_key_id=access_key_id,
+                                        aws_secret_access_key=secret_access_key,
+                                        config=client_config.merge(Config(
+                                            connect_timeout=STORAGE_DEADLINE, read_timeout=STORAGE_DEADLINE,
+                                            retries={'total_max_attempts': 1})))
+
+    def _translate(self, e, key):
+        from botocore.exceptions import ClientError
+        if isinstance(e, ClientError):
+            code = str(e.response.get("Error", {}).get("Code", ""))
+            if code in ("404", "NoSuchKey", "NotFound"):
+                return ObjectNotFound(key)
+        return StorageError(f"{self.name}: {key}: {e}")
+
+    def list(self, prefix: str):
+        out = []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                key = obj.get('Key')
+                if key and not key.endswith('/'):
+                    out.append(ObjectInfo(key, obj.get('Size', 0), (obj.get('ETag') or '').strip('"')))
+        return out
+
+    def head(self, key: str) -> ObjectInfo:
+        try:
+            resp = self.client.head_object(Bucket=self.bucket, Key=key)
+        except Exception as e:
+            raise self._translate(e, key) from e
+        return ObjectInfo(key, resp.get('ContentLength', 0), (resp.get('ETag') or '').strip('"'))
+
+    def get_bytes(self, key: str) -> bytes:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+        except Exception as e:
+            raise self._translate(e, key) from e
+
+    def get_bytes_once(self, key: str) -> bytes:
+        try:
+            return self.read_client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+        except Exception as e:
+            raise self._translate(e, key) from e
+
+    def get_range(self, key: str, start: int, end: int) -> bytes:
+        try:
+            resp = self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes={start}-{end}")
+            return resp['Body'].read()
+        except Exception as e:
+            raise self._translate(e, key) from e
+
+
+class _LocalObjectInfo:
+    """``ObjectInfo`` of a file that is only stat()ed when size or etag is read.
+
+    Catalog builds only need the keys, so listing a local tree stays one scan of
+    the (indexed) directories instead of a syscall per image.
+    """
+
+    __slots__ = ("key", "_root", "_stat")
+
+    def __init__(self, key: str, root: str):
+        self.key = key
+        self._root = root
+        self._stat = None
+
+    def _st(self):
+        if self._stat is None:
+            try:
+                self._stat = os.stat(local_object_path(self.key, self._root))
+            except (OSError, ValueError):
+                self._stat = False
+        return self._stat
+
+    @property
+    def size(self):
+        st = self._st()
+        return st.st_size if st else 0
+
+    @property
+    def etag(self):
+        st = self._st()
+        return f"{st.st_mtime_ns:x}-{st.st_size:x}" if st else ""
+
+
+class LocalBackend(StorageBackend):
+    """Images tree on disk, keys relative to ``root``."""
+
+    name = "local"
+
+    def __init__(self, root=None):
+        self.root = str(root or LOCAL_IMAGES_ROOT)
+
+    def list(self, prefix: str):
+        return [_LocalObjectInfo(key, self.root) for key in scan_images([prefix], root=self.root)]
+
+    def head(self, key: str) -> ObjectInfo:
+        try:
+            st = os.stat(local_object_path(key, self.root))
+        except (OSError, ValueError) as e:
+            raise ObjectNotFound(key) from e
+        return ObjectInfo(key, st.st_size, f"{st.st_mtime_ns:x}-{st.st_size:x}")
+
+    def get_bytes(self, key: str) -> bytes:
+        try:
+            return read_local_object(key, self.root)
+        except (FileNotFoundError, ValueError) as e:
+            raise ObjectNotFound(key) from e
+
+    def get_range(self, key: str, start: int, end: int) -> bytes:
+        try:
+            with open(local_object_path(key, self.root), 'rb') as f:
+                f.seek(start)
+                return f.read(end - start + 1)
+        except (FileNotFoundError, ValueError) as e:
+            raise ObjectNotFound(key) from e
+
+
+class MemoryBackend(StorageBackend):
+    """Objects held in a dict; used by the simulator and benchmarks."""
+
+    name = "memory"
+
+    def __init__(self, objects=None):
+        self.objects = dict(objects or {})
+
+    def put(self, key: str, data: bytes):
+        self.objects[key] = data
+
+    def list(self, prefix: str):
+        return [self.head(k) for k in sorted(self.objects) if k.startswith(prefix)]
+
+    def head(self, key: str) -> ObjectInfo:
+        data = self.objects.get(key)
+        if data is None:
+            raise ObjectNotFound(key)
+        return ObjectInfo(key, len(data), hashlib.md5(data).hexdigest())
+
+    def get_bytes(self, key: str) -> bytes:
+        data = self.objects.get(key)
+        if data is None:
+            raise ObjectNotFound(key)
+        return data
+
+
+_backend = None
+
+
+def get_backend() -> StorageBackend:
+    """Return the process-wide backend: R2 when configured, otherwise the local images tree."""
+    global _backend
+    if _backend is None:
+        if is_r2_enabled():
+            _backend = R2Backend(R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY, R2_BUCKET_NAME, R2_ENDPOINT_URL)
+        else:
+            _backend = LocalBackend(LOCAL_IMAGES_ROOT)
+    return _backend
+
+
+def set_backend(backend: StorageBackend):
+    """Replace the process-wide backend (simulator, benchmarks, tooling)."""
+    global _backend
+    _backend = backend
+    return backend
+
+
+class _LatencyWindow:
+    """Recent successful read latencies of one backend; ``p95`` is re-sorted every few samples."""
+    __slots__ = ("samples", "_p95", "_stale")
+
+    MIN_SAMPLES = 20
+
+    def __init__(self, size: int = 256):
+        self.samples = deque(maxlen=size)
+        self._p95 = None
+        self._stale = 0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self._stale += 1
+
+    def p95(self):
+        """Seconds, or None until there are enough samples to trust."""
+        if self._stale >= 16 or (self._p95 is None and len(self.samples) >= self.MIN_SAMPLES):
+            s = sorted(self.samples)
+            self._p95 = s[int(len(s) * 0.95)] if len(s) >= self.MIN_SAMPLES else None
+            self._stale = 0
+        return self._p95
+
+
+_latency = {}            # backend name -> _LatencyWindow
+_read_pool = None
+_read_pool_lock = threading.Lock()
+
+
+def _get_read_pool() -> ThreadPoolExecutor:
+    # own threads, so hedges and reads stuck until their deadline cannot starve the default executor
+    global _read_pool
+    if _read_pool is None:
+        with _read_pool_lock:
+            if _read_pool is None:
+                _read_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="storage-read")
+    return _read_pool
+
+
+def _timed_read(backend: StorageBackend, key: str, window: _LatencyWindow) -> bytes:
+    t0 = time.perf_counter()
+    data = backend.get_bytes_once(key)
+    window.add(time.perf_counter() - t0)
+    return data
+
+
+def _retryable(e: BaseException) -> bool:
+    return isinstance(e, StorageError) and not isinstance(e, ObjectNotFound)
+
+
+def _discard(fut):
+    # a losing or abandoned attempt may still fail later; nobody waits for it
+    if not fut.cancelled():
+        fut.exception()
+
+
+async def _attempt(key: str, backend: StorageBackend, window: _LatencyWindow, loop) -> bytes:
+    """One read with a deadline, plus a hedged second GET once it runs longer than the recent p95."""
+    pool = _get_read_pool()
+    started = loop.time()
+    deadline = started + STORAGE_DEADLINE
+    first = loop.run_in_executor(pool, _timed_read, backend, key, window)
+    first.add_done_callback(_discard)
+    pending = {first}
+    p95 = window.p95() if STORAGE_HEDGE else None
+    hedge_at = started + max(p95, STORAGE_HEDGE_MIN) if p95 is not None else None
+    hedge = None
+    error = None
+    while pending:
+        now = loop.time()
+        if now >= deadline:
+            raise StorageTimeout(f"{backend.name}: {key}: no response in {STORAGE_DEADLINE}s")
+        wake = deadline if hedge is not None or hedge_at is None else min(deadline, hedge_at)
+        done, pending = await asyncio.wait(pending, timeout=max(0.0, wake - now),
+                                           return_when=asyncio.FIRST_COMPLETED)
+        for fut in done:
+            exc = fut.exception()
+            if exc is None:
+                if hedge is not None:
+                    STORAGE_FETCH_HEDGES.labels(backend.name, "hedge_won" if fut is hedge else "first_won").inc()
+                return fut.result()
+            if not _retryable(exc):
+                raise exc
+            error = exc
+        if not done and hedge is None and hedge_at is not None and loop.time() >= hedge_at:
+            hedge = loop.run_in_executor(pool, _timed_read, backend, key, window)
+            hedge.add_done_callback(_discard)
+            pending.add(hedge)
+            STORAGE_FETCH_HEDGES.labels(backend.name, "sent").inc()
+    raise error
+
+
+async def _fetch_remote(key: str, backend: StorageBackend) -> bytes:
+    loop = asyncio.get_running_loop()
+    window = _latency.get(backend.name)
+    if window is None:
+        window = _latency[backend.name] = _LatencyWindow()
+    for attempt in range(STORAGE_RETRIES + 1):
+        try:
+            return await _attempt(key, backend, window, loop)
+        except StorageError as e:
+            if attempt == STORAGE_RETRIES or not _retryable(e):
+                raise
+            STORAGE_FETCH_RETRIES.labels(backend.name, "deadline" if isinstance(e, StorageTimeout) else "error").inc()
+        # full jitter: uniform in [0, base * 2^attempt]
+        await asyncio.sleep(random.uniform(0, STORAGE_BACKOFF * 2 ** attempt))
+
+
+async def fetch_object(key: str, backend: StorageBackend = None) -> bytes:
+    """Read an object's bytes without blocking the event loop."""
+    backend = backend or get_backend()
+    loop = asyncio.get_running_loop()
+    try:
+        with STORAGE_FETCH_SECONDS.labels(backend.name).time():
+            if backend.remote:
+                data = await _fetch_remote(key, backend)
+            else:
+                data = await loop.run_in_executor(None, backend.get_bytes, key)
+    except Exception:
+        STORAGE_FETCH_ERRORS.labels(backend.name).inc()
+        raise
+    STORAGE_FETCH_BYTES.labels(backend.name).observe(len(data))
+    return data
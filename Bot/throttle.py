@@ -0,0 +1,93 @@
+"""Guess throttling for WhoThatOperator bot.
+
+``on_message`` runs every chat line of a channel with an active round through
+the matcher.  Before that happens, ``admit_guess`` sheds what cannot or should
+not be evaluated:
+
+* inputs longer than ``MAX_GUESS_CHARS`` are cut before normalization;
+* guesses whose normalized length is outside the bounds any match with the
+  current answer needs (``utils.guess_length_bounds``);
+* per-user and per-channel token buckets (``GUESS_USER_RATE``/``_BURST``,
+  ``GUESS_CHANNEL_RATE``/``_BURST``) so one flooder cannot burn the CPU every
+  other channel shares.  Only guesses that passed the length check are
+  charged, so ordinary chat never uses up a player's tokens.
+
+Every shed message is counted in ``wto_guesses_shed_total{reason}``.
+"""
+
+import time
+
+from .config import (GUESS_USER_RATE, GUESS_USER_BURST, GUESS_CHANNEL_RATE, GUESS_CHANNEL_BURST,
+                     MAX_GUESS_CHARS)
+from .metrics import Counter
+from .utils import normalize_for_match
+
+GUESSES_SHED = Counter("wto_guesses_shed_total", "Guesses dropped before matching, by reason.", ["reason"])
+GUESSES_TRUNCATED = Counter("wto_guesses_truncated_total", "Guesses cut to MAX_GUESS_CHARS before matching.")
+
+_shed_user = GUESSES_SHED.labels("user_rate")
+_shed_channel = GUESSES_SHED.labels("channel_rate")
+_shed_length = GUESSES_SHED.labels("length")
+
+
+class KeyedLimiter:
+    """Token bucket per key: ``rate`` tokens/second, at most ``burst`` saved up."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 50000):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> [tokens, last refill]
+
+    def allow(self, key, now: float = None) -> bool:
+        if self.rate <= 0:
+            return True
+        if now is None:
+            now = time.monotonic()
+        b = self._buckets.get(key)
+        if b is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            self._buckets[key] = [self.burst - 1.0, now]
+            return True
+        tokens = min(self.burst, b[0] + (now - b[1]) * self.rate)
+        b[1] = now
+        if tokens < 1.0:
+            b[0] = tokens
+            return False
+        b[0] = tokens - 1.0
+        return True
+
+    def _prune(self, now):
+        # a bucket idle long enough to be full again carries no state
+        idle = self.burst / self.rate
+        for key in [k for k, b in self._buckets.items() if now - b[1] >= idle]:
+            del self._buckets[key]
+        if len(self._buckets) >= self.max_keys:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+user_limiter = KeyedLimiter(GUESS_USER_RATE, GUESS_USER_BURST)
+channel_limiter = KeyedLimiter(GUESS_CHANNEL_RATE, GUESS_CHANNEL_BURST)
+
+
+def admit_guess(channel_id, user_id, guess: str, bounds=None):
+    """Return the normalized (possibly truncated) guess if it should be matched, else None."""
+    if len(guess) > MAX_GUESS_CHARS:
+        guess = guess[:MAX_GUESS_CHARS]
+        GUESSES_TRUNCATED.inc()
+    norm = normalize_for_match(guess)
+    if bounds is not None and not bounds[0] <= len(norm) <= bounds[1]:
+        _shed_length.inc()
+        return None
+    now = time.monotonic()
+    if not user_limiter.allow((channel_id, user_id), now):
+        _shed_user.inc()
+        return None
+    if not channel_limiter.allow(channel_id, now):
+        _shed_channel.inc()
+        return None
+    return norm
@@ -0,0 +1,191 @@
+"""Per-round latency tracing for WhoThatOperator bot.
+
+Every round gets a ``RoundTrace`` with its own trace ID.  Phases are recorded
+as spans (sequential start phases with ``lap()``, end paths with ``span()``)
+and the finished trace is appended as one JSON line to ``ROUND_TRACE_PATH`` by
+a background thread.  Past ``ROUND_TRACE_MAX_MB`` the file is moved to
+``<file>.1`` (replacing the previous one) and a new file is started, so traces
+use at most about twice that on disk.  Summarize a trace file into a per-phase breakdown with::
+
+    python -m Bot.tracing [logs/round_traces.jsonl]
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+from .config import ROUND_TRACING, ROUND_TRACE_PATH, ROUND_TRACE_MAX_MB
+
+# a chatty round should not grow its trace without bound
+MAX_SPANS_PER_TRACE = 500
+
+# last finished traces, newest last
+recent_traces = deque(maxlen=200)
+
+_export_queue = queue.SimpleQueue()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class RoundTrace:
+    """Spans of one round, timed with ``perf_counter`` relative to the round start."""
+
+    def __init__(self, channel_id, **attrs):
+        self.trace_id = uuid.uuid4().hex
+        self.channel_id = channel_id
+        self.started_at = time.time()
+        self.attrs = dict(attrs)
+        self.spans = []
+        self.dropped_spans = 0
+        self.outcome = None
+        self._t0 = time.perf_counter()
+        self._last = self._t0
+
+    def add_span(self, name: str, start: float, end: float, **attrs):
+        if len(self.spans) >= MAX_SPANS_PER_TRACE:
+            self.dropped_spans += 1
+            return
+        span = {"name": name, "start_ms": round((start - self._t0) * 1000, 3),
+                "duration_ms": round((end - start) * 1000, 3)}
+        if attrs:
+            span.update(attrs)
+        self.spans.append(span)
+
+    def lap(self, name: str, **attrs):
+        """Record a span from the previous lap (or the round start) to now."""
+        now = time.perf_counter()
+        self.add_span(name, self._last, now, **attrs)
+        self._last = now
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Time a block; the yielded dict can be filled with attributes."""
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            end = time.perf_counter()
+            self.add_span(name, start, end, **attrs)
+            self._last = end
+
+    def finish(self, outcome: str, **attrs):
+        """Close the trace once; later calls are ignored."""
+        if self.outcome is not None:
+            return
+        self.outcome = outcome
+        self.attrs.update(attrs)
+        self.attrs["total_ms"] = round((time.perf_counter() - self._t0) * 1000, 3)
+        recent_traces.append(self)
+        if ROUND_TRACING:
+            _export(self.to_dict())
+
+    def to_dict(self) -> dict:
+        d = {"trace_id": self.trace_id, "channel_id": self.channel_id, "started_at": self.started_at,
+             "outcome": self.outcome, **self.attrs, "spans": self.spans}
+        if self.dropped_spans:
+            d["dropped_spans"] = self.dropped_spans
+        return d
+
+
+def span(trace, name: str, **attrs):
+    """``trace.span(...)`` that tolerates a missing trace."""
+    return trace.span(name, **attrs) if trace is not None else nullcontext(attrs)
+
+
+def finish(trace, outcome: str, **attrs):
+    if trace is not None:
+        trace.finish(outcome, **attrs)
+
+
+# --- JSON lines exporter ---
+def _rotate():
+    if ROUND_TRACE_MAX_MB <= 0:
+        return
+    try:
+        if os.path.getsize(ROUND_TRACE_PATH) >= ROUND_TRACE_MAX_MB * 1024 * 1024:
+            os.replace(ROUND_TRACE_PATH, f"{ROUND_TRACE_PATH}.1")
+    except FileNotFoundError:
+        pass
+
+
+def _writer_main():
+    while True:
+        record = _export_queue.get()
+        batch = [record]
+        try:
+            while len(batch) < 256:
+                batch.append(_export_queue.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            _rotate()
+            with open(ROUND_TRACE_PATH, "a", encoding="utf-8") as f:
+                for r in batch:
+                    f.write(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n")
+        except Exception as e:
+            print("[tracing] failed to write traces:", e)
+
+
+def _export(record: dict):
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_writer_main, name="round-trace-writer", daemon=True)
+                _writer.start()
+    _export_queue.put(record)
+
+
+# --- summary ---
+def _pct(sorted_vals, q):
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(round(q / 100.0 * (len(sorted_vals) - 1))))]
+
+
+def summarize(records) -> dict:
+    """Per-phase latency breakdown (count, mean, p50/p90/p99, max in ms) over trace dicts."""
+    phases, totals, outcomes = {}, [], {}
+    for r in records:
+        outcomes[r.get("outcome")] = outcomes.get(r.get("outcome"), 0) + 1
+        if r.get("total_ms") is not None:
+            totals.append(r["total_ms"])
+        for s in r.get("spans", []):
+            phases.setdefault(s["name"], []).append(s["duration_ms"])
+
+    def stats(vals):
+        vals = sorted(vals)
+        return {"count": len(vals), "mean_ms": round(sum(vals) / len(vals), 3),
+                "p50_ms": _pct(vals, 50), "p90_ms": _pct(vals, 90), "p99_ms": _pct(vals, 99),
+                "max_ms": vals[-1]}
+
+    return {"rounds": sum(outcomes.values()), "outcomes": outcomes,
+            "round_total": stats(totals) if totals else None,
+            "phases": {name: stats(vals) for name, vals in phases.items()}}
+
+
+def load_traces(path=None):
+    with open(path or ROUND_TRACE_PATH, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def format_summary(summary: dict) -> str:
+    lines = [f"rounds: {summary['rounds']}  outcomes: {summary['outcomes']}",
+             f"{'phase':20} {'count':>7} {'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"]
+    rows = list(summary["phases"].items())
+    if summary.get("round_total"):
+        rows.append(("(round total)", summary["round_total"]))
+    for name, s in rows:
+        lines.append(f"{name:20} {s['count']:7d} {s['mean_ms']:9.2f} {s['p50_ms']:9.2f} "
+                     f"{s['p90_ms']:9.2f} {s['p99_ms']:9.2f} {s['max_ms']:9.2f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(format_summary(summarize(load_traces(sys.argv[1] if len(sys.argv) > 1 else None))))
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import re
 import random
@@ -5,16 +6,12 @@ import unicodedata
 import json
 from pathlib import Path
 from difflib import SequenceMatcher
-import boto3
-from botocore.config import Config
-import tempfile
 from typing import Dict, Any
 
 
 # Import từ config
 from .config import (
     EN_JSON_PATH, CN_JSON_PATH, PROFESSION_MAP_PATH, CN_ONLY_MAP_PATH,
-    R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY, R2_BUCKET_NAME, R2_ENDPOINT_URL,
     AMIYA_JSON_PATH,STOPWORDS
 )
 
@@ -45,6 +42,31 @@ AMIYA_JSON = safe_load_json(AMIYA_JSON_PATH)
 PROFESSION_MAP = load_map_file(PROFESSION_MAP_PATH)
 CN_ONLY_MAP = load_map_file(CN_ONLY_MAP_PATH)
 
+async def reload_game_tables():
+    """
+    Re-read the game tables in the job pool (multi-MB JSON stays off the event loop)
+    and swap them in place, so modules that imported the dicts see the new data.
+    Returns {table: entries}.
+    """
+    from .jobs import job_pool
+    from .cpu_tasks import parse_json_file
+    tables = {
+        "en": (EN_JSON, EN_JSON_PATH, False),
+        "cn": (CN_JSON, CN_JSON_PATH, False),
+        "amiya": (AMIYA_JSON, AMIYA_JSON_PATH, False),
+        "profession": (PROFESSION_MAP, PROFESSION_MAP_PATH, True),
+        "cn_only": (CN_ONLY_MAP, CN_ONLY_MAP_PATH, True),
+    }
+    parsed = await asyncio.gather(*(job_pool.submit(parse_json_file, str(path), unwrap, kind="json")
+                                    for _, path, unwrap in tables.values()))
+    counts = {}
+    for (name, (target, _, _)), data in zip(tables.items(), parsed):
+        if isinstance(data, dict) and data:
+            target.clear()
+            target.update(data)
+        counts[name] = len(target)
+    return counts
+
 
 # --- Text normalization and matching utilities ---
 def normalize_for_match(s: str) -> str:
@@ -208,6 +230,190 @@ def fuzzy_match_threshold(guess: str, target: str) -> tuple:
 
     return False, float(best)
 
+class CompiledTarget:
+    """
+    One answer prepared for many guesses: normalized once, tokens picked once and a
+    SequenceMatcher per token with the target side preindexed (set_seq2).
+    match_compiled(normalize_for_match(guess), ct) == fuzzy_match_threshold(guess, target).
+    With ``cjk_min_token`` > 1 a CJK target is split on spaces only and keeps tokens of
+    at least that length, instead of one token per character.
+    Not thread-safe (the matchers are reused); use it from the event loop.
+    """
+    __slots__ = ("target", "ta", "significant", "bounds", "_token_sms", "_whole_sm")
+
+    def __init__(self, target: str, cjk_min_token: int = 1):
+        self.target = target
+        self.ta = ta = normalize_for_match(target)
+        cjk = is_cjk(ta)
+        significant = []
+        if cjk and cjk_min_token > 1:
+            tokens = [tt for tt in ta.split() if len(tt) >= cjk_min_token]
+        else:
+            tokens = tokenize_for_match(target, min_len=1 if cjk else 2)
+        for tt in tokens:
+            if not tt: continue
+            if (not cjk) and tt in STOPWORDS: continue
+            if (not cjk) and len(tt) < 2: continue
+            significant.append(tt)
+        self.significant = significant or [ta]
+        self.bounds = guess_length_bounds(target)
+        self._token_sms = [(tt, SequenceMatcher(None, "", tt)) for tt in self.significant]
+        self._whole_sm = SequenceMatcher(None, "", ta)
+
+def compile_target(target: str, cjk_min_token: int = 1):
+    """CompiledTarget for target, or None when it normalizes to nothing."""
+    if not target or not normalize_for_match(target):
+        return None
+    return CompiledTarget(target, cjk_min_token)
+
+def match_compiled(ga: str, ct: CompiledTarget) -> tuple:
+    """fuzzy_match_threshold for an already normalized guess; returns (ok, score)."""
+    if not ga or ct is None:
+        return False, 0.0
+    ta = ct.ta
+    if ga == ta:
+        return True, 1.0
+    significant = ct.significant
+    if len(ga) < 4:
+        for tt in significant:
+            if ga == tt:
+                return True, 1.0
+        return False, 0.0
+
+    TH = 0.90
+    best = 0.0
+    # quick_ratio bounds the real ratio from above, so skipping when it cannot
+    # beat best (or reach TH) leaves both the verdict and the score unchanged
+    for tt, sm in ct._token_sms:
+        if ga == tt:
+            return True, 1.0
+        sm.set_seq1(ga)
+        if sm.real_quick_ratio() <= best or sm.quick_ratio() <= best:
+            continue
+        s = sm.ratio()
+        if s > best: best = s
+        if s >= TH:
+            return True, float(s)
+
+    sm = ct._whole_sm
+    sm.set_seq1(ga)
+    if sm.real_quick_ratio() > best and sm.quick_ratio() > best:
+        whole = sm.ratio()
+        if whole > best: best = whole
+        if whole >= TH:
+            return True, float(whole)
+
+    for tt in significant:
+        if _levenshtein_at_most_one(ga, tt):
+            return True, float(best)
+    if _levenshtein_at_most_one(ga, ta):
+        return True, float(best)
+
+    return False, float(best)
+
+def guess_length_bounds(target: str) -> tuple:
+    """
+    (min, max) normalized guess length that fuzzy_match_threshold could accept for target.
+    A ratio >= 0.90 needs the lengths within 0.82x..1.22x of a token or of the whole
+    name, levenshtein <= 1 within +-1, short guesses must equal a token.
+    """
+    ta = normalize_for_match(target)
+    if not ta:
+        return (1, 0)
+    cjk = is_cjk(ta)
+    lengths = [len(t) for t in tokenize_for_match(target, min_len=1 if cjk else 2)] + [len(ta)]
+    shortest, longest = min(lengths), max(lengths)
+    lo = max(1, min(int(shortest * 0.8), shortest - 1))
+    hi = max(longest + 1, int(longest * 1.23) + 1)
+    return (lo, hi)
+
+class CompiledAliases:
+    """
+    Every accepted name of one operator, compiled once at catalog load.  Whole names
+    and their significant tokens go into one set, so an exact hit on any alias is a
+    single hash lookup; otherwise each alias whose length bounds admit the guess is
+    tried with match_compiled.  ``ok`` equals any(fuzzy_match_threshold(guess, alias)),
+    except that a CJK alias is matched as a whole name or by tokens of 2+ characters:
+    with every CN name an alias, single characters would otherwise win the round.
+    """
+    __slots__ = ("target", "aliases", "exact", "bounds")
+
+    def __init__(self, names, target: str = None):
+        compiled, seen = [], set()
+        for name in names:
+            ct = compile_target(name, cjk_min_token=2)
+            if ct is not None and ct.ta not in seen:
+                seen.add(ct.ta)
+                compiled.append(ct)
+        self.aliases = compiled
+        self.target = target or (compiled[0].target if compiled else "")
+        self.exact = {ct.ta for ct in compiled} | {tt for ct in compiled for tt in ct.significant}
+        self.bounds = (min((ct.bounds[0] for ct in compiled), default=1),
+                       max((ct.bounds[1] for ct in compiled), default=0))
+
+def compile_aliases(names, target: str = None):
+    """CompiledAliases for names (the first usable one is the display target), or None if none are usable."""
+    ca = CompiledAliases(names, target)
+    return ca if ca.aliases else None
+
+def match_aliases(ga: str, ca: CompiledAliases) -> tuple:
+    """Match an already normalized guess against every alias; returns (ok, best score)."""
+    if not ga or ca is None:
+        return False, 0.0
+    if ga in ca.exact:
+        return True, 1.0
+    if len(ga) < 4:
+        return False, 0.0
+    n = len(ga)
+    best = 0.0
+    for ct in ca.aliases:
+        lo, hi = ct.bounds
+        if n < lo or n > hi:
+            continue
+        ok, s = match_compiled(ga, ct)
+        if ok:
+            return True, s
+        if s > best:
+            best = s
+    return False, best
+
+def operator_aliases(key: str, char: dict = None) -> list:
+    """
+    Names a guess may use for an operator, display name first: EN/CN display names,
+    the appellation from both tables, the patch-table and CN_ONLY_MAP names and
+    the codename in the key (``amiya`` in ``char_002_amiya``).
+    """
+    char = char or {}
+    display_en, display_cn = get_display_names(key, char)
+    names = [display_en, display_cn]
+    if not display_en and not display_cn:
+        names.append(key.replace("char_", "").replace("_", " ").title())
+    parts = key.split('_')
+    variants = [key] + (["_".join(parts[:3])] if len(parts) >= 4 else [])
+    for table in (EN_JSON, CN_JSON):
+        for k in variants:
+            ent = table.get(k) if table else None
+            if isinstance(ent, dict):
+                names += [ent.get("name"), ent.get("appellation")]
+    patch = AMIYA_JSON.get("patchChars", {}).get(key) if isinstance(AMIYA_JSON, dict) else None
+    if isinstance(patch, dict):
+        names.append(patch.get("name"))
+    if isinstance(CN_ONLY_MAP, dict):
+        for k in variants + [display_cn]:
+            found = CN_ONLY_MAP.get(k) if k else None
+            if isinstance(found, dict):
+                names += [found.get("en"), found.get("english"), found.get("name")]
+            elif isinstance(found, str):
+                names.append(found)
+    if len(parts) >= 3 and parts[0] == "char":
+        names.append(" ".join(parts[2:]))
+    out, seen = [], set()
+    for n in names:
+        if isinstance(n, str) and n.strip() and n not in seen:
+            seen.add(n)
+            out.append(n)
+    return out
+
 # --- Name and key utilities ---
 def get_display_names(key: str, char: dict) -> tuple:
     """
@@ -293,6 +499,16 @@ def _slugify(name: str) -> str:
     s = re.sub(r"[^\w\s-]", "", s)
     s = re.sub(r"[\s\-]+", "_", s)
     return s.strip("_")
+
+def class_icon_key(profession) -> str:
+    return f"images/Icon/icon_profession_{_slugify(profession)}.png"
+
+def subclass_icon_key(subprofession) -> str:
+    return f"images/subicon/sub_{_slugify(subprofession)}_icon.png"
+
+def nation_icon_key(nation) -> str:
+    return f"images/Logo/logo_{_slugify(nation)}.png"
+
 # --- generate_hint_for_char (finalized behavior) ---
 def generate_hint_for_char(char: dict, prefer: str = None, troll_chance: float = 0.002) -> str:
     """
@@ -305,7 +521,7 @@ def generate_hint_for_char(char: dict, prefer: str = None, troll_chance: float =
     Placeholder for image is included and follows:
       - Class -> <<R2:images/Icon/icon_profession_<slug>.png>>
       - Sub-class -> <<R2:images/subicon/sub_<slug>_icon.png>>
-      - Nation -> <<R2:images/Logo/Logo_<slug>.png>>
+      - Nation -> <<R2:images/Logo/logo_<slug>.png>>
     """
     if not isinstance(char, dict):
         return ""
@@ -325,7 +541,7 @@ def generate_hint_for_char(char: dict, prefer: str = None, troll_chance: float =
         roll = 1.0
     if 0.0 <= float(troll_chance) and roll < float(troll_chance):
         # Use fallback placeholder (images path) for troll
-        ph = f"<<R2:images/Icon/icon_profession_unknown.png>>"
+        ph = f"<<R2:{class_icon_key('unknown')}>>"
         return f"is an operator {ph}"
 
     # Amiya patch special-case: still treat profession/subProfession but with new labels
@@ -338,7 +554,7 @@ def generate_hint_for_char(char: dict, prefer: str = None, troll_chance: float =
             options.append(f"Class: {map_profession_hint(profession)}")
         if sub_profession:
             options.append(f"Sub-class: {sub_profession}")
-        placeholder = f"<<R2:images/Icon/icon_profession_{_slugify(profession or 'unknown')}.png>>"
+        placeholder = f"<<R2:{class_icon_key(profession or 'unknown')}>>"
         if options:
             return f"{random.choice(options)} {placeholder}"
         return placeholder
@@ -373,18 +589,18 @@ def generate_hint_for_char(char: dict, prefer: str = None, troll_chance: float =
     # Build options: class, sub-class, nations (with VN labels)
     options = []
     if profession:
-        options.append(("class", f"Class: {map_profession_hint(str(profession))}", f"images/Icon/icon_profession_{_slugify(profession)}.png"))
+        options.append(("class", f"Class: {map_profession_hint(str(profession))}", class_icon_key(profession)))
     if subprofession:
-        options.append(("subclass", f"Sub-class: {str(subprofession)}", f"images/subicon/sub_{_slugify(subprofession)}_icon.png"))
+        options.append(("subclass", f"Sub-class: {str(subprofession)}", subclass_icon_key(subprofession)))
 
     for n in nations:
         if n.get("role") == "main":
             label = f"Thuộc : {n['value']}"
-            filename = f"images/Logo/logo_{_slugify(n['value'])}.png"
+            filename = nation_icon_key(n['value'])
             options.append(("nation_main", label, filename))
         else:
             label = f"Quốc gia liên quan : {n['value']}"
-            filename = f"images/Logo/logo_{_slugify(n['value'])}.png"
+            filename = nation_icon_key(n['value'])
             options.append(("nation_sub", label, filename))
 
     # If prefer is set, filter options accordingly
@@ -417,7 +633,7 @@ def generate_hint_for_char(char: dict, prefer: str = None, troll_chance: float =
         return f"{chosen_label} {placeholder}"
 
     # nothing to choose: return fallback placeholder
-    fallback_ph = f"<<R2:images/Icon/icon_profession_unknown.png>>"
+    fallback_ph = f"<<R2:{class_icon_key('unknown')}>>"
     return fallback_ph
 
 def extract_key_and_variant(filename: str) -> tuple:
@@ -455,25 +671,6 @@ def extract_key_and_variant(filename: str) -> tuple:
     # Fallback for non-standard format
     return normalized, "unknown"
 
-def download_r2_object(object_key: str) -> str:
-    """Download object from R2 storage"""
-    s3 = boto3.client('s3',
-        endpoint_url=R2_ENDPOINT_URL,
-        aws_access_key_id=R2_ACCESS_KEY_ID,
-        aws_secret_access_key=R2_SECRET_ACCESS_KEY,
-        config=Config(signature_version='s3v4')
-    )
-    
-    fd, path = tempfile.mkstemp(suffix='.png')
-    os.close(fd)
-    
-    try:
-        s3.download_file(R2_BUCKET_NAME, object_key, path)
-        return path
-    except Exception as e:
-        os.unlink(path)
-        raise e
-
 # --- Display formatting utilities ---
 def display_len(s: str) -> int:
     """Calculate display length considering Unicode characters"""
@@ -0,0 +1,183 @@
+"""Event-loop watchdog for WhoThatOperator bot.
+
+A heartbeat task on the loop bumps a timestamp every ``interval``.  A daemon
+thread notices when the heartbeat is late by more than ``WATCHDOG_THRESHOLD``
+and, while the loop is still blocked, captures the loop thread's stack, the
+running task's coroutine and the trigger tagged on that task (``tag_task``).
+Stalls are grouped by the blocking frame; the worst offenders are shown by the
+admin-only ``!lag`` command and served as JSON on ``/debug/stalls``.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+
+from .config import WATCHDOG_THRESHOLD
+from .metrics import Counter, Histogram
+from .log import get_logger
+
+LOOP_STALLS = Counter("wto_event_loop_stalls_total", "Event-loop stalls longer than the watchdog threshold.")
+LOOP_STALL_SECONDS = Histogram("wto_event_loop_stall_seconds", "Duration of detected event-loop stalls.",
+                               buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+
+log = get_logger("watchdog")
+
+# task -> what started it ("message:!start", "timeout:123", ...)
+_triggers = weakref.WeakKeyDictionary()
+
+STACK_LIMIT = 25
+
+
+def tag_task(trigger: str):
+    """Remember what triggered the current task so a stall inside it can be attributed."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        return
+    if task is not None:
+        _triggers[task] = trigger
+
+
+def _frame_label(fs) -> str:
+    return f"{fs.filename}:{fs.lineno} in {fs.name}"
+
+
+def _blame_frame(stack):
+    """Innermost frame in our own code, else the innermost frame."""
+    for fs in reversed(stack):
+        if "/Bot/" in fs.filename.replace("\\", "/"):
+            return fs
+    return stack[-1] if stack else None
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float = WATCHDOG_THRESHOLD, interval: float = 0.05, max_offenders: int = 100):
+        self.threshold = threshold
+        self.interval = interval
+        self.max_offenders = max_offenders
+        self.offenders = {}
+        self.recent = deque(maxlen=50)
+        self._lock = threading.Lock()
+        self._beat = time.monotonic()
+        self._stall = None
+        self._loop = None
+        self._loop_thread_id = None
+        self._heartbeat_task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start watching the running loop; must be called from a coroutine."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._heartbeat_task = self._loop.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            late = time.monotonic() - beat - self.interval
+            if self._stall is not None and beat != self._stall["beat"]:
+                self._close_stall(beat)
+            if late >= self.threshold and self._stall is None:
+                self._stall = self._capture(beat)
+
+    def _capture(self, beat) -> dict:
+        """Snapshot what the loop thread is doing right now."""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.extract_stack(frame)[-STACK_LIMIT:] if frame is not None else []
+        del frame
+        task = coro = trigger = None
+        try:
+            task = asyncio.current_task(self._loop)
+        except Exception:
+            pass
+        if task is not None:
+            c = task.get_coro()
+            coro = getattr(c, "__qualname__", None) or repr(c)
+            trigger = _triggers.get(task)
+        blame = _blame_frame(stack)
+        return {
+            "beat": beat,
+            "at": time.time(),
+            "task": task.get_name() if task is not None else None,
+            "coro": coro,
+            "trigger": trigger,
+            "where": _frame_label(blame) if blame else "?",
+            "stack": [_frame_label(fs) for fs in stack],
+        }
+
+    def _close_stall(self, resumed_beat):
+        stall, self._stall = self._stall, None
+        duration = max(0.0, resumed_beat - stall.pop("beat") - self.interval)
+        stall["duration_ms"] = round(duration * 1000, 1)
+        LOOP_STALLS.inc()
+        LOOP_STALL_SECONDS.observe(duration)
+        with self._lock:
+            self.recent.append(stall)
+            key = (stall["where"], stall["coro"])
+            o = self.offenders.get(key)
+            if o is None:
+                if len(self.offenders) >= self.max_offenders:
+                    # forget the mildest offender to make room
+                    del self.offenders[min(self.offenders, key=lambda k: self.offenders[k]["max_ms"])]
+                o = self.offenders[key] = {"where": stall["where"], "coro": stall["coro"], "count": 0,
+                                           "total_ms": 0.0, "max_ms": 0.0}
+            o["count"] += 1
+            o["total_ms"] = round(o["total_ms"] + stall["duration_ms"], 1)
+            if stall["duration_ms"] >= o["max_ms"]:
+                o["max_ms"] = stall["duration_ms"]
+                o["trigger"] = stall["trigger"]
+                o["stack"] = stall["stack"]
+        log.warning("loop_stall", duration_ms=stall["duration_ms"], coro=stall["coro"], trigger=stall["trigger"],
+                    where=stall["where"])
+
+    def worst(self, n: int = 10):
+        with self._lock:
+            return sorted(self.offenders.values(), key=lambda o: o["max_ms"], reverse=True)[:n]
+
+    def report(self, n: int = 10) -> dict:
+        with self._lock:
+            recent = list(self.recent)
+        return {"threshold_ms": round(self.threshold * 1000, 1), "running": self.running,
+                "offenders": self.worst(n), "recent": recent[-n:]}
+
+
+watchdog = LoopWatchdog()
+
+
+def format_offenders(n: int = 5) -> str:
+    """Short text table of the worst stalls for the ``!lag`` command."""
+    rows = watchdog.worst(n)
+    if not rows:
+        return f"Chưa ghi nhận lần nghẽn event loop nào (ngưỡng {watchdog.threshold * 1000:.0f} ms)."
+    lines = [f"{'max ms':>8} {'x':>4}  coroutine / trigger / where"]
+    for o in rows:
+        where = o["where"].replace("\\", "/").rsplit("/", 1)[-1]
+        lines.append(f"{o['max_ms']:8.0f} {o['count']:4d}  {o['coro']} <- {o.get('trigger') or '?'} @ {where}")
+    return "\n".join(lines)
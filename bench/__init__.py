@@ -0,0 +1 @@
+"""Offline load tests and benchmarks for the WhoThatOperator bot."""
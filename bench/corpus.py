@@ -0,0 +1,156 @@
+"""Representative inputs for the benchmarks: operator names, chat noise and R2 key listings."""
+
+import random
+
+from Bot.utils import CN_ONLY_MAP
+
+# (key, EN name, CN name) for a spread of real operators: short, long, multi-word,
+# punctuation, digits and the alter/"the X" forms that stress the tokenizer
+OPERATORS = [
+    ("char_002_amiya", "Amiya", "阿米娅"),
+    ("char_003_kalts", "Kal'tsit", "凯尔希"),
+    ("char_009_12fce", "12F", "12F"),
+    ("char_010_chen", "Ch'en", "陈"),
+    ("char_017_huang", "Blaze", "煌"),
+    ("char_101_sora", "Sora", "空"),
+    ("char_102_texas", "Texas", "德克萨斯"),
+    ("char_103_angel", "Exusiai", "能天使"),
+    ("char_112_siege", "Siege", "推进之王"),
+    ("char_113_cqbw", "W", "W"),
+    ("char_128_plosis", "Ptilopsis", "白面鸮"),
+    ("char_136_hsguma", "Hoshiguma", "星熊"),
+    ("char_143_ghost", "Specter", "幽灵鲨"),
+    ("char_148_nearl", "Nearl", "临光"),
+    ("char_151_myrtle", "Myrtle", "桃金娘"),
+    ("char_172_svrash", "SilverAsh", "银灰"),
+    ("char_180_amgoat", "Eyjafjalla", "艾雅法拉"),
+    ("char_197_poca", "Rosa", "早露"),
+    ("char_202_demkni", "Saria", "塞雷娅"),
+    ("char_215_mantic", "Manticore", "狮蝎"),
+    ("char_222_bpipe", "Bagpipe", "风笛"),
+    ("char_250_phatom", "Phantom", "傀影"),
+    ("char_263_skadi", "Skadi", "斯卡蒂"),
+    ("char_285_medic2", "Lancet-2", "Lancet-2"),
+    ("char_286_cast3", "Castle-3", "Castle-3"),
+    ("char_291_aglina", "Angelina", "安洁莉娜"),
+    ("char_293_thorns", "Thorns", "棘刺"),
+    ("char_300_phenxi", "Fiammetta", "菲亚梅塔"),
+    ("char_311_mudrok", "Mudrock", "泥岩"),
+    ("char_340_shwaz", "Schwarz", "黑"),
+    ("char_350_surtr", "Surtr", "史尔特尔"),
+    ("char_358_lisa", "Suzuran", "铃兰"),
+    ("char_376_therex", "THRM-EX", "THRM-EX"),
+    ("char_400_weedy", "Weedy", "温蒂"),
+    ("char_401_elysm", "Elysium", "极境"),
+    ("char_423_blemsh", "Blemishine", "瑕光"),
+    ("char_437_mizuki", "Mizuki", "水月"),
+    ("char_1012_skadi2", "Skadi the Corrupting Heart", "浊心斯卡蒂"),
+    ("char_1013_chen2", "Ch'en the Holungday", "假日威龙陈"),
+    ("char_1014_nearl2", "Nearl the Radiant Knight", "耀骑士临光"),
+    ("char_1020_reed2", "Reed the Flame Shadow", "焰影苇草"),
+    ("char_1023_ghost2", "Specter the Unchained", "归溟幽灵鲨"),
+    ("char_1028_texas2", "Texas the Omertosa", "缄默德克萨斯"),
+    ("char_2014_nian", "Nian", "年"),
+    ("char_2015_dusk", "Dusk", "夕"),
+    ("char_2023_ling", "Ling", "令"),
+    ("char_2024_chyue", "Chongyue", "重岳"),
+    ("char_4000_jnight", "Justice Knight", "正义骑士号"),
+    ("char_4009_irene", "Irene", "艾丽妮"),
+    ("char_4064_mlynar", "Młynar", "玛恩纳"),
+    ("char_4080_lin", "Lin", "林"),
+    ("char_4087_ines", "Ines", "伊内丝"),
+]
+
+PROFESSIONS = ["WARRIOR", "TANK", "SNIPER", "CASTER", "MEDIC", "SUPPORT", "PIONEER", "SPECIAL"]
+SUB_PROFESSIONS = ["artsfghter", "incantationmedic", "fastshot", "corecaster", "protector", "charger", "executor"]
+NATIONS = ["rhodes", "kazimierz", "laterano", "lungmen", "victoria", "siracusa", "sargon", "yan", "kjerag", "iberia"]
+
+CHAT_NOISE = [
+    "lol", "who is this", "no idea", "gg", "again?", "hint pls", "???", "this is hard", "ez",
+    "wait what", "<:pepe:123456789>", "ok", "surely it's a guard", "idk man", "hmmmm",
+    "is it the one with the big hammer", "ahhh i know this one", "skip", "😭😭😭", "这是谁",
+    "no way that's amiya", "bruh", "the silhouette looks like a sniper", "gl everyone",
+]
+
+
+def all_names():
+    """Every EN and CN name in the corpus plus the CN-only map (used as match targets)."""
+    names = []
+    for _, en, cn in OPERATORS:
+        names.append(en)
+        if cn != en:
+            names.append(cn)
+    names.extend(v for v in CN_ONLY_MAP.values() if isinstance(v, str))
+    return names
+
+
+def _typo(rng, name):
+    if len(name) < 3:
+        return name
+    i = rng.randrange(len(name))
+    op = rng.randrange(3)
+    c = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    if op == 0:
+        return name[:i] + c + name[i + 1:]
+    if op == 1:
+        return name[:i] + name[i + 1:]
+    return name[:i] + c + name[i:]
+
+
+def guess_pairs(n: int = 400, seed: int = 0):
+    """(guess, target) pairs mixing exact hits, typos, other operators, noise and walls of text."""
+    rng = random.Random(seed)
+    targets = all_names()
+    pairs = []
+    for _ in range(n):
+        target = rng.choice(targets)
+        roll = rng.random()
+        if roll < 0.15:
+            guess = target
+        elif roll < 0.30:
+            guess = _typo(rng, target.lower())
+        elif roll < 0.55:
+            guess = rng.choice(targets)
+        elif roll < 0.95:
+            guess = rng.choice(CHAT_NOISE)
+        else:
+            guess = " ".join(rng.choice(CHAT_NOISE) for _ in range(40))
+        pairs.append((guess, target))
+    return pairs
+
+
+def r2_key_listing(n_ops: int = 400, seed: int = 0):
+    """Synthetic ``images/Char`` and ``images/Skin`` listing shaped like the real bucket."""
+    rng = random.Random(seed)
+    keys = []
+    base = [k for k, _, _ in OPERATORS]
+    for i in range(n_ops):
+        key = base[i] if i < len(base) else f"char_{4300 + i}_op{i}"
+        for e in ("", "_1", "_2", "_1+"):
+            if e and rng.random() < 0.5:
+                continue
+            keys.append(f"images/Char/{key}{e}.png")
+            keys.append(f"images/Char/{key}{e}[alpha].png")
+        for _ in range(rng.randrange(3)):
+            skin = f"{rng.choice(['sale', 'boc', 'epoque', 'ghost', 'summer'])}#{rng.randrange(1, 30)}"
+            bg = rng.choice(["", "_blackbg", "_whitebg"])
+            keys.append(f"images/Skin/{key}_{skin}{bg}.png")
+            keys.append(f"images/Skin/{key}_{skin}[alpha]{bg}.png")
+    return keys
+
+
+def hint_chars(seed: int = 0):
+    """Character dicts carrying the fields ``generate_hint_for_char`` reads."""
+    rng = random.Random(seed)
+    chars = []
+    for key, en, _ in OPERATORS:
+        chars.append({
+            "key": key,
+            "name": en,
+            "profession": rng.choice(PROFESSIONS),
+            "subProfessionId": rng.choice(SUB_PROFESSIONS),
+            "nationId": rng.choice(NATIONS),
+            "subPower": [{"nationId": rng.choice(NATIONS)}] if rng.random() < 0.3 else None,
+        })
+    chars.append({"key": "char_1001_amiya2", "name": "Amiya"})
+    return chars
@@ -0,0 +1,254 @@
+"""Microbenchmarks for the hot pure functions in ``Bot/utils.py`` and the catalog builder.
+
+Runs offline against the corpora in ``bench/corpus.py`` and reports ns per call::
+
+    python -m bench.microbench                    # compare with bench/baseline.json
+    python -m bench.microbench --save-baseline    # record this machine's baseline
+    python -m bench.microbench -k fuzzy           # only benchmarks whose name contains "fuzzy"
+
+Each benchmark is timed as the best of ``--repeat`` runs; a benchmark slower
+than the baseline by more than ``--threshold`` is flagged and the exit code is 1.
+Baselines are machine-specific, so record one before comparing on a new host.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+from Bot import utils
+from Bot.image_processing import build_catalog
+from Bot.name_index import build_name_index
+
+from . import corpus
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register ``fn() -> (batch_callable, items_per_batch)``."""
+    def deco(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return deco
+
+
+@benchmark("fuzzy_match_threshold")
+def _fuzzy():
+    pairs = corpus.guess_pairs()
+    fn = utils.fuzzy_match_threshold
+
+    def run():
+        for g, t in pairs:
+            fn(g, t)
+    return run, len(pairs)
+
+
+@benchmark("fuzzy_match_threshold.miss_noise")
+def _fuzzy_noise():
+    targets = corpus.all_names()
+    pairs = [(n, t) for t in targets[:40] for n in corpus.CHAT_NOISE[:10]]
+    fn = utils.fuzzy_match_threshold
+
+    def run():
+        for g, t in pairs:
+            fn(g, t)
+    return run, len(pairs)
+
+
+@benchmark("match_compiled")
+def _match_compiled():
+    # same pairs as fuzzy_match_threshold: guess normalized, target compiled once per round
+    pairs = corpus.guess_pairs()
+    compiled = {t: utils.compile_target(t) for _, t in pairs}
+    pairs = [(utils.normalize_for_match(g), compiled[t]) for g, t in pairs]
+    fn = utils.match_compiled
+
+    def run():
+        for g, ct in pairs:
+            fn(g, ct)
+    return run, len(pairs)
+
+
+@benchmark("match_aliases")
+def _match_aliases():
+    # the match_compiled guesses, each checked against the target's whole alias set
+    # (EN, CN, codename) instead of the single target name
+    by_name = {}
+    for key, en, cn in corpus.OPERATORS:
+        ca = utils.compile_aliases([en, cn, key.split("_", 2)[2]])
+        by_name[en] = by_name[cn] = ca
+    pairs = [(utils.normalize_for_match(g), by_name.get(t) or utils.compile_aliases([t]))
+             for g, t in corpus.guess_pairs()]
+    fn = utils.match_aliases
+
+    def run():
+        for g, ca in pairs:
+            fn(g, ca)
+    return run, len(pairs)
+
+
+@benchmark("name_index.nearest")
+def _name_index():
+    # nearest operator for every guess of at least 4 characters, over every corpus name
+    index = build_name_index([utils.compile_aliases([n]) for n in corpus.all_names()])
+    guesses = [g for g in (utils.normalize_for_match(g) for g, _ in corpus.guess_pairs()) if len(g) >= 4]
+    fn = index.nearest
+
+    def run():
+        for g in guesses:
+            fn(g)
+    return run, len(guesses)
+
+
+@benchmark("similarity_score")
+def _similarity():
+    pairs = corpus.guess_pairs(seed=1)
+    fn = utils.similarity_score
+
+    def run():
+        for g, t in pairs:
+            fn(g, t)
+    return run, len(pairs)
+
+
+@benchmark("levenshtein_at_most_one")
+def _levenshtein():
+    rng = random.Random(2)
+    words = [utils.normalize_for_match(n) for n in corpus.all_names()]
+    pairs = [(w, corpus._typo(rng, w)) for w in words] + [(w, rng.choice(words)) for w in words]
+    fn = utils._levenshtein_at_most_one
+
+    def run():
+        for a, b in pairs:
+            fn(a, b)
+    return run, len(pairs)
+
+
+@benchmark("tokenize_for_match")
+def _tokenize():
+    texts = corpus.all_names() + corpus.CHAT_NOISE
+    fn = utils.tokenize_for_match
+
+    def run():
+        for t in texts:
+            fn(t, 2)
+    return run, len(texts)
+
+
+@benchmark("extract_key_and_variant")
+def _extract():
+    keys = corpus.r2_key_listing()
+    fn = utils.extract_key_and_variant
+
+    def run():
+        for k in keys:
+            fn(k)
+    return run, len(keys)
+
+
+@benchmark("get_display_names")
+def _display_names():
+    keys = [k for k, _, _ in corpus.OPERATORS] + list(utils.CN_ONLY_MAP) + ["char_1001_amiya2"]
+    fn = utils.get_display_names
+
+    def run():
+        for k in keys:
+            fn(k, {})
+    return run, len(keys)
+
+
+@benchmark("generate_hint_for_char")
+def _hint():
+    chars = corpus.hint_chars()
+    fn = utils.generate_hint_for_char
+
+    def run():
+        random.seed(0)
+        for c in chars:
+            fn(c)
+    return run, len(chars)
+
+
+@benchmark("build_catalog")
+def _catalog():
+    keys = corpus.r2_key_listing()
+
+    def run():
+        build_catalog(keys)
+    return run, len(keys)
+
+
+def measure(run, items, min_time=0.2, repeat=5):
+    """Best-of-``repeat`` nanoseconds per item, each repeat lasting at least ``min_time``."""
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            run()
+        dt = time.perf_counter() - t0
+        if dt >= min_time / 4:
+            break
+        loops *= 4
+    loops = max(1, int(loops * min_time / max(dt, 1e-9)))
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            run()
+        best = min(best, time.perf_counter() - t0)
+    return best / (loops * items) * 1e9
+
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8")).get("results", {})
+    except FileNotFoundError:
+        return {}
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="WhoThatOperator microbenchmarks")
+    p.add_argument("-k", dest="filter", help="only run benchmarks whose name contains this")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    p.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown vs baseline (0.15 = 15%%)")
+    p.add_argument("--baseline", default=str(BASELINE_PATH))
+    p.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    args = p.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+    results, regressions = {}, []
+    print(f"{'benchmark':40} {'ns/op':>12} {'baseline':>12} {'change':>8}")
+    for name, factory in BENCHMARKS.items():
+        if args.filter and args.filter not in name:
+            continue
+        run, items = factory()
+        ns = measure(run, items, args.min_time, args.repeat)
+        results[name] = round(ns, 1)
+        base = baseline.get(name)
+        change = ""
+        if base:
+            ratio = ns / base - 1.0
+            change = f"{ratio:+.1%}"
+            if ratio > args.threshold:
+                regressions.append(name)
+                change += " !"
+        print(f"{name:40} {ns:12.1f} {base or '-':>12} {change:>8}")
+
+    if args.save_baseline:
+        data = {"python": sys.version.split()[0], "results": {**baseline, **results}}
+        Path(args.baseline).write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"baseline written to {args.baseline}")
+    elif regressions:
+        print(f"REGRESSION (>{args.threshold:.0%} slower): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Guesses/sec scaling with the number of worker processes.
+
+Every worker count runs that many independent ``bench.simulator`` processes in
+parallel — like sharded workers, each owns its own channels — with guess
+throttling off and players guessing fast enough to saturate a core.  The summed
+guesses/sec is compared with the single-process run::
+
+    python -m bench.shard_scaling --workers 1,2,4 --duration 10
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def run_workers(n: int, args) -> dict:
+    env = dict(os.environ, GUESS_USER_RATE="0", GUESS_CHANNEL_RATE="0")
+    with tempfile.TemporaryDirectory(prefix="wto-scale-") as tmp:
+        procs = []
+        for i in range(n):
+            out = Path(tmp) / f"w{i}.json"
+            cmd = [sys.executable, "-m", "bench.simulator", "--channels", str(args.channels),
+                   "--players", str(args.players), "--guess-rate", str(args.guess_rate),
+                   "--p-correct", str(args.p_correct), "--duration", str(args.duration),
+                   "--seed", str(args.seed + i), "--json", str(out)]
+            procs.append((subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL), out))
+        t0 = time.perf_counter()
+        for p, _ in procs:
+            p.wait()
+        wall = time.perf_counter() - t0
+        reports = [json.loads(out.read_text(encoding="utf-8")) for p, out in procs if p.returncode == 0]
+    return {
+        "workers": n,
+        "ok": len(reports),
+        "guesses_per_sec": round(sum(r["guesses_per_sec"] for r in reports), 1),
+        "rounds_per_sec": round(sum(r["rounds_per_sec"] for r in reports), 2),
+        "p99_guess_ms": max((r["guess_latency_ms"]["99"] for r in reports), default=0.0),
+        "wall_s": round(wall, 1),
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    p.add_argument("--channels", type=int, default=20, help="channels per worker")
+    p.add_argument("--players", type=int, default=10)
+    p.add_argument("--guess-rate", type=float, default=200.0, help="guesses/s per player (saturating)")
+    p.add_argument("--p-correct", type=float, default=0.01)
+    p.add_argument("--duration", type=float, default=10.0)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--json", help="write the results to this file")
+    args = p.parse_args(argv)
+
+    print(f"cpus: {os.cpu_count()}")
+    print(f"{'workers':>7} {'guesses/s':>11} {'speedup':>8} {'rounds/s':>9} {'p99 ms':>8}")
+    results, base = [], None
+    for n in [int(x) for x in args.workers.split(",") if x.strip()]:
+        r = run_workers(n, args)
+        base = base or r["guesses_per_sec"] or 1.0
+        r["speedup"] = round(r["guesses_per_sec"] / base, 2)
+        results.append(r)
+        print(f"{n:7d} {r['guesses_per_sec']:11.1f} {r['speedup']:7.2f}x {r['rounds_per_sec']:9.2f} {r['p99_guess_ms']:8.2f}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    return results
+
+
+if __name__ == "__main__":
+    main()
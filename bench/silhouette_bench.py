@@ -0,0 +1,83 @@
+"""Silhouette generation time per image, on synthetic full art.
+
+Builds full-art PNGs the way the bucket has them (RGBA with a transparent
+background, and flat ``_blackbg``/``_whitebg`` RGB), then times
+``cpu_tasks.silhouette_png`` on each and reports the PNG size of the result,
+i.e. what one stored ``[alpha]`` object per variant costs::
+
+    python -m bench.silhouette_bench --size 1024 --images 20
+
+For the real catalog (including the bytes of ``[alpha]`` objects in the bucket
+that derived silhouettes replace) run ``python -m Bot.silhouettes``.
+"""
+
+import argparse
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from Bot.cpu_tasks import silhouette_png
+
+
+def synthetic_full(size: int, kind: str, seed: int) -> bytes:
+    """A noisy ellipse 'operator' on a transparent, black or white background."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size]
+    cy, cx = size * rng.uniform(0.4, 0.6), size * rng.uniform(0.4, 0.6)
+    ry, rx = size * rng.uniform(0.3, 0.45), size * rng.uniform(0.15, 0.3)
+    inside = ((yy - cy) / ry) ** 2 + ((xx - cx) / rx) ** 2 <= 1.0
+    figure = rng.integers(40, 216, size=(size, size, 3), dtype=np.uint8)
+    if kind == "rgba":
+        arr = np.zeros((size, size, 4), dtype=np.uint8)
+        arr[..., :3] = figure
+        arr[..., 3] = np.where(inside, 255, 0)
+        mode = "RGBA"
+    else:
+        bg = 0 if kind == "blackbg" else 255
+        arr = np.full((size, size, 3), bg, dtype=np.uint8)
+        arr[inside] = figure[inside]
+        mode = "RGB"
+    out = io.BytesIO()
+    Image.fromarray(arr, mode).save(out, format="PNG", compress_level=1)
+    return out.getvalue()
+
+
+def run(kind: str, size: int, images: int):
+    sources = [synthetic_full(size, kind, seed) for seed in range(images)]
+    times, out_bytes = [], 0
+    for data in sources:
+        t0 = time.perf_counter()
+        png = silhouette_png(data)
+        times.append(time.perf_counter() - t0)
+        out_bytes += len(png)
+    times.sort()
+    return {
+        "kind": kind,
+        "p50_ms": times[len(times) // 2] * 1000,
+        "max_ms": times[-1] * 1000,
+        "source_kb": sum(map(len, sources)) / images / 1024,
+        "silhouette_kb": out_bytes / images / 1024,
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--size", type=int, default=1024, help="image width/height in pixels")
+    p.add_argument("--images", type=int, default=10, help="images per kind")
+    p.add_argument("--kinds", default="rgba,blackbg,whitebg")
+    args = p.parse_args(argv)
+
+    print(f"{args.size}x{args.size}, {args.images} images per kind")
+    print(f"{'kind':>8} {'p50 ms':>8} {'max ms':>8} {'source KB':>10} {'silhouette KB':>14}")
+    results = []
+    for kind in [k for k in args.kinds.split(",") if k]:
+        r = run(kind, args.size, args.images)
+        results.append(r)
+        print(f"{kind:>8} {r['p50_ms']:8.1f} {r['max_ms']:8.1f} {r['source_kb']:10.1f} {r['silhouette_kb']:14.1f}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+"""End-to-end round simulator and load test.
+
+Drives the real command and event handlers (``start_loop``, ``on_message``,
+the round timeout and ``schedule_next``) with a fake Discord layer and a fake
+storage backend, so channel capacity can be measured without Discord or R2::
+
+    python -m bench.simulator --channels 50 --players 8 --guess-rate 0.5 --duration 30
+
+N looping channels each get M simulated players who guess at a Poisson rate;
+a guess is the right name with probability ``--p-correct`` and chat noise
+otherwise.  The report has rounds/sec, ``on_message`` latency percentiles,
+event-loop lag and memory.
+
+``--stress`` instead races every ending path against each other: each channel
+runs 1-second rounds, and right around the timeout all players answer
+correctly while the owner sends ``!skip`` (and a second ``!start``).  Any round
+announced or revealed more than once is reported and the exit code is 1::
+
+    python -m bench.simulator --stress --channels 20 --players 8 --send-latency 0.01
+
+``--gateway-guilds``/``--guild-members``/``--chatter`` add large guilds to the
+bot's real gateway state and stream ordinary chat (with typing events when the
+intents ask for them) through discord.py's own parsers, so the message and
+member caches and the ``on_message`` fast path are exercised as in production.
+Compare ``LEAN_GATEWAY=0`` and ``1`` on RSS and ``cpu_us_per_message``::
+
+    LEAN_GATEWAY=0 python -m bench.simulator --gateway-guilds 20 --guild-members 5000 --chatter 50
+"""
+
+import argparse
+import asyncio
+import atexit
+import contextlib
+import itertools
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# keep the simulator away from the real bucket and the real scores.json
+for _var in ("R2_ACCESS_KEY_ID", "R2_SECRET_ACCESS_KEY", "R2_BUCKET_NAME", "R2_ENDPOINT_URL"):
+    os.environ.pop(_var, None)
+
+from Bot import config, storage  # noqa: E402
+from Bot.storage import MemoryBackend, R2Backend  # noqa: E402
+
+_SYLLABLES = ["ka", "lo", "mi", "ra", "sen", "to", "va", "ne", "shi", "ar", "el", "qu", "ion", "za", "dy", "mo"]
+_NOISE = ["lol", "who is this", "no idea", "gg", "again?", "hint pls", "???", "this is hard",
+          "amiya", "surely it's a guard", "ez", "wait what", "<:pepe:123>", "ok"]
+
+# a tiny valid PNG header; the bot never decodes images
+_FAKE_PNG = b"\x89PNG\r\n\x1a\n" + b"\0" * 2048
+
+
+def synthetic_names(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    names, seen = [], set()
+    while len(names) < n:
+        name = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+        if rng.random() < 0.2:
+            name += " " + "".join(rng.choice(_SYLLABLES) for _ in range(2)).title()
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def synthetic_objects(n_ops: int, variants: int = 2, image_bytes: bytes = _FAKE_PNG):
+    """Object store with a full + ``[alpha]`` silhouette per variant for ``n_ops`` operators."""
+    objects = {}
+    for i in range(n_ops):
+        code = f"char_{i + 100:03d}_op{i}"
+        for v in range(variants):
+            suffix = "" if v == 0 else f"_{v + 1}"
+            objects[f"images/Char/{code}{suffix}.png"] = image_bytes
+            objects[f"images/Char/{code}{suffix}[alpha].png"] = image_bytes
+    return objects
+
+
+# --- fake Discord layer ---
+_JOINED = "2024-01-01T00:00:00+00:00"
+
+
+def _user_payload(uid: int):
+    return {"id": str(uid), "username": f"user{uid}", "discriminator": "0", "avatar": None, "global_name": None}
+
+
+def _member_payload(uid: int = None):
+    data = {"roles": [], "joined_at": _JOINED, "deaf": False, "mute": False, "flags": 0}
+    if uid is not None:
+        data["user"] = _user_payload(uid)
+    return data
+
+
+def guild_payload(gid: int, channel_id: int, member_ids):
+    """GUILD_CREATE data for a guild with one text channel and the given members."""
+    return {
+        "id": str(gid), "name": f"guild-{gid}", "member_count": len(member_ids),
+        "channels": [{"id": str(channel_id), "type": 0, "name": "general", "position": 0}],
+        "roles": [{"id": str(gid), "name": "@everyone", "permissions": "0", "position": 0, "color": 0,
+                   "hoist": False, "managed": False, "mentionable": False}],
+        "members": [_member_payload(uid) for uid in member_ids],
+        "emojis": [], "stickers": [], "features": [],
+    }
+
+
+def message_payload(mid: int, gid: int, channel_id: int, uid: int, content: str):
+    """MESSAGE_CREATE data as the gateway sends it for a guild text message."""
+    return {
+        "id": str(mid), "channel_id": str(channel_id), "guild_id": str(gid),
+        "author": _user_payload(uid), "member": _member_payload(), "content": content,
+        "timestamp": _JOINED, "edited_timestamp": None, "tts": False, "mention_everyone": False,
+        "mentions": [], "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0,
+    }
+
+
+def typing_payload(gid: int, channel_id: int, uid: int):
+    return {"channel_id": str(channel_id), "guild_id": str(gid), "user_id": str(uid),
+            "timestamp": int(time.time()), "member": _member_payload(uid)}
+
+
+class FakeUser:
+    def __init__(self, uid: int, name: str, bot: bool = False):
+        self.id = uid
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+        self.mention = f"<@{uid}>"
+
+    def __str__(self):
+        return self.name
+
+
+class FakeGuild:
+    def __init__(self, gid: int, members=()):
+        self.id = gid
+        self.name = f"guild-{gid}"
+        self.members = list(members)
+
+    async def fetch_member(self, uid):
+        for m in self.members:
+            if m.id == uid:
+                return m
+        raise LookupError(uid)
+
+
+class FakeMessage:
+    _ids = itertools.count(1)
+
+    def __init__(self, content, author, channel, state=None):
+        self.id = next(self._ids)
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.created_at = time.time()
+        self.attachments = []
+        self._state = state
+
+
+class FakeChannel:
+    def __init__(self, cid: int, guild: FakeGuild, stats, send_latency: float = 0.0):
+        self.id = cid
+        self.guild = guild
+        self.name = f"chan-{cid}"
+        self.stats = stats
+        self.send_latency = send_latency
+        # per round: how many end announcements (✅/⏰/✳) and reveals it got
+        self.round_ends = []
+        self.round_reveals = []
+
+    def __str__(self):
+        return self.name
+
+    async def send(self, content=None, *, file=None, **kwargs):
+        if file is not None:
+            self.stats["upload_bytes"] += len(file.fp.read())
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        text = content or ""
+        if text.startswith("🔍"):
+            self.stats["rounds_started"] += 1
+            self.round_ends.append(0)
+            self.round_reveals.append(0)
+        elif text.startswith(("✅", "⏰", "✳")):
+            key = {"✅": "rounds_won", "⏰": "rounds_timed_out", "✳": "rounds_skipped"}[text[0]]
+            self.stats[key] += 1
+            if self.round_ends:
+                self.round_ends[-1] += 1
+        elif text.startswith("Đáp án") and self.round_reveals:
+            self.round_reveals[-1] += 1
+        self.stats["messages_sent"] += 1
+        return FakeMessage(text, self.stats["bot_user"], self)
+
+
+class FakeContext:
+    def __init__(self, channel: FakeChannel, author: FakeUser):
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.message = FakeMessage("", author, channel)
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, max(0, int(round(q / 100.0 * (len(sorted_vals) - 1)))))
+    return sorted_vals[idx]
+
+
+def _rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Simulator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.stats = {"rounds_started": 0, "rounds_won": 0, "rounds_timed_out": 0, "rounds_skipped": 0,
+                      "messages_sent": 0,
+                      "upload_bytes": 0, "guesses": 0, "gateway_messages": 0, "gateway_events": 0,
+                      "bot_user": FakeUser(1, "sim-bot", bot=True)}
+        self.latencies = []
+        self.lags = []
+        self.stopping = False
+
+    async def _lag_monitor(self, interval=0.05):
+        loop = asyncio.get_running_loop()
+        while not self.stopping:
+            t0 = loop.time()
+            await asyncio.sleep(interval)
+            self.lags.append(max(0.0, loop.time() - t0 - interval))
+
+    async def _player(self, channel, user, reveal_name_of):
+        rng = random.Random(self.rng.random())
+        args = self.args
+        while not self.stopping:
+            await asyncio.sleep(rng.expovariate(args.guess_rate))
+            name = reveal_name_of(channel.id)
+            if name is None:
+                continue
+            content = name if rng.random() < args.p_correct else rng.choice(_NOISE)
+            msg = FakeMessage(content, user, channel, self.bot._connection)
+            t0 = time.perf_counter()
+            await self.on_message(msg)
+            self.latencies.append(time.perf_counter() - t0)
+            self.stats["guesses"] += 1
+
+    async def _chatter(self, gid, channel_id, member_ids, mids):
+        """Ordinary chat in a guild without a game, through the real gateway parsers."""
+        rng = random.Random(self.rng.random())
+        conn = self.bot._connection
+        typing = self.bot.intents.guild_typing
+        while not self.stopping:
+            await asyncio.sleep(rng.expovariate(self.args.chatter))
+            uid = rng.choice(member_ids)
+            if typing:
+                # the gateway only sends TYPING_START with the typing intent
+                conn.parse_typing_start(typing_payload(gid, channel_id, uid))
+                self.stats["gateway_events"] += 1
+            conn.parse_message_create(message_payload(next(mids), gid, channel_id, uid, rng.choice(_NOISE)))
+            self.stats["gateway_messages"] += 1
+            self.stats["gateway_events"] += 1
+
+    async def _racer(self, channel, players, owner):
+        """Stress mode: drive 1 s rounds and end each one from every path at once."""
+        rng = random.Random(self.rng.random())
+        ctx = FakeContext(channel, owner)
+        while not self.stopping:
+            # two concurrent starts: only one round may come out of it
+            await asyncio.gather(self.cmd.start_game(ctx, 1), self.cmd.start_game(ctx, 1))
+            state = config.games.get(channel.id)
+            if state is None:
+                await asyncio.sleep(0.01)
+                continue
+            name = state.current.get("_reveal_name")
+            await asyncio.sleep(max(0.0, 1.0 + rng.uniform(-0.03, 0.03)))
+            jobs = [self.on_message(FakeMessage(name, u, channel, self.bot._connection)) for u in players]
+            jobs.append(self.cmd.skip_round(ctx))
+            rng.shuffle(jobs)
+            self.stats["guesses"] += len(players)
+            await asyncio.gather(*jobs)
+            # if the timeout won the claim its pipeline runs in the timeout task
+            await asyncio.gather(state.timeout_task, return_exceptions=True)
+
+    async def run(self):
+        args = self.args
+        from Bot import commands as cmd
+        from Bot.bot import bot, on_message
+        from Bot.image_processing import load_characters
+        self.bot, self.on_message, self.cmd = bot, on_message, cmd
+        # the command parser needs a logged-in user to compare authors against
+        bot._connection.user = self.stats["bot_user"]
+
+        chars = load_characters(storage.get_backend())
+        for ent, name in zip(chars, synthetic_names(len(chars), args.seed)):
+            ent["name"] = name
+        cmd.set_catalog(chars)
+
+        def reveal_name_of(cid):
+            state = config.games.get(cid)
+            if state is None or state.ended or not state.current:
+                return None
+            return state.current.get("_reveal_name")
+
+        guild_ids = itertools.count(10_000)
+        user_ids = itertools.count(1_000_000)
+        channels, tasks = [], [asyncio.create_task(self._lag_monitor())]
+        if args.trace_memory:
+            tracemalloc.start()
+        rss_before = _rss_kb()
+        t_start = time.perf_counter()
+        if args.gateway_guilds:
+            # discord.py dispatches on_message itself from parse_message_create
+            await bot._async_setup_hook()
+            mids = itertools.count(10 ** 17)
+            for _ in range(args.gateway_guilds):
+                gid = next(guild_ids)
+                member_ids = [next(user_ids) for _ in range(args.guild_members)] or [next(user_ids)]
+                bot._connection._add_guild_from_data(guild_payload(gid, gid * 10, member_ids))
+                if args.chatter > 0:
+                    tasks.append(asyncio.create_task(self._chatter(gid, gid * 10, member_ids, mids)))
+        cpu_start = time.process_time()
+        for c in range(args.channels):
+            players = [FakeUser(next(user_ids), f"player{p}") for p in range(args.players)]
+            guild = FakeGuild(next(guild_ids), players)
+            channel = FakeChannel(20_000 + c, guild, self.stats, args.send_latency)
+            channels.append((channel, players[0]))
+            if args.stress:
+                tasks.append(asyncio.create_task(self._racer(channel, players, players[0])))
+                continue
+            for user in players:
+                tasks.append(asyncio.create_task(self._player(channel, user, reveal_name_of)))
+
+        if not args.stress:
+            for channel, owner in channels:
+                await cmd.start_loop(FakeContext(channel, owner), 0, args.seconds)
+        await asyncio.sleep(args.duration)
+        elapsed = time.perf_counter() - t_start
+        cpu = time.process_time() - cpu_start
+
+        self.stopping = True
+        for channel, owner in channels:
+            await cmd.stop_game(FakeContext(channel, owner))
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        peak_traced = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+        if args.trace_memory:
+            tracemalloc.stop()
+        return self.report(elapsed, rss_before, peak_traced, [c for c, _ in channels], cpu)
+
+    def report(self, elapsed, rss_before, peak_traced, channels=(), cpu=0.0):
+        lat = sorted(self.latencies)
+        lags = sorted(self.lags)
+        ended = self.stats["rounds_won"] + self.stats["rounds_timed_out"] + self.stats["rounds_skipped"]
+        messages = self.stats["guesses"] + self.stats["gateway_messages"]
+        return {
+            "channels": self.args.channels,
+            "players_per_channel": self.args.players,
+            "elapsed_s": round(elapsed, 3),
+            "rounds_started": self.stats["rounds_started"],
+            "rounds_ended": ended,
+            "rounds_won": self.stats["rounds_won"],
+            "rounds_timed_out": self.stats["rounds_timed_out"],
+            "rounds_skipped": self.stats["rounds_skipped"],
+            # a round may end through exactly one path: anything above 0 is a race
+            "rounds_ended_twice": sum(n > 1 for c in channels for n in c.round_ends),
+            "rounds_revealed_twice": sum(n > 1 for c in channels for n in c.round_reveals),
+            "rounds_per_sec": round(ended / elapsed, 3) if elapsed else 0.0,
+            "guesses": self.stats["guesses"],
+            "guesses_per_sec": round(self.stats["guesses"] / elapsed, 1) if elapsed else 0.0,
+            "guess_latency_ms": {q: round(_percentile(lat, q) * 1000, 3) for q in (50, 90, 99)},
+            "guess_latency_max_ms": round(lat[-1] * 1000, 3) if lat else 0.0,
+            "loop_lag_ms": {q: round(_percentile(lags, q) * 1000, 3) for q in (50, 99)},
+            "loop_lag_max_ms": round(lags[-1] * 1000, 3) if lags else 0.0,
+            "upload_bytes": self.stats["upload_bytes"],
+            "lean_gateway": config.LEAN_GATEWAY,
+            "gateway_messages": self.stats["gateway_messages"],
+            "gateway_events": self.stats["gateway_events"],
+            "cached_messages": len(self.bot._connection._messages or ()),
+            "cached_members": sum(len(g.members) for g in self.bot.guilds),
+            # whole-process CPU (rounds, guesses and chat) per message handled
+            "cpu_us_per_message": round(cpu / messages * 1e6, 1) if messages else 0.0,
+            "rss_kb": _rss_kb(),
+            "rss_growth_kb": _rss_kb() - rss_before,
+            "tracemalloc_peak_kb": peak_traced // 1024 if peak_traced is not None else None,
+        }
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--channels", type=int, default=10, help="looping channels (one guild each)")
+    p.add_argument("--players", type=int, default=5, help="simulated players per channel")
+    p.add_argument("--guess-rate", type=float, default=0.5, help="guesses per second per player")
+    p.add_argument("--p-correct", type=float, default=0.1, help="probability a guess is the right name")
+    p.add_argument("--duration", type=float, default=20.0, help="seconds to run")
+    p.add_argument("--seconds", type=int, default=0, help="time limit of the first round (0 = auto)")
+    p.add_argument("--operators", type=int, default=300, help="operators in the synthetic catalog")
+    p.add_argument("--send-latency", type=float, default=0.0, help="fake Discord send/upload latency (s)")
+    p.add_argument("--fake-s3", action="store_true", help="serve images through FakeS3Server + R2Backend")
+    p.add_argument("--storage-latency", type=float, default=0.0, help="fake S3 latency per request (s)")
+    p.add_argument("--trace-memory", action="store_true", help="also report tracemalloc peak (slower)")
+    p.add_argument("--gateway-guilds", type=int, default=0, help="extra guilds in the real gateway state")
+    p.add_argument("--guild-members", type=int, default=1000, help="members per gateway guild")
+    p.add_argument("--chatter", type=float, default=0.0, help="chat messages/s per gateway guild")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--json", help="write the report to this file")
+    p.add_argument("--traces", help="append per-round traces (JSON lines) to this file")
+    p.add_argument("--stress", action="store_true", help="race win/timeout/skip/start on every round")
+    p.add_argument("--batch-ms", type=float, default=None,
+                   help="micro-batch guesses per channel over this window (default: GUESS_BATCH_WINDOW_MS)")
+    p.add_argument("--verbose", action="store_true", help="keep the bot's own prints and logs")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    tmp = tempfile.TemporaryDirectory(prefix="wto-sim-")
+    # scores, shuffle bags and the round log all live in tmp: a run never touches the
+    # bot's own files and starts from the same empty state as the run before it
+    config.SCORES_FILE = Path(tmp.name) / "scores.json"
+    config.all_scores.clear()
+    config.score_windows.guilds.clear()
+    config.global_board.load({})
+    from Bot import commands, round_log, shuffle_bag, tracing, batching
+    round_log.ROUND_LOG_DIR = Path(tmp.name) / "rounds"
+    bag_store = commands.bags = shuffle_bag.bags = shuffle_bag.BagStore(Path(tmp.name) / "bags.bin")
+    if args.batch_ms is not None:
+        batching.batcher = batching.GuessBatcher(args.batch_ms / 1000.0) if args.batch_ms > 0 else None
+    tracing.ROUND_TRACING = bool(args.traces)
+    if args.traces:
+        tracing.ROUND_TRACE_PATH = Path(args.traces)
+
+    memory = MemoryBackend(synthetic_objects(args.operators))
+    server = None
+    if args.fake_s3:
+        from Bot.fake_s3 import FakeS3Server
+        server = FakeS3Server(memory, seed=args.seed).start()
+        server.faults.latency = args.storage_latency
+        storage.set_backend(R2Backend("sim", "sim", server.bucket, server.url))
+    else:
+        storage.set_backend(memory)
+
+    out = sys.stdout
+    devnull = open(os.devnull, "w")
+    sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+    if not args.verbose:
+        logging.getLogger("wto").setLevel(logging.WARNING)
+    try:
+        with sink:
+            report = asyncio.run(Simulator(args).run())
+    finally:
+        if server:
+            server.stop()
+        devnull.close()
+        # write the scores the debounced save still holds while tmp exists; the atexit
+        # flush would otherwise run after cleanup() and fail on the missing lock file
+        config.flush_scores()
+        config._save_handle = None
+        bag_store.save()
+        atexit.unregister(bag_store.save)
+        round_log.flush()
+        tmp.cleanup()
+    text = json.dumps(report, indent=2)
+    print(text, file=out)
+    if args.json:
+        Path(args.json).write_text(text + "\n", encoding="utf-8")
+    return report
+
+
+if __name__ == "__main__":
+    result = main()
+    sys.exit(1 if result["rounds_ended_twice"] or result["rounds_revealed_twice"] else 0)
@@ -0,0 +1,107 @@
+"""Tail latency of image reads against the fake S3 server with latency spikes.
+
+Serves synthetic objects through ``FakeS3Server`` (base latency, jitter, a
+fraction of requests stalled by ``--spike`` seconds, a fraction of 500s) and
+reads them through ``R2Backend`` in three modes:
+
+* ``plain``  - one ``get_bytes`` per read in the default executor (no deadline or retry)
+* ``retry``  - ``fetch_object`` with deadlines and jittered retries, hedging off
+* ``hedged`` - ``fetch_object`` with hedged reads at the recent p95
+
+::
+
+    python -m bench.storage_tail_bench --reads 400 --spike-rate 0.05 --spike 1.0
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from Bot import storage
+from Bot.fake_s3 import FakeS3Server
+from Bot.metrics import STORAGE_FETCH_HEDGES, STORAGE_FETCH_RETRIES
+from Bot.storage import MemoryBackend, R2Backend, fetch_object
+
+
+def _counter(metric, *labels) -> float:
+    return metric.labels(*labels).value
+
+
+async def _run_mode(mode: str, backend, keys, concurrency: int):
+    storage.STORAGE_HEDGE = mode == "hedged"
+    storage._latency.clear()
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(concurrency)
+    times, failures = [], 0
+
+    async def one(key):
+        nonlocal failures
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                if mode == "plain":
+                    await loop.run_in_executor(None, backend.get_bytes, key)
+                else:
+                    await fetch_object(key, backend)
+            except Exception:
+                failures += 1
+                return
+            times.append(time.perf_counter() - t0)
+
+    await asyncio.gather(*(one(k) for k in keys))
+    times.sort()
+    pick = lambda q: times[min(len(times) - 1, int(len(times) * q))] * 1000 if times else float("nan")
+    return {"mode": mode, "ok": len(times), "failed": failures, "p50_ms": pick(0.5),
+            "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": times[-1] * 1000 if times else float("nan")}
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--reads", type=int, default=400, help="reads per mode")
+    p.add_argument("--concurrency", type=int, default=4)
+    p.add_argument("--size", type=int, default=64 * 1024, help="object size in bytes")
+    p.add_argument("--latency", type=float, default=0.02, help="base server latency (s)")
+    p.add_argument("--jitter", type=float, default=0.01)
+    p.add_argument("--spike-rate", type=float, default=0.05)
+    p.add_argument("--spike", type=float, default=1.0, help="latency of a spike (s)")
+    p.add_argument("--error-rate", type=float, default=0.02)
+    p.add_argument("--deadline", type=float, default=2.0)
+    p.add_argument("--modes", default="plain,retry,hedged")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--json", help="write the results to this file")
+    args = p.parse_args(argv)
+
+    storage.STORAGE_DEADLINE = args.deadline
+    objects = {f"images/Char/op{i}/{i}.png": bytes([i % 256]) * args.size for i in range(64)}
+    keys = [list(objects)[i % len(objects)] for i in range(args.reads)]
+    results = []
+    with FakeS3Server(MemoryBackend(objects), seed=args.seed) as server:
+        f = server.faults
+        f.latency, f.jitter, f.spike_rate, f.spike_latency, f.error_rate = (
+            args.latency, args.jitter, args.spike_rate, args.spike, args.error_rate)
+        backend = R2Backend("test", "test", server.bucket, server.url)
+        for mode in args.modes.split(","):
+            before = server.counters.snapshot()
+            retries = _counter(STORAGE_FETCH_RETRIES, backend.name, "error") + _counter(STORAGE_FETCH_RETRIES, backend.name, "deadline")
+            hedges = _counter(STORAGE_FETCH_HEDGES, backend.name, "sent")
+            hedge_wins = _counter(STORAGE_FETCH_HEDGES, backend.name, "hedge_won")
+            res = asyncio.run(_run_mode(mode, backend, keys, args.concurrency))
+            after = server.counters.snapshot()
+            res["requests"] = after["requests"] - before["requests"]
+            res["server_errors"] = after["errors"] - before["errors"]
+            res["retries"] = _counter(STORAGE_FETCH_RETRIES, backend.name, "error") + _counter(STORAGE_FETCH_RETRIES, backend.name, "deadline") - retries
+            res["hedges"] = _counter(STORAGE_FETCH_HEDGES, backend.name, "sent") - hedges
+            res["hedge_wins"] = _counter(STORAGE_FETCH_HEDGES, backend.name, "hedge_won") - hedge_wins
+            results.append(res)
+            print(f"{mode:7} ok {res['ok']:5d} failed {res['failed']:3d}  p50 {res['p50_ms']:7.1f} ms  "
+                  f"p95 {res['p95_ms']:7.1f} ms  p99 {res['p99_ms']:7.1f} ms  max {res['max_ms']:7.1f} ms  "
+                  f"requests {res['requests']:5d} (500s {res['server_errors']:3d})  retries {res['retries']:4.0f}  hedges {res['hedges']:4.0f} "
+                  f"({res['hedge_wins']:.0f} won)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,27 +2,63 @@
 import os
 import sys
 import asyncio
+import hmac
 from aiohttp import web
 
-# import bot object của bạn (điều chỉnh đường dẫn)
-# from Bot.bot import bot
-
-# ---- placeholder bot for example ----
-# replace with: from Bot.bot import bot
-# Here we assume `bot` is an instance of discord.Client / commands.Bot
-bot = None
-try:
-    from Bot.bot import bot as _bot
-    bot = _bot
-except Exception as e:
-    print("Import bot failed:", repr(e))
+# Bot.bot được import trong main(), không phải ở đây: process con của job pool (spawn)
+# chạy lại file này dưới tên __mp_main__ và không được nạp cả bot
 
 async def handle(request):
     return web.Response(text="Bot is running!")
 
+async def handle_metrics(request):
+    from Bot.metrics import render
+    from Bot import shards
+    # supervisor của chế độ sharded: gộp metrics của mọi worker
+    text = await shards.supervisor.metrics() if shards.supervisor is not None else render()
+    return web.Response(text=text, content_type="text/plain", charset="utf-8",
+                        headers={"X-Prometheus-Format": "0.0.4"})
+
+def _require_admin(request):
+    from Bot.config import ADMIN_TOKEN
+    # chỉ bật khi có ADMIN_TOKEN; gửi qua header Authorization: Bearer <token> hoặc ?token=
+    auth = request.headers.get("Authorization", "")
+    token = auth[7:] if auth.startswith("Bearer ") else request.query.get("token")
+    if not ADMIN_TOKEN:
+        raise web.HTTPNotFound()
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise web.HTTPUnauthorized()
+
+async def handle_stalls(request):
+    from Bot.watchdog import watchdog
+    _require_admin(request)
+    try:
+        n = int(request.query.get("n", "10"))
+    except ValueError:
+        raise web.HTTPBadRequest(text="n must be an integer")
+    return web.json_response(watchdog.report(max(1, min(n, 50))))
+
+async def handle_profile(request):
+    from Bot.profiler import run_profile, ProfilerBusy
+    _require_admin(request)
+    try:
+        seconds = float(request.query.get("seconds", "10"))
+        interval = float(request.query.get("interval_ms", "5")) / 1000
+    except ValueError:
+        raise web.HTTPBadRequest(text="seconds/interval_ms must be numbers")
+    try:
+        prof = await run_profile(seconds, max(interval, 0.001), request.query.get("idle") == "1")
+    except ProfilerBusy:
+        raise web.HTTPConflict(text="a profile is already running")
+    return web.Response(text=prof.collapsed(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Profile-Samples": str(prof.samples)})
+
 async def start_web():
     app = web.Application()
     app.router.add_get("/", handle)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/debug/stalls", handle_stalls)
+    app.router.add_get("/debug/profile", handle_profile)
     runner = web.AppRunner(app)
     await runner.setup()
     port = int(os.environ.get("PORT", 10000))
@@ -30,6 +66,14 @@ async def start_web():
     await site.start()
     print(f"🌐 Web server running on port {port}")
 
+async def start_worker_metrics(port: int):
+    """Sharded worker: /metrics on localhost only, scraped by the supervisor."""
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
 async def start_bot_with_backoff(bot, token, max_attempts=6):
     delay = 10
     for attempt in range(1, max_attempts + 1):
@@ -55,12 +99,36 @@ async def main():
         print("ERROR: DISCORD_TOKEN not set. Set it in Render Environment variables.")
         sys.exit(1)
 
-    if bot is None:
+    try:
+        from Bot.bot import bot
+    except Exception as e:
+        print("Import bot failed:", repr(e))
         print("ERROR: bot object not imported. Check import path.")
         sys.exit(1)
 
+    # worker của chế độ sharded: web server do supervisor giữ, worker chỉ mở /metrics nội bộ
+    is_worker = os.getenv("WTO_WORKER") == "1"
+
     # start web so Render port scan passes (if you want web keep-alive)
-    await start_web()
+    if not is_worker:
+        await start_web()
+    elif os.getenv("WTO_METRICS_PORT"):
+        await start_worker_metrics(int(os.getenv("WTO_METRICS_PORT")))
+
+    # event-loop lag sampler feeding /metrics
+    from Bot.metrics import monitor_loop_lag
+    lag_task = asyncio.create_task(monitor_loop_lag())
+    # watchdog: ghi lại callback nào chặn event loop
+    from Bot.watchdog import watchdog
+    watchdog.start()
+
+    from Bot.config import WORKERS, SHARD_COUNT
+    if WORKERS > 1 and not is_worker:
+        # supervisor: chia shard cho các worker, tự khởi động lại worker bị chết
+        from Bot.shards import run_supervisor
+        from Bot.commands import characters_list
+        await run_supervisor(characters_list, WORKERS, SHARD_COUNT)
+        return
 
     try:
         await start_bot_with_backoff(bot, token)